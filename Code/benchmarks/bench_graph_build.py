@@ -0,0 +1,127 @@
+"""
+Graph build benchmark: legacy per-document loop vs. columnar/vectorized build.
+
+Each (implementation, size) pair runs in a fresh subprocess so the reported
+peak memory is not polluted by earlier runs. Peak memory is the increase in
+the process's max RSS while building, after the input rows already exist.
+
+    python benchmarks/bench_graph_build.py [--sizes 1000 10000 100000] [--degree 4]
+"""
+import argparse
+import gc
+import os
+import random
+import resource
+import sys
+import time
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from network_health.kpis import KPI_KEYS
+
+
+def synth_rows(num_cells, degree, as_docs, seed=0):
+    """
+    Cells as traffic_data-shaped dicts (as_docs=True, what collection.all()
+    yields) or as [cell_id, *kpis] rows (what the AQL loader yields), plus
+    [_from, _to] edge rows.
+    """
+    rng = np.random.default_rng(seed)
+    kpi = rng.uniform(0, 100, size=(num_cells, len(KPI_KEYS))).round(2).tolist()
+    if as_docs:
+        cells = [{"_key": str(i), "cell_id": i, **dict(zip(KPI_KEYS, row))} for i, row in enumerate(kpi, 1)]
+    else:
+        cells = [[i, *row] for i, row in enumerate(kpi, 1)]
+    del kpi
+    src = rng.integers(1, num_cells + 1, size=num_cells * degree // 2)
+    dst = rng.integers(1, num_cells + 1, size=src.size)
+    edge_rows = [[f"traffic_data/{a}", f"traffic_data/{b}"] for a, b in zip(src.tolist(), dst.tolist())]
+    return cells, edge_rows
+
+
+def legacy_build(docs, edge_rows):
+    """The per-document loop congestion.py used before the columnar build."""
+    import torch
+    from torch_geometric.data import HeteroData
+
+    device_features, devicekpi_features, labels = [], [], []
+    edge_index_kpi, edge_index_device = [[], []], [[], []]
+    cell_id_to_index = {}
+    for i, doc in enumerate(docs):
+        cell_id = str(int(doc["cell_id"]))
+        cell_id_to_index[f"traffic_data/{cell_id}"] = i
+        device_features.append(torch.tensor([random.random() for _ in range(11)], dtype=torch.float))
+        devicekpi_features.append(torch.tensor([float(doc.get(k, 0)) for k in KPI_KEYS], dtype=torch.float))
+        edge_index_kpi[0].append(i)
+        edge_index_kpi[1].append(i)
+        score = 0
+        score += float(doc.get("uplink_traffic_MB", 0)) > 40
+        score += float(doc.get("latency_ms", 0)) > 80
+        score += float(doc.get("resource_utilization", 0)) > 75
+        score += float(doc.get("packet_loss_rate", 0)) > 1.5
+        score += float(doc.get("jitter_ms", 0)) > 20
+        score += float(doc.get("call_drop_rate", 0)) > 2.0
+        labels.append(1 if score >= 2 else 0)
+    for src, dst in edge_rows:
+        if src in cell_id_to_index and dst in cell_id_to_index:
+            edge_index_device[0].append(cell_id_to_index[src])
+            edge_index_device[1].append(cell_id_to_index[dst])
+    data = HeteroData()
+    data["device"].x = torch.stack(device_features)
+    data["devicekpi"].x = torch.stack(devicekpi_features)
+    data["device", "has_kpi", "devicekpi"].edge_index = torch.tensor(edge_index_kpi, dtype=torch.long)
+    data["device", "connected_to", "device"].edge_index = torch.tensor(edge_index_device, dtype=torch.long)
+    return data, torch.tensor(labels, dtype=torch.long)
+
+
+def vectorized_build(cell_rows, edge_rows):
+    from network_health.graph_build import arrays_from_rows, build_hetero_data
+
+    return build_hetero_data(arrays_from_rows(cell_rows, edge_rows))
+
+
+def _run_case(impl, num_cells, degree, queue):
+    import torch  # noqa: F401  (import cost is not part of the measurement)
+    import torch_geometric  # noqa: F401
+
+    cells, edge_rows = synth_rows(num_cells, degree, as_docs=(impl == "legacy"))
+    gc.collect()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if impl == "legacy":
+        data, labels = legacy_build(cells, edge_rows)
+    else:
+        data, labels = vectorized_build(cells, edge_rows)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, (rss_after - rss_before) / 1024, int(labels.sum())))
+
+
+def run(impl, num_cells, degree):
+    ctx = get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_case, args=(impl, num_cells, degree, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--degree", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'cells':>8} {'impl':>11} {'build s':>9} {'peak MB':>9} {'congested':>10}")
+    for n in args.sizes:
+        for impl in ("legacy", "vectorized"):
+            elapsed, peak_mb, congested = run(impl, n, args.degree)
+            print(f"{n:>8} {impl:>11} {elapsed:>9.3f} {peak_mb:>9.1f} {congested:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Eager vs compiled congestion inference latency.
+
+For every size a synthetic topology is built and a freshly initialised
+model is checkpointed and exported (network_health.export). One full
+scoring pass (embeddings + predicted class for every device) is timed for
+
+    eager        CongestionModel.predict() on HeteroData (HeteroConv dispatch)
+    torchscript  the frozen fixed-schema module
+    onnx         the same graph in ONNX Runtime (only if onnx/onnxruntime are installed)
+
+at each --threads setting, and the outputs are checked against eager.
+Cold start (a fresh interpreter importing what it needs and loading the
+LATEST checkpoint or its artifact) is measured once per mode.
+
+    python benchmarks/bench_inference.py [--sizes 100 1000 10000 100000] [--threads 1 4] [--repeat 50]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import get_context
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CODE_DIR)
+
+COLD_START = {
+    "eager": "from network_health.checkpoints import load_checkpoint; load_checkpoint({path!r})",
+    "torchscript": "from network_health.export import load_compiled; load_compiled({path!r}, 'torchscript')",
+    "onnx": "from network_health.export import load_compiled; load_compiled({path!r}, 'onnx')",
+}
+
+
+def _onnx_available():
+    try:
+        import onnx  # noqa: F401
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _timeit(fn, repeat):
+    for _ in range(3):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def _run_size(num_cells, args, checkpoint_dir, queue):
+    from datetime import datetime
+
+    import torch
+
+    from network_health.checkpoints import load_checkpoint
+    from network_health.export import load_compiled
+    from network_health.graph_build import GraphArrays, build_hetero_data
+    from network_health.kpis import KPI_KEYS
+    from network_health.model import CONNECTED_TO
+    from network_health.synthetic import SyntheticNetwork
+
+    network = SyntheticNetwork(num_cells, args.layout, args.degree, seed=args.seed)
+    frame = network.frame(datetime.now())
+    arrays = GraphArrays(frame["cell_id"].astype(str).to_numpy(), frame[KPI_KEYS].to_numpy("float32"), network.edges)
+    data, _ = build_hetero_data(arrays)
+    inputs = (data["device"].x, data["devicekpi"].x, data[CONNECTED_TO].edge_index)
+
+    start = time.perf_counter()
+    model, _ = load_checkpoint(checkpoint_dir)
+    load = {"eager": time.perf_counter() - start}
+    compiled = {}
+    for fmt in args.formats:
+        start = time.perf_counter()
+        compiled[fmt] = load_compiled(checkpoint_dir, fmt)
+        load[fmt] = time.perf_counter() - start
+
+    reference, reference_classes = model.predict(data)
+    errors = {}
+    for fmt, module in compiled.items():
+        embeddings, classes = module.predict(*inputs)
+        errors[fmt] = ((embeddings - reference).abs().max().item(), int((classes != reference_classes).sum()))
+
+    latency = {}
+    for threads in args.threads:
+        torch.set_num_threads(threads)
+        latency[("eager", threads)] = _timeit(lambda: model.predict(data), args.repeat)
+        for fmt, module in compiled.items():
+            latency[(fmt, threads)] = _timeit(lambda: module.predict(*inputs), args.repeat)
+    queue.put({"cells": num_cells, "edges": int(network.edges.shape[1]), "load": load,
+               "errors": errors, "latency": latency})
+
+
+def run_size(num_cells, args, checkpoint_dir):
+    ctx = get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_size, args=(num_cells, args, checkpoint_dir, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def cold_start(mode, checkpoint_dir, repeat=3):
+    """
+    Median wall time of a fresh interpreter that imports and loads the model.
+    """
+    code = f"import sys; sys.path.insert(0, {CODE_DIR!r}); " + COLD_START[mode].format(path=checkpoint_dir)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-W", "ignore", "-c", code], check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--threads", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--layout", choices=("hex", "geometric"), default="hex")
+    parser.add_argument("--degree", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-cold-start", action="store_true", help="skip the fresh-interpreter load timings")
+    args = parser.parse_args()
+    args.formats = ["torchscript"] + (["onnx"] if _onnx_available() else [])
+    if "onnx" not in args.formats:
+        print("onnx/onnxruntime not installed; timing eager and TorchScript only")
+
+    import torch
+
+    from network_health.checkpoints import save_checkpoint
+    from network_health.export import export_checkpoint
+    from network_health.model import CongestionModel
+
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        torch.manual_seed(args.seed)
+        save_checkpoint(checkpoint_dir, CongestionModel().eval())
+        export_checkpoint(checkpoint_dir, args.formats)
+
+        if not args.no_cold_start:
+            print(f"\n{'mode':>12} {'cold start s':>13}")
+            for mode in ["eager"] + args.formats:
+                print(f"{mode:>12} {cold_start(mode, checkpoint_dir):>13.2f}")
+
+        for n in args.sizes:
+            result = run_size(n, args, checkpoint_dir)
+            print(f"\ncells={result['cells']} edges={result['edges']}  "
+                  + "  ".join(f"{mode} load={seconds * 1000:.1f} ms" for mode, seconds in result["load"].items()))
+            for fmt, (max_abs, mismatched) in result["errors"].items():
+                print(f"  {fmt}: max |embedding - eager| = {max_abs:.2e}, {mismatched} predictions differ")
+            print(f"{'threads':>8} {'mode':>12} {'ms/pass':>9} {'speedup':>8}")
+            for threads in args.threads:
+                eager = result["latency"][("eager", threads)]
+                for mode in ["eager"] + args.formats:
+                    seconds = result["latency"][(mode, threads)]
+                    print(f"{threads:>8} {mode:>12} {seconds * 1000:>9.2f} {eager / seconds:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Full-graph vs mini-batch training and inference: time and peak memory.
+
+For every size a synthetic topology is built and, in a fresh process per
+mode, the congestion model is trained for --epochs and then every device
+is scored once:
+
+    full        training.train_model() and one full-graph pass
+    minibatch   minibatch.train_minibatch() with --fanout/--batch-size and
+                embed_minibatch() (all neighbours, so it matches a full pass)
+
+The sampler in use is printed: PyG's NeighborLoader when pyg-lib or
+torch-sparse is installed, EgoNetLoader otherwise. Reported per mode:
+
+    s/epoch     mean training epoch time
+    infer s     the scoring pass over all devices
+    input MB    peak RSS after building the graph tensors (before training)
+    peak MB     peak RSS of the whole run
+    accuracy    test-set accuracy of the trained model
+
+    python benchmarks/bench_minibatch.py [--sizes 100000 1000000] [--epochs 3] [--batch-size 1024]
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_mode(num_cells, mode, args, queue):
+    from datetime import datetime
+
+    import torch
+
+    from network_health.graph_build import GraphArrays, build_hetero_data
+    from network_health.kpis import KPI_KEYS
+    from network_health.minibatch import embed_minibatch, native_sampler_available, train_minibatch
+    from network_health.synthetic import SyntheticNetwork
+    from network_health.training import EPOCH_SECONDS, train_model
+
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+    network = SyntheticNetwork(num_cells, args.layout, args.degree, seed=args.seed)
+    frame = network.frame(datetime.now())
+    arrays = GraphArrays(frame["cell_id"].astype(str).to_numpy(), frame[KPI_KEYS].to_numpy("float32"), network.edges)
+    del frame, network
+    data, labels = build_hetero_data(arrays)
+    input_mb = _peak_mb()
+
+    if mode == "full":
+        model, metrics = train_model(data, labels, epochs=args.epochs, seed=args.seed)
+        start = time.perf_counter()
+        model.predict(data)
+    else:
+        model, metrics = train_minibatch(data, labels, epochs=args.epochs, fanout=args.fanout,
+                                         batch_size=args.batch_size, seed=args.seed)
+        start = time.perf_counter()
+        embed_minibatch(model, data, batch_size=args.batch_size)
+    infer_seconds = time.perf_counter() - start
+    queue.put({
+        "mode": mode, "sampler": "NeighborLoader" if native_sampler_available() else "EgoNetLoader",
+        "edges": int(arrays.device_edges.shape[1]),
+        "epoch": EPOCH_SECONDS.sum(mode=mode) / max(EPOCH_SECONDS.count(mode=mode), 1), "infer": infer_seconds,
+        "input_mb": input_mb, "peak_mb": _peak_mb(), "accuracy": metrics["accuracy"],
+    })
+
+
+def run_mode(num_cells, mode, args):
+    ctx = get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_mode, args=(num_cells, mode, args, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--modes", nargs="+", choices=("full", "minibatch"), default=["full", "minibatch"])
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--fanout", type=int, nargs="+", default=[10])
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--layout", choices=("hex", "geometric"), default="hex")
+    parser.add_argument("--degree", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        rows = [run_mode(n, mode, args) for mode in args.modes]
+        print(f"\ncells={n} edges={rows[0]['edges']} sampler={rows[-1]['sampler']}")
+        print(f"{'mode':<10} {'s/epoch':>8} {'infer s':>8} {'input MB':>9} {'peak MB':>8} {'accuracy':>9}")
+        for r in rows:
+            print(f"{r['mode']:<10} {r['epoch']:>8.2f} {r['infer']:>8.2f} {r['input_mb']:>9.0f} {r['peak_mb']:>8.0f} "
+                  f"{r['accuracy']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Data-access benchmark: full-document scans vs. projected, streamed AQL.
+
+Seeds a scratch collection with traffic_data-shaped documents (plus a
+padding attribute standing in for the fields the readers never use), then
+times each read path and reports the JSON size of what it returned:
+
+  all()             collection.all(), whole documents
+  keep              KEEP(d, dashboard fields), streamed
+  kpi rows          [cell_id, *KPIs] value arrays, streamed
+  stamps            [_key, timestamp] for every cell (old change detection)
+  changed (index)   cells with kpi_write_seq > watermark (idx_kpi_write_seq)
+  latest (index)    newest kpi_write_seq (one index lookup)
+
+Run it against a local ArangoDB container, e.g.
+
+    docker run -d -p 8529:8529 -e ARANGO_ROOT_PASSWORD=yourpassword arangodb
+    python benchmarks/bench_projection.py --cells 100000
+
+The scratch collection is dropped afterwards.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from arango import ArangoClient
+
+from network_health.data_access import (
+    INDEXES, fetch_dashboard_nodes, fetch_kpi_rows, iter_rows, kpi_changes_since, latest_value,
+)
+from network_health.kpis import KPI_KEYS
+
+SCRATCH_COLLECTION = "bench_traffic_data"
+
+
+def seed(collection, num_cells, changed_fraction, padding, batch_size=10000):
+    rng = np.random.default_rng(0)
+    kpi = rng.uniform(0, 100, size=(num_cells, len(KPI_KEYS))).round(2)
+    base_epoch = 1_700_000_000
+    num_changed = int(num_cells * changed_fraction)
+    docs = []
+    for i in range(num_cells):
+        doc = {"_key": str(i + 1), "cell_id": i + 1, **dict(zip(KPI_KEYS, kpi[i].tolist()))}
+        doc["timestamp"] = "01/01/2025 00:00:00"
+        doc["kpi_write_seq"] = base_epoch + (60 if i < num_changed else 0)
+        doc["color"] = "green"
+        doc["last_congestion_update"] = "01/01/2025 00:00:05"
+        doc["notes"] = "x" * padding
+        docs.append(doc)
+        if len(docs) == batch_size:
+            collection.insert_many(docs, silent=True)
+            docs = []
+    if docs:
+        collection.insert_many(docs, silent=True)
+    return base_epoch
+
+
+def measure(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, len(result), len(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8529")
+    parser.add_argument("--password", default="yourpassword")
+    parser.add_argument("--cells", type=int, default=100000)
+    parser.add_argument("--changed", type=float, default=0.01, help="fraction of cells newer than the watermark")
+    parser.add_argument("--padding", type=int, default=256, help="bytes of unused payload per document")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    db = ArangoClient(hosts=args.url).db("_system", username="root", password=args.password)
+    if db.has_collection(SCRATCH_COLLECTION):
+        db.delete_collection(SCRATCH_COLLECTION)
+    collection = db.create_collection(SCRATCH_COLLECTION)
+    try:
+        start = time.perf_counter()
+        watermark = seed(collection, args.cells, args.changed, args.padding)
+        for spec in INDEXES["traffic_data"]:
+            collection.add_index(dict(spec))
+        print(f"Seeded {args.cells} documents in {time.perf_counter() - start:.1f}s")
+
+        cases = [
+            ("all()", lambda: list(collection.all())),
+            ("keep", lambda: fetch_dashboard_nodes(db, SCRATCH_COLLECTION, args.batch_size)),
+            ("kpi rows", lambda: fetch_kpi_rows(db, SCRATCH_COLLECTION, args.batch_size)),
+            ("stamps", lambda: list(iter_rows(db, SCRATCH_COLLECTION, ["d._key", "d.timestamp"], args.batch_size))),
+            ("changed (index)", lambda: kpi_changes_since(db, SCRATCH_COLLECTION, watermark, args.batch_size)),
+            ("latest (index)", lambda: [latest_value(db, SCRATCH_COLLECTION, "kpi_write_seq")]),
+        ]
+        print(f"{'query':>16} {'best s':>9} {'rows':>9} {'payload MB':>11}")
+        for name, fn in cases:
+            elapsed, rows, size = measure(fn, args.repeat)
+            print(f"{name:>16} {elapsed:>9.3f} {rows:>9} {size / 1e6:>11.2f}")
+    finally:
+        db.delete_collection(SCRATCH_COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+KPI rollup maintenance cost and one-cell history reads: raw rows vs rollups.
+
+For every size, --days of synthetic KPI batches (one every --interval
+seconds for every cell) are appended to a temporary KPI store and fed
+through KpiRollups batch by batch, as the ingester does. Reported:
+
+    poll ms/batch   mean and max time per batch to buffer rows and close buckets
+    docs            rollup documents written (1m + 15m + 1h)
+    raw history     read the KPI store and aggregate one cell's rows for the
+                    whole range (what a history view costs without rollups)
+    rollup history  the same cell's series from the rollup documents through
+                    a sorted (cell_id, resolution, bucket) index, the
+                    in-memory counterpart of idx_cell_resolution_bucket
+
+    python benchmarks/bench_rollups.py [--sizes 100 1000] [--days 7] [--interval 60]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HOURS_PER_PART = 6  # batches are concatenated into one store part per this many hours
+
+
+def _run_size(num_cells, args, queue):
+    import numpy as np
+    import pandas as pd
+
+    from network_health.kpi_store import TIMESTAMP_FORMAT, KpiReader, ParquetKpiStore
+    from network_health.rollups import RESOLUTIONS, STATISTICS, KpiRollups, choose_resolution
+    from network_health.synthetic import generate_rows
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ParquetKpiStore(os.path.join(tmp, "kpi_store"))
+        rollups = KpiRollups(os.path.join(tmp, "rollup_state.json"))
+        current = datetime(2026, 1, 1)
+        batches = int(args.days * 86400 / args.interval)
+        per_part = max(1, HOURS_PER_PART * 3600 // args.interval)
+        # Only the columns the history read needs are kept from each rollup document.
+        keep, counts, poll_seconds, part, offset = [], dict.fromkeys(RESOLUTIONS, 0), [], [], 0
+        for i in range(batches):
+            batch = pd.DataFrame(generate_rows(current, num_cells))
+            batch.index = pd.RangeIndex(offset, offset + len(batch))
+            offset += len(batch)
+            current += timedelta(seconds=args.interval)
+            start = time.perf_counter()
+            docs = rollups.poll(batch)
+            rollups.commit()
+            poll_seconds.append(time.perf_counter() - start)
+            for doc in docs:
+                counts[doc["resolution"]] += 1
+            keep.append(pd.DataFrame({
+                "cell_id": [d["cell_id"] for d in docs], "resolution": [d["resolution"] for d in docs],
+                "bucket": [d["bucket"] for d in docs],
+                **{stat: [d["latency_ms"][i] for d in docs] for i, stat in enumerate(STATISTICS)},
+            }))
+            part.append(batch)
+            if len(part) == per_part or i == batches - 1:
+                store.append(pd.concat(part, ignore_index=True))
+                part = []
+
+        cell = num_cells // 2
+        seconds = int(args.days * 86400)
+        start = time.perf_counter()
+        raw = KpiReader(store.root).read_all(columns=["timestamp", "cell_id", "latency_ms"])
+        raw = raw[raw["cell_id"] == cell]
+        ts = pd.to_datetime(raw["timestamp"], format=TIMESTAMP_FORMAT)
+        raw.groupby(ts.dt.floor("h"))["latency_ms"].agg(["min", "mean", "max"])
+        raw_seconds = time.perf_counter() - start
+
+        index = pd.concat(keep, ignore_index=True).set_index(["cell_id", "resolution", "bucket"]).sort_index()
+        resolution = choose_resolution(seconds)
+        samples = []
+        for _ in range(20):
+            start = time.perf_counter()
+            series = index.loc[(cell, resolution)]
+            samples.append(time.perf_counter() - start)
+
+    queue.put({
+        "cells": num_cells, "rows": offset, "batches": batches, "docs": counts,
+        "poll_mean": float(np.mean(poll_seconds)), "poll_max": float(np.max(poll_seconds)),
+        "raw_rows": len(raw), "raw_seconds": raw_seconds,
+        "resolution": resolution, "points": len(series), "rollup_seconds": statistics.median(samples),
+    })
+
+
+def run_size(num_cells, args):
+    ctx = get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_size, args=(num_cells, args, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--interval", type=int, default=60, help="seconds between KPI batches")
+    args = parser.parse_args()
+
+    print(f"{'cells':>7} {'rows':>10} {'poll ms/batch':>14} {'max ms':>8} {'docs 1m/15m/1h':>22} "
+          f"{'raw history':>19} {'rollup history':>22}")
+    for n in args.sizes:
+        r = run_size(n, args)
+        docs = "/".join(str(v) for v in r["docs"].values())
+        print(f"{r['cells']:>7} {r['rows']:>10} {r['poll_mean'] * 1000:>14.2f} {r['poll_max'] * 1000:>8.1f} {docs:>22} "
+              f"{r['raw_seconds'] * 1000:>9.1f} ms/{r['raw_rows']:>6} rows "
+              f"{r['rollup_seconds'] * 1000:>7.2f} ms/{r['points']:>4} x {r['resolution']}")
+
+
+if __name__ == "__main__":
+    main()
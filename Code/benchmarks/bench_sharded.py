@@ -0,0 +1,97 @@
+"""
+Sharded scoring benchmark: one full model pass vs. ShardedScorer.
+
+The synthetic network has `regions` clusters of cells with dense edges
+inside a region and a few sparse links between regions, like a multi-region
+deployment. For every worker count the scorer is warmed up once (pool
+start-up, shard plan) and then timed; embeddings are checked against the
+single-process pass. Every process runs one torch thread, so the speedup
+column is process-level scaling rather than a comparison with torch's
+intra-op threading. Worker counts above the number of cores are measured
+but flagged: they cannot scale.
+
+    python benchmarks/bench_sharded.py [--cells 200000] [--regions 16] [--workers 1 2 4 8]
+                                       [--strategy metis|bfs|components]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import torch
+
+from network_health.graph_build import arrays_from_rows, build_hetero_data
+from network_health.kpis import KPI_KEYS
+from network_health.model import CongestionModel, edge_index_dict
+from network_health.sharded import ShardedScorer
+
+
+def regional_rows(num_cells, regions, degree, cross_links, seed=0):
+    """
+    [cell_id, *kpis] rows and [_from, _to] edge rows; cross_links is the
+    fraction of edges that connect two different regions.
+    """
+    rng = np.random.default_rng(seed)
+    kpi = rng.uniform(0, 100, size=(num_cells, len(KPI_KEYS))).round(2)
+    cells = np.column_stack([np.arange(1, num_cells + 1), kpi]).tolist()
+    region = np.arange(num_cells) * regions // num_cells
+    starts = np.searchsorted(region, np.arange(regions))
+    sizes = np.bincount(region, minlength=regions)
+    num_edges = num_cells * degree // 2
+    src = rng.integers(0, num_cells, size=num_edges)
+    dst_region = np.where(rng.random(num_edges) < cross_links, rng.integers(0, regions, size=num_edges), region[src])
+    dst = starts[dst_region] + (rng.random(num_edges) * sizes[dst_region]).astype(np.int64)
+    edge_rows = [[f"traffic_data/{a + 1}", f"traffic_data/{b + 1}"] for a, b in zip(src.tolist(), dst.tolist())]
+    return cells, edge_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cells", type=int, default=200000)
+    parser.add_argument("--regions", type=int, default=16)
+    parser.add_argument("--degree", type=int, default=6)
+    parser.add_argument("--cross-links", type=float, default=0.001)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--strategy", default="metis", help="shard strategy (segments.STRATEGIES)")
+    args = parser.parse_args()
+    torch.set_num_threads(1)
+
+    cells, edge_rows = regional_rows(args.cells, args.regions, args.degree, args.cross_links)
+    data, _ = build_hetero_data(arrays_from_rows(cells, edge_rows))
+    del cells, edge_rows
+    torch.manual_seed(0)
+    model = CongestionModel()
+    model.fit_normalization(data["devicekpi"].x)
+    model.eval()
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        with torch.no_grad():
+            reference = model.embed(data.x_dict, edge_index_dict(data))
+            model.classifier(reference)
+        best = min(best, time.perf_counter() - start)
+    cores = os.cpu_count() or 1
+    print(f"cores={cores} strategy={args.strategy} cells={args.cells} edges={data['device', 'connected_to', 'device'].edge_index.shape[1]}")
+    print(f"{'workers':>8} {'shards':>7} {'best s':>9} {'speedup':>8} {'halo x':>7} {'max diff':>9}")
+    print(f"{'eager':>8} {1:>7} {best:>9.3f} {1.0:>8.2f} {1.0:>7.2f} {0.0:>9.1e}")
+    for workers in args.workers:
+        scorer = ShardedScorer(num_shards=workers, workers=workers, strategy=args.strategy)
+        embeddings, _ = scorer.embed(model, data)  # warm-up: pool start and shard plan
+        timed = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            embeddings, _ = scorer.embed(model, data)
+            timed = min(timed, time.perf_counter() - start)
+        diff = (embeddings - reference).abs().max().item()
+        print(f"{workers:>8} {len(scorer.plan.shards):>7} {timed:>9.3f} {best / timed:>8.2f} "
+              f"{scorer.plan.replication:>7.2f} {diff:>9.1e}" + ("  (more workers than cores)" if workers > cores else ""))
+        scorer.close()
+
+
+if __name__ == "__main__":
+    main()
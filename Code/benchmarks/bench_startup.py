@@ -0,0 +1,98 @@
+"""
+Startup cost of every CLI subcommand, measured with `python -X importtime`.
+
+For each subcommand a fresh interpreter imports the command module (what
+`python -m network_health <command>` loads before it does any work) and
+the import time is compared with the command's budget. The CLI itself is
+measured the same way: `--help` and `--print-config` import nothing else.
+Reported per command:
+
+    import s      total import time (sum of the per-module self times)
+    wall s        median wall time of `python -c "import <module>"`, interpreter start included
+    budget s      BUDGETS entry; the script exits non-zero when a command is over it
+    heaviest      the top-level packages that contribute most of the import time
+
+A command whose dependencies are not installed (e.g. Dash for dashboard) is
+reported as unavailable and does not fail the run.
+
+    python benchmarks/bench_startup.py [--commands score train] [--repeat 3]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# command -> (module imported at startup, import-time budget in seconds)
+BUDGETS = {
+    "cli": ("network_health.cli", 0.25),
+    "generate": ("network_health.commands.generate", 1.5),
+    "ingest": ("network_health.commands.ingest", 1.0),
+    "pipeline": ("network_health.commands.pipeline", 2.0),
+    "dashboard": ("network_health.commands.dashboard", 3.0),
+    "score": ("network_health.commands.score", 3.5),
+    "simulate": ("network_health.commands.simulate", 3.5),
+    "train": ("network_health.commands.train", 5.0),
+}
+
+
+def import_profile(module):
+    """
+    (total seconds, {top-level package: seconds}) of importing module in a
+    fresh interpreter, or None when the import fails.
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=CODE_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    packages = defaultdict(float)
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1e6
+    return sum(packages.values()), packages
+
+
+def wall_time(module, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=CODE_DIR, check=True, capture_output=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", nargs="+", choices=list(BUDGETS), default=list(BUDGETS))
+    parser.add_argument("--repeat", type=int, default=3, help="wall-time runs per command")
+    parser.add_argument("--top", type=int, default=3, help="heaviest packages listed per command")
+    args = parser.parse_args()
+
+    over = []
+    print(f"{'command':<10} {'import s':>9} {'wall s':>8} {'budget s':>9}  {'status':<11} heaviest")
+    for command in args.commands:
+        module, budget = BUDGETS[command]
+        profile = import_profile(module)
+        if profile is None:
+            print(f"{command:<10} {'-':>9} {'-':>8} {budget:>9.2f}  {'unavailable':<11} (import failed)")
+            continue
+        total, packages = profile
+        heaviest = sorted(packages.items(), key=lambda item: -item[1])[:args.top]
+        status = "ok" if total <= budget else "OVER"
+        if total > budget:
+            over.append(command)
+        print(f"{command:<10} {total:>9.2f} {wall_time(module, args.repeat):>8.2f} {budget:>9.2f}  {status:<11} "
+              + ", ".join(f"{name} {seconds:.2f}" for name, seconds in heaviest))
+    if over:
+        print(f"Over budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
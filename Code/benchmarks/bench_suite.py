@@ -0,0 +1,326 @@
+"""
+End-to-end benchmark suite on synthetic production-scale topologies.
+
+For every size a SyntheticNetwork (hexagonal or geometric layout, k nearest
+neighbour links, spatially correlated congestion hotspots) is generated and
+pushed through the same code paths the scripts use, timing each stage:
+
+    generate            topology, hotspot load and one KPI batch
+    ingest              KPI store append + WatermarkIngester.poll()
+    db_write            traffic_data upserts and cell_edges inserts (BulkWriter)
+    graph_build         projected reads + arrays_from_rows + build_hetero_data
+    topology_build      compile cell_edges into a CSR snapshot (topology.TopologyStore)
+    graph_build_mmap    graph_build with the edges from a freshly opened snapshot
+    message_passing     one full model pass (embeddings + classifier)
+    training            train_model() on the graph
+    segment_formation   SegmentPartitioner + SegmentAggregator
+    prediction_write    prediction updates and SegmentPrediction replaces
+    dashboard_elements  projected node reads + Cytoscape element build
+    dashboard_elements_mmap  the same with edge elements from the snapshot (second build, cached)
+    layout              server-side node positions (layout.LayoutCache, first computation)
+
+--target memory (default) uses network_health.memory_db, --target arango a
+local ArangoDB (collections are prefixed with --prefix and truncated first).
+Each size runs in a fresh subprocess so peak memory is per size. Before
+timing, the subprocess pushes a small --warmup-cells network through every
+stage untimed (in memory), so one-time costs such as torch_geometric and
+HeteroData initialisation and lazy imports are not charged to the
+first stage that happens to hit them. Results
+are written as JSON (commit, environment, per-stage seconds) and can be
+compared against an earlier run with --compare.
+
+    python benchmarks/bench_suite.py [--sizes 1000 10000 100000] [--layout hex] [--degree 6]
+                                     [--target memory|arango] [--compare results/old.json]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STAGES = (
+    "generate", "ingest", "db_write", "graph_build", "topology_build", "graph_build_mmap", "message_passing",
+    "training", "segment_formation", "prediction_write", "dashboard_elements", "dashboard_elements_mmap", "layout",
+)
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+class Target:
+    """
+    Database the stages write to and read from: ArangoDB or the in-memory stand-in.
+    """
+
+    def __init__(self, kind, prefix, args):
+        self.kind = kind
+        self.traffic = f"{prefix}traffic_data"
+        self.edges = f"{prefix}cell_edges"
+        self.segments = f"{prefix}SegmentPrediction"
+        self.batch_size = args.read_batch_size
+        if kind == "memory":
+            from network_health.memory_db import MemoryDatabase
+
+            self.db = MemoryDatabase()
+        else:
+            from arango import ArangoClient
+
+            self.db = ArangoClient(hosts=args.arango_url).db(args.db_name, username=args.username,
+                                                              password=args.password)
+        for name, edge in ((self.traffic, False), (self.edges, True), (self.segments, False)):
+            if self.db.has_collection(name):
+                self.db.collection(name).truncate()
+            else:
+                self.db.create_collection(name, edge=edge)
+        if kind == "arango":
+            from network_health.data_access import ensure_indexes
+
+            ensure_indexes(self.db, {"traffic_data": self.traffic, "SegmentPrediction": self.segments})
+
+    def kpi_rows(self):
+        if self.kind == "memory":
+            return self.db.kpi_rows(self.traffic)
+        from network_health.data_access import fetch_kpi_rows
+
+        return fetch_kpi_rows(self.db, self.traffic, self.batch_size)
+
+    def edge_rows(self, with_relation=False):
+        if self.kind == "memory":
+            return self.db.edge_rows(self.edges, with_relation)
+        from network_health.data_access import fetch_edge_rows
+
+        return fetch_edge_rows(self.db, self.edges, self.batch_size, with_relation=with_relation)
+
+    def dashboard_nodes(self):
+        if self.kind == "memory":
+            return self.db.dashboard_nodes(self.traffic)
+        from network_health.data_access import fetch_dashboard_nodes
+
+        return fetch_dashboard_nodes(self.db, self.traffic, self.batch_size)
+
+
+def _run_stages(num_cells, target, args, timings, counts):
+    import torch
+
+    from network_health.arango_writer import BulkWriter
+    from network_health.dashboard_cache import cell_elements, edge_element, node_element, sort_elements
+    from network_health.layout import LayoutCache
+    from network_health.graph_build import arrays_from_rows, build_hetero_data
+    from network_health.ingest import WatermarkIngester
+    from network_health.kpi_store import KpiReader, ParquetKpiStore
+    from network_health.model import CongestionModel, edge_index_dict
+    from network_health.scoring import prediction_documents
+    from network_health.segment_scoring import SegmentAggregator, global_threshold_fail, segment_documents
+    from network_health.segments import SegmentPartitioner
+    from network_health.synthetic import SyntheticNetwork
+    from network_health.topology import TopologyStore
+    from network_health.training import train_model
+
+    @contextlib.contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        yield
+        timings[name] = time.perf_counter() - start
+
+    now = datetime.now()
+    with tempfile.TemporaryDirectory() as tmp:
+        with stage("generate"):
+            network = SyntheticNetwork(num_cells, args.layout, args.degree, args.hotspots, args.radius, args.seed)
+            frame = network.frame(now)
+        counts["edges"] = int(network.edges.shape[1])
+
+        with stage("ingest"):
+            ParquetKpiStore(os.path.join(tmp, "kpi_store")).append(frame)
+            ingester = WatermarkIngester(KpiReader(os.path.join(tmp, "kpi_store")), os.path.join(tmp, "ingest.json"))
+            docs = ingester.poll()
+        del frame
+
+        edge_docs = [{"_key": f"{a}-{b}", "_from": f"{target.traffic}/{a + 1}", "_to": f"{target.traffic}/{b + 1}"}
+                     for a, b in network.edges.T.tolist()]
+        with stage("db_write"):
+            report = BulkWriter(target.db, target.traffic, "upsert", args.write_batch_size).write(docs)
+            ingester.commit(report.failed_keys)
+            BulkWriter(target.db, target.edges, "upsert", args.write_batch_size).write(edge_docs)
+        counts["write_errors"] = len(report.errors)
+        del docs, edge_docs
+
+        with stage("graph_build"):
+            arrays = arrays_from_rows(target.kpi_rows(), target.edge_rows(), target.traffic)
+            data, labels = build_hetero_data(arrays)
+        counts["congested"] = int(labels.sum())
+
+        topology_dir = os.path.join(tmp, "topology")
+        fetch_rows = lambda: target.edge_rows(with_relation=True)  # noqa: E731
+        with stage("topology_build"):
+            TopologyStore(topology_dir, target.db, target.edges, target.traffic, fetch_rows=fetch_rows).current()
+        with stage("graph_build_mmap"):
+            snapshot = TopologyStore(topology_dir, target.db, target.edges, target.traffic).current()
+            data, labels = build_hetero_data(arrays_from_rows(target.kpi_rows(), snapshot, target.traffic))
+
+        torch.manual_seed(args.seed)
+        model = CongestionModel(num_features=data["devicekpi"].x.shape[1], device_features=data["device"].x.shape[1])
+        model.fit_normalization(data["devicekpi"].x)
+        model.eval()
+        with stage("message_passing"):
+            with torch.no_grad():
+                embeddings = model.embed(data.x_dict, edge_index_dict(data))
+                predicted = model.classifier(embeddings).argmax(dim=1).numpy()
+
+        if torch.bincount(labels, minlength=2).min() >= 2:
+            with stage("training"):
+                train_model(data, labels, epochs=args.epochs, seed=args.seed, log_every=0)
+        else:
+            timings["training"] = None  # stratified split needs two samples per class
+
+        with stage("segment_formation"):
+            device_segment = SegmentPartitioner(args.segment_strategy, args.segment_size).partition(
+                arrays.device_keys, arrays.device_edges
+            )
+            aggregator = SegmentAggregator(device_segment).compute(embeddings)
+        counts["segments"] = int(aggregator.num_segments)
+
+        device_keys = arrays.device_keys.tolist()
+        with stage("prediction_write"):
+            updated_at = now.strftime("%m/%d/%Y %H:%M:%S")
+            BulkWriter(target.db, target.traffic, "update", args.write_batch_size).write(
+                prediction_documents(device_keys, predicted, range(len(device_keys)), updated_at)
+            )
+            fail, threshold = global_threshold_fail(aggregator.norms_of(torch.arange(aggregator.num_segments)))
+            BulkWriter(target.db, target.segments, "replace", args.write_batch_size).write(
+                segment_documents(aggregator, fail, threshold, device_keys, updated_at)
+            )
+
+        with stage("dashboard_elements"):
+            elements = [node_element(doc) for doc in target.dashboard_nodes()]
+            elements.extend(edge_element(*row) for row in target.edge_rows(with_relation=True))
+            sort_elements(elements)
+        counts["elements"] = len(elements)
+        cell_elements(target.dashboard_nodes(), snapshot)
+        with stage("dashboard_elements_mmap"):
+            cell_elements(target.dashboard_nodes(), snapshot)
+
+        if num_cells <= args.layout_max_cells:
+            with stage("layout"):
+                LayoutCache(algorithm=args.layout_algorithm).update(arrays.device_keys, arrays.device_edges)
+        else:
+            timings["layout"] = None
+
+
+def _run_size(num_cells, args, queue):
+    import torch
+
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+    if args.warmup_cells:
+        _run_stages(args.warmup_cells, Target("memory", args.prefix, args), args, {}, {})
+    timings = {}
+    counts = {"cells": num_cells}
+    _run_stages(num_cells, Target(args.target, args.prefix, args), args, timings, counts)
+    counts["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    queue.put({"counts": counts, "stages": timings})
+
+
+def run_size(num_cells, args):
+    ctx = get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_size, args=(num_cells, args, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def environment():
+    import numpy as np
+    import torch
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cores": os.cpu_count(),
+    }
+
+
+def print_run(run, baseline=None):
+    counts, stages = run["counts"], run["stages"]
+    print(f"\ncells={counts['cells']} edges={counts['edges']} congested={counts['congested']} "
+          f"segments={counts['segments']} peak={counts['peak_rss_mb']} MB")
+    print(f"{'stage':>24} {'seconds':>9} {'baseline':>9} {'ratio':>7}")
+    for name in STAGES:
+        seconds = stages.get(name)
+        before = (baseline or {}).get(name)
+        ratio = seconds / before if seconds and before else None
+        print(f"{name:>24} {_fmt(seconds):>9} {_fmt(before):>9} {_fmt(ratio, '.2f'):>7}")
+
+
+def _fmt(value, spec=".3f"):
+    return "-" if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--layout", choices=("hex", "geometric"), default="hex")
+    parser.add_argument("--degree", type=int, default=6)
+    parser.add_argument("--hotspots", type=int, default=None, help="default: one per 500 cells")
+    parser.add_argument("--radius", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--epochs", type=int, default=100)
+    parser.add_argument("--segment-strategy", default="bfs")
+    parser.add_argument("--segment-size", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--warmup-cells", type=int, default=200,
+                        help="untimed warm-up network pushed through every stage first (0: none)")
+    parser.add_argument("--layout-algorithm", choices=("auto", "spring", "spectral"), default="auto")
+    parser.add_argument("--layout-max-cells", type=int, default=200000, help="skip the layout stage above this size")
+    parser.add_argument("--target", choices=("memory", "arango"), default="memory")
+    parser.add_argument("--prefix", default="bench_", help="collection name prefix for --target arango")
+    parser.add_argument("--arango-url", default="http://localhost:8529")
+    parser.add_argument("--db-name", default="_system")
+    parser.add_argument("--username", default="root")
+    parser.add_argument("--password", default="yourpassword")
+    parser.add_argument("--read-batch-size", type=int, default=10000)
+    parser.add_argument("--write-batch-size", type=int, default=1000)
+    parser.add_argument("--output", default=None, help=f"result file (default: {RESULTS_DIR}/<commit>-<time>.json)")
+    parser.add_argument("--compare", default=None, help="earlier result file to compare stage times against")
+    args = parser.parse_args()
+
+    baselines = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            baselines = {run["counts"]["cells"]: run["stages"] for run in json.load(fh)["runs"]}
+
+    result = {"environment": environment(), "config": vars(args), "runs": []}
+    print(f"target={args.target} layout={args.layout} degree={args.degree} commit={result['environment']['commit']}")
+    for n in args.sizes:
+        run = run_size(n, args)
+        result["runs"].append(run)
+        print_run(run, baselines.get(n))
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        commit = (result["environment"]["commit"] or "nogit")[:10]
+        output = os.path.join(RESULTS_DIR, f"{commit}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, indent=2)
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+What-if simulator throughput (scenarios per second on CPU).
+
+For every size a synthetic topology is built, a freshly initialised model
+(normalization fitted to the KPIs) is taken as the trained one, and the
+devices are partitioned into segments. --scenarios random scenarios each
+saturate --cells-per-scenario cells. Reported per spill setting:
+
+    parse s/s     WhatIfSimulator.deltas(): scenario dicts -> KPI delta arrays
+    batched s/s   run_deltas(): all scenarios in batches of --batch-size
+                  (default: sized to MAX_BATCH_ELEMENTS), summaries only
+    loop s/s      one scoring pass per scenario, as re-running congestion.py
+                  would (without the database): edit the KPIs, the compiled
+                  fixed-schema forward pass, segment aggregation and the
+                  global threshold; timed on --loop-scenarios scenarios
+    speedup       batched / loop
+
+The first scenarios of each run are checked against the loop: the largest
+probability difference and the number of segment statuses that disagree
+are printed.
+
+    python benchmarks/bench_whatif.py [--sizes 1000 10000] [--scenarios 4096] [--spill 0 0.3]
+"""
+import argparse
+import os
+import sys
+import time
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _run_size(num_cells, args, queue):
+    from datetime import datetime
+
+    import numpy as np
+    import torch
+
+    from network_health.export import FixedSchemaCongestion
+    from network_health.graph_build import GraphArrays, device_identity_features
+    from network_health.kpis import KPI_KEYS
+    from network_health.model import CongestionModel
+    from network_health.segment_scoring import SegmentAggregator, global_threshold_fail
+    from network_health.segments import SegmentPartitioner
+    from network_health.synthetic import SyntheticNetwork
+    from network_health.whatif import WhatIfSimulator
+
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+    torch.manual_seed(args.seed)
+    network = SyntheticNetwork(num_cells, args.layout, args.degree, seed=args.seed)
+    frame = network.frame(datetime.now())
+    arrays = GraphArrays(frame["cell_id"].astype(str).to_numpy(), frame[KPI_KEYS].to_numpy("float32"), network.edges)
+    model = CongestionModel().eval()
+    model.fit_normalization(torch.from_numpy(arrays.kpi))
+    device_segment = SegmentPartitioner("bfs", args.segment_size).partition(arrays.device_keys, arrays.device_edges)
+
+    rng = np.random.default_rng(args.seed)
+    keys = arrays.device_keys.tolist()
+    scenarios = [{"saturate": rng.choice(keys, args.cells_per_scenario, replace=False).tolist()}
+                 for _ in range(args.scenarios)]
+    names = [str(s) for s in range(args.scenarios)]
+
+    # One scoring pass per scenario: the compiled forward pass over the edited KPIs.
+    fixed = FixedSchemaCongestion(model).eval()
+    x_device = torch.from_numpy(device_identity_features(arrays.device_keys))
+    edges = torch.from_numpy(arrays.device_edges)
+
+    def score_once(deltas):
+        _, device, column, delta = deltas
+        kpi = arrays.kpi.copy()
+        np.add.at(kpi, (device, column), delta)
+        with torch.no_grad():
+            embeddings, logits = fixed(x_device, torch.from_numpy(kpi), edges)
+        fail, _ = global_threshold_fail(SegmentAggregator(device_segment).compute(embeddings).norms)
+        return torch.softmax(logits, dim=1)[:, 1].numpy(), fail.numpy()
+
+    # The per-scenario loop does not depend on spill (it has none); time it once.
+    reference = WhatIfSimulator(model, arrays, device_segment)
+    loop_count = min(args.loop_scenarios, args.scenarios)
+    loop_results = []
+    start = time.perf_counter()
+    for s in range(loop_count):
+        loop_results.append(score_once(reference.deltas([scenarios[s]])))
+    loop_rate = loop_count / (time.perf_counter() - start)
+
+    rows = []
+    for spill in args.spill:
+        simulator = WhatIfSimulator(model, arrays, device_segment, spill=spill, hops=args.hops,
+                                    batch_size=args.batch_size)
+        start = time.perf_counter()
+        deltas = simulator.deltas(scenarios)
+        parse_seconds = time.perf_counter() - start
+        result = simulator.run_deltas(names, *deltas, keep_matrices=False)
+        row = {"spill": spill, "batch": simulator.batch_size or "auto", "parse": args.scenarios / parse_seconds,
+               "batched": result.scenarios_per_second, "loop": loop_rate, "max_error": None, "mismatched": None}
+        if not spill:
+            check = min(args.check, loop_count)
+            kept = simulator.run(scenarios[:check])
+            row["max_error"] = max(float(np.abs(p - kept.probability[s]).max())
+                                   for s, (p, _) in enumerate(loop_results[:check]))
+            row["mismatched"] = sum(int((f != kept.fail[s]).sum()) for s, (_, f) in enumerate(loop_results[:check]))
+        rows.append(row)
+    queue.put({"cells": num_cells, "edges": int(network.edges.shape[1]), "segments": len(np.unique(device_segment)),
+               "rows": rows})
+
+
+def run_size(num_cells, args):
+    ctx = get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_size, args=(num_cells, args, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--scenarios", type=int, default=4096)
+    parser.add_argument("--cells-per-scenario", type=int, default=3)
+    parser.add_argument("--spill", type=float, nargs="+", default=[0.0, 0.3])
+    parser.add_argument("--hops", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=None, help="scenarios per batch (default: auto)")
+    parser.add_argument("--loop-scenarios", type=int, default=50, help="scenarios timed one scoring pass each")
+    parser.add_argument("--check", type=int, default=20, help="scenarios compared with the per-scenario loop")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--layout", choices=("hex", "geometric"), default="hex")
+    parser.add_argument("--degree", type=int, default=6)
+    parser.add_argument("--segment-size", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        r = run_size(n, args)
+        print(f"\ncells={r['cells']} edges={r['edges']} segments={r['segments']} scenarios={args.scenarios}")
+        print(f"{'spill':>6} {'batch':>6} {'parse s/s':>10} {'batched s/s':>12} {'loop s/s':>9} {'speedup':>8}  check")
+        for row in r["rows"]:
+            check = ("(loop has no spill)" if row["max_error"] is None else
+                     f"max |p - loop| = {row['max_error']:.1e}, {row['mismatched']} FAIL statuses differ")
+            print(f"{row['spill']:>6.2f} {row['batch']:>6} {row['parse']:>10.0f} {row['batched']:>12.0f} "
+                  f"{row['loop']:>9.1f} {row['batched'] / row['loop']:>7.0f}x  {check}")
+
+
+if __name__ == "__main__":
+    main()
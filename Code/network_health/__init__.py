@@ -0,0 +1,10 @@
+"""
+Shared building blocks for the network health monitor.
+
+The commands (data generator, ArangoDB updater, training, congestion
+scoring, what-if simulation, dashboard and pipeline) live in ``network_health.commands`` and
+run through ``python -m network_health`` (``network_health.cli``); the
+top-level scripts in ``Code/`` are wrappers around them. They import their
+storage and data-access helpers from this package so that they all agree
+on formats and APIs.
+"""
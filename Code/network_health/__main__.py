@@ -0,0 +1,5 @@
+import sys
+
+from network_health.cli import main
+
+sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Batched ArangoDB write layer.
+
+Instead of one has() plus one update()/insert() HTTP round trip per
+document, documents are grouped into batches of batch_size and sent with a
+single insert_many()/update_many() call (or one AQL UPSERT over a bind
+variable array). Every flush returns a FlushReport with per-document
+errors, throughput and batch latency percentiles, and every flush is
+recorded in the arango_write_* metrics (see instrumentation.py).
+"""
+import logging
+import time
+
+import numpy as np
+
+from network_health.instrumentation import counter, histogram, log_sampled
+
+# mode -> how a batch is sent
+#   "upsert":  insert_many(overwrite_mode="update")  insert new, merge into existing
+#   "replace": insert_many(overwrite_mode="replace") insert new, replace existing
+#   "update":  update_many()                        existing documents only
+MODES = ("upsert", "replace", "update")
+
+WRITE_BATCH_SECONDS = histogram("arango_write_batch_seconds", "Latency of one write batch", ("collection", "mode"))
+WRITE_DOCUMENTS = counter("arango_write_documents_total", "Documents sent to ArangoDB",
+                          ("collection", "mode", "outcome"))
+
+
+def record_flush(report, collection, mode):
+    """
+    Add a FlushReport to the write metrics.
+    """
+    for latency in report.batch_latencies:
+        WRITE_BATCH_SECONDS.observe(latency, collection=collection, mode=mode)
+    WRITE_DOCUMENTS.inc(report.written, collection=collection, mode=mode, outcome="ok")
+    WRITE_DOCUMENTS.inc(len(report.errors), collection=collection, mode=mode, outcome="error")
+    return report
+
+
+class FlushReport:
+    """
+    Outcome of one BulkWriter.write() call.
+    errors is a list of (document _key, error message) pairs.
+    """
+
+    def __init__(self, label, written, errors, batch_latencies, elapsed):
+        self.label = label
+        self.written = written
+        self.errors = errors
+        self.batch_latencies = batch_latencies
+        self.elapsed = elapsed
+
+    @property
+    def failed_keys(self):
+        return [key for key, _ in self.errors]
+
+    @property
+    def throughput(self):
+        return self.written / self.elapsed if self.elapsed > 0 else 0.0
+
+    def latency_percentile(self, q):
+        if not self.batch_latencies:
+            return 0.0
+        return float(np.percentile(self.batch_latencies, q))
+
+    def summary(self):
+        return (
+            f"{self.label}: wrote {self.written} docs in {len(self.batch_latencies)} batches, "
+            f"{len(self.errors)} errors, {self.throughput:.0f} docs/s, "
+            f"p50={self.latency_percentile(50) * 1000:.1f}ms p99={self.latency_percentile(99) * 1000:.1f}ms"
+        )
+
+    def log(self, log, level=logging.INFO):
+        """
+        Log the summary at `level` and a sample of the per-document errors
+        as warnings.
+        """
+        log.log(level, self.summary())
+        log_sampled(log, (("%s failed for %s: %s", self.label, key, error) for key, error in self.errors))
+
+
+class BulkWriter:
+    """
+    Sends documents to one collection in batches.
+
+    strategy="documents" uses the document API (insert_many/update_many) and
+    reports errors per document. strategy="aql" runs one UPSERT query per
+    batch; a failing batch reports every document in it as failed.
+    """
+
+    def __init__(self, db, collection_name, mode="upsert", batch_size=1000, strategy="documents"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown write mode {mode!r}; expected one of {MODES}")
+        if strategy not in ("documents", "aql"):
+            raise ValueError(f"Unknown write strategy {strategy!r}")
+        if strategy == "aql" and mode == "update":
+            raise ValueError("The AQL strategy only supports 'upsert' and 'replace' modes")
+        self.db = db
+        self.collection_name = collection_name
+        self.collection = db.collection(collection_name)
+        self.mode = mode
+        self.batch_size = batch_size
+        self.strategy = strategy
+
+    def _send_documents(self, batch):
+        if self.mode == "update":
+            results = self.collection.update_many(batch, silent=False)
+        else:
+            overwrite_mode = "update" if self.mode == "upsert" else "replace"
+            results = self.collection.insert_many(batch, overwrite_mode=overwrite_mode, silent=False)
+        errors = []
+        for doc, result in zip(batch, results):
+            if isinstance(result, Exception):
+                errors.append((doc.get("_key"), str(result)))
+        return errors
+
+    def _send_aql(self, batch):
+        action = "UPDATE d" if self.mode == "upsert" else "REPLACE d"
+        query = f"FOR d IN @docs UPSERT {{ _key: d._key }} INSERT d {action} IN @@col"
+        try:
+            self.db.aql.execute(query, bind_vars={"docs": batch, "@col": self.collection_name})
+        except Exception as e:
+            return [(doc.get("_key"), str(e)) for doc in batch]
+        return []
+
+    def write(self, docs, label=None):
+        """
+        Write all docs and return a FlushReport.
+        """
+        docs = list(docs)
+        label = label or self.collection_name
+        send = self._send_aql if self.strategy == "aql" else self._send_documents
+
+        errors = []
+        latencies = []
+        start = time.perf_counter()
+        for i in range(0, len(docs), self.batch_size):
+            batch = docs[i:i + self.batch_size]
+            t0 = time.perf_counter()
+            try:
+                errors.extend(send(batch))
+            except Exception as e:
+                # Transport-level failure: the whole batch is unaccounted for.
+                errors.extend((doc.get("_key"), str(e)) for doc in batch)
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+
+        report = FlushReport(label, len(docs) - len(errors), errors, latencies, elapsed)
+        return record_flush(report, self.collection_name, self.mode)
+
+    def delete(self, keys, label=None):
+        """
+        Remove documents by _key in batches and return a FlushReport.
+        Keys that are already gone are not reported as errors.
+        """
+        keys = [str(key) for key in keys]
+        label = label or f"{self.collection_name} delete"
+        errors = []
+        latencies = []
+        start = time.perf_counter()
+        for i in range(0, len(keys), self.batch_size):
+            batch = keys[i:i + self.batch_size]
+            t0 = time.perf_counter()
+            try:
+                results = self.collection.delete_many([{"_key": key} for key in batch], silent=False)
+                for key, result in zip(batch, results):
+                    if isinstance(result, Exception) and getattr(result, "http_code", None) != 404:
+                        errors.append((key, str(result)))
+            except Exception as e:
+                errors.extend((key, str(e)) for key in batch)
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+        report = FlushReport(label, len(keys) - len(errors), errors, latencies, elapsed)
+        return record_flush(report, self.collection_name, "delete")
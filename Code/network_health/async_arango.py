@@ -0,0 +1,101 @@
+"""
+Asynchronous ArangoDB document writes over a pooled aiohttp session.
+
+python-arango is synchronous, so the asyncio pipeline talks to the HTTP
+document API directly. One ClientSession (and its keep-alive connection
+pool of pool_size connections) is shared by every write; the batches of a
+write are sent concurrently, up to max_in_flight at a time. Modes and the
+returned FlushReport match arango_writer.BulkWriter.
+"""
+import asyncio
+import time
+
+import aiohttp
+
+from network_health.arango_writer import MODES, FlushReport, record_flush
+
+
+class AsyncArangoClient:
+    def __init__(self, url, db_name, username, password, pool_size=16, max_in_flight=8, timeout=60):
+        self.base_url = f"{url.rstrip('/')}/_db/{db_name}/_api/document"
+        self.auth = aiohttp.BasicAuth(username, password)
+        self.pool_size = pool_size
+        self.max_in_flight = max_in_flight
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session = None
+        self._slots = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self.session = aiohttp.ClientSession(connector=connector, auth=self.auth, timeout=self.timeout)
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _request(self, method, collection, body, params=None):
+        async with self._slots:
+            async with self.session.request(
+                method, f"{self.base_url}/{collection}", json=body, params=params
+            ) as response:
+                results = await response.json(content_type=None)
+                if response.status >= 400 and not isinstance(results, list):
+                    raise RuntimeError(f"HTTP {response.status}: {results.get('errorMessage', results)}")
+                return results
+
+    async def _send(self, method, collection, batch, keys, params):
+        t0 = time.perf_counter()
+        try:
+            results = await self._request(method, collection, batch, params)
+            errors = [
+                (key, f"[{result.get('errorNum')}] {result.get('errorMessage')}")
+                for key, result in zip(keys, results)
+                if result.get("error") and not (method == "DELETE" and result.get("errorNum") == 1202)
+            ]
+        except Exception as e:
+            # Transport-level failure: the whole batch is unaccounted for.
+            errors = [(key, str(e)) for key in keys]
+        return errors, time.perf_counter() - t0
+
+    async def _run(self, label, mode, method, collection, batches, params=None):
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            self._send(method, collection, body, keys, params) for body, keys in batches
+        ))
+        elapsed = time.perf_counter() - start
+        errors = [error for batch_errors, _ in results for error in batch_errors]
+        total = sum(len(keys) for _, keys in batches)
+        report = FlushReport(label, total - len(errors), errors, [latency for _, latency in results], elapsed)
+        return record_flush(report, collection, mode)
+
+    async def write(self, collection, docs, mode="upsert", batch_size=1000, label=None):
+        """
+        Write docs to collection in concurrent batches and return a FlushReport.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown write mode {mode!r}; expected one of {MODES}")
+        docs = list(docs)
+        batches = [(docs[i:i + batch_size], [d.get("_key") for d in docs[i:i + batch_size]])
+                   for i in range(0, len(docs), batch_size)]
+        if mode == "update":
+            return await self._run(label or collection, mode, "PATCH", collection, batches)
+        params = {"overwriteMode": "update" if mode == "upsert" else "replace"}
+        return await self._run(label or collection, mode, "POST", collection, batches, params)
+
+    async def delete(self, collection, keys, batch_size=1000, label=None):
+        """
+        Remove documents by _key; keys that are already gone are not errors.
+        """
+        keys = [str(key) for key in keys]
+        batches = [(keys[i:i + batch_size], keys[i:i + batch_size]) for i in range(0, len(keys), batch_size)]
+        return await self._run(label or f"{collection} delete", "delete", "DELETE", collection, batches)
@@ -0,0 +1,91 @@
+"""
+Versioned model checkpoints.
+
+Each training run writes congestion-vNNNN.pt into the checkpoint directory
+and then atomically points the LATEST file at it. Scorers load whatever
+LATEST names and can cheaply poll it to pick up a newer version.
+"""
+import json
+import os
+import re
+from datetime import datetime
+
+import torch
+
+LATEST_NAME = "LATEST"
+CHECKPOINT_PATTERN = re.compile(r"congestion-v(\d+)\.pt$")
+
+
+def list_versions(directory):
+    if not os.path.isdir(directory):
+        return []
+    versions = []
+    for name in os.listdir(directory):
+        match = CHECKPOINT_PATTERN.match(name)
+        if match:
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+
+def latest_path(directory):
+    """
+    Path of the checkpoint LATEST points to, or None if nothing was saved yet.
+    """
+    pointer = os.path.join(directory, LATEST_NAME)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer, "r", encoding="utf-8") as fh:
+        return os.path.join(directory, fh.read().strip())
+
+
+def save_checkpoint(directory, model, metrics=None, extra=None):
+    """
+    Save model weights and metadata as the next version. Returns (version, path).
+    """
+    os.makedirs(directory, exist_ok=True)
+    versions = list_versions(directory)
+    version = versions[-1] + 1 if versions else 1
+    name = f"congestion-v{version:04d}.pt"
+    path = os.path.join(directory, name)
+
+    metadata = {
+        "version": version,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "num_features": model.num_features,
+        "hidden": model.hidden,
+        "device_features": model.device_features,
+        "metrics": metrics or {},
+        **(extra or {}),
+    }
+    torch.save({"metadata": metadata, "state_dict": model.state_dict()}, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+    pointer = os.path.join(directory, LATEST_NAME)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as fh:
+        fh.write(name)
+    os.replace(pointer + ".tmp", pointer)
+    with open(os.path.join(directory, f"congestion-v{version:04d}.json"), "w", encoding="utf-8") as fh:
+        json.dump(metadata, fh, indent=2)
+    return version, path
+
+
+def load_checkpoint(path):
+    """
+    Load a checkpoint file (or the LATEST one if path is a directory).
+    Returns (model in eval mode, metadata).
+    """
+    if os.path.isdir(path):
+        resolved = latest_path(path)
+        if resolved is None:
+            raise FileNotFoundError(f"No checkpoint found in '{path}'. Run train.py first.")
+        path = resolved
+    from network_health.model import CongestionModel  # torch_geometric; export.load_compiled avoids it
+
+    payload = torch.load(path, map_location="cpu", weights_only=True)
+    metadata = payload["metadata"]
+    model = CongestionModel(
+        metadata["num_features"], metadata["hidden"], metadata.get("device_features", metadata["num_features"])
+    )
+    model.load_state_dict(payload["state_dict"])
+    model.eval()
+    return model, metadata
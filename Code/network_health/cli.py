@@ -0,0 +1,90 @@
+"""
+Command line entry point: python -m network_health <command> [options].
+
+    generate   append synthetic KPI batches to the KPI store
+    ingest     upsert new KPI store rows (and rollups) into ArangoDB
+    score      score devices and segments once, or keep rescoring (--daemon)
+    train      train the congestion model and write a checkpoint
+    dashboard  serve the Dash dashboard
+    pipeline   generate -> ingest -> score -> write -> notify in one process
+    simulate   evaluate what-if KPI scenarios against the trained model
+
+Settings come from network_health.config (defaults, --config file, NH_*
+environment variables, --set KEY=VALUE). Only the module of the command
+being run is imported, after the arguments are parsed, so `--help` and
+light commands never pay for torch, torch_geometric or Dash, and no
+connection is opened before a command needs it. The top-level scripts in
+Code/ are thin wrappers around the same commands.
+"""
+import argparse
+import importlib
+import json
+import logging
+import sys
+
+from network_health.config import load_config
+
+# command -> (module, help)
+COMMANDS = {
+    "generate": ("network_health.commands.generate", "append synthetic KPI batches to the KPI store"),
+    "ingest": ("network_health.commands.ingest", "upsert new KPI store rows (and rollups) into ArangoDB"),
+    "score": ("network_health.commands.score", "score devices and segments once, or keep rescoring (--daemon)"),
+    "train": ("network_health.commands.train", "train the congestion model and write a checkpoint"),
+    "dashboard": ("network_health.commands.dashboard", "serve the Dash dashboard"),
+    "pipeline": ("network_health.commands.pipeline", "generate -> ingest -> score -> write -> notify in one process"),
+    "simulate": ("network_health.commands.simulate", "evaluate what-if KPI scenarios against the trained model"),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="network_health", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", metavar="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=help_text, description=help_text)
+        sub.add_argument("--config", help="TOML or JSON settings file (default: $NH_CONFIG)")
+        sub.add_argument("--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE",
+                         help="override one setting; VALUE is parsed as JSON when it is valid JSON")
+        sub.add_argument("--print-config", action="store_true", help="print the resolved settings and exit")
+        if name == "score":
+            # Declared here rather than by the command module, which imports torch.
+            sub.add_argument("--daemon", action="store_true",
+                             help="keep running and rescore every INTERVAL seconds when new KPI data arrived")
+        if name == "simulate":
+            sub.add_argument("scenarios", nargs="?",
+                             help="JSON file with a list of scenarios (see network_health.whatif); default: stdin")
+            sub.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        config = load_config(args.command, path=args.config, overrides=args.overrides)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.print_config:
+        print(json.dumps(config, indent=2))  # usable as a --config file
+        return 0
+
+    from network_health.instrumentation import configure_logging, profile_from_env, start_metrics_server
+
+    configure_logging(config.LOG_LEVEL)
+    profile_from_env().start()  # PROFILE=cprofile or PROFILE=py-spy
+    if config.METRICS_PORT:
+        start_metrics_server(config.METRICS_PORT)
+
+    command = importlib.import_module(COMMANDS[args.command][0])
+    try:
+        command.run(config, args)
+    except KeyboardInterrupt:
+        logger.info("Interrupted.")
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
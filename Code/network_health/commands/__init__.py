@@ -0,0 +1,35 @@
+"""
+Subcommands of the network_health CLI (network_health.cli), one module each.
+
+A command module exposes run(config, args) and may import whatever it needs
+at the top: the CLI imports only the module of the command being run, so
+`score` never loads Dash and `generate` never loads torch. Helpers here are
+shared by the commands and import nothing heavy.
+"""
+
+
+def connect(config):
+    """
+    ArangoDB database handle for the configured server.
+    """
+    from arango import ArangoClient
+
+    client = ArangoClient(hosts=config.ARANGO_URL)
+    return client.db(config.DB_NAME, username=config.USERNAME, password=config.PASSWORD)
+
+
+def require_collection(db, name, hint="Ensure your edge generation has been run."):
+    """
+    Raise if a collection written by another command is missing.
+    """
+    if not db.has_collection(name):
+        raise Exception(f"Collection {name} not found! {hint}")
+
+
+def ensure_collections(db, *names):
+    """
+    Create the named collections that do not exist yet (None is skipped).
+    """
+    for name in names:
+        if name and not db.has_collection(name):
+            db.create_collection(name)
@@ -0,0 +1,448 @@
+"""
+dashboard: Dash application for visualizing telecom network KPI and congestion.
+
+create_app(config) builds the application:
+• Connects to ArangoDB to fetch nodes (from "traffic_data") and edges (from "cell_edges").
+• Constructs a Cytoscape graph where each node’s color reflects the latest congestion state.
+  Node positions are computed on the server (network_health.layout), cached
+  until cell_edges changes, and sent with a "preset" layout.
+• Level of detail: the segment view shows one node per SegmentPrediction
+  segment (coloured by status); clicking a segment drills into its cells.
+  Past LOD_CELL_LIMIT cells the whole-network cell view is disabled.
+• Periodically refreshes the graph (every 60 seconds) using an Interval component.
+  All sessions share one server-side snapshot cache; a browser only receives
+  the node/edge fields that changed since the snapshot version it already has.
+• When a node (cell) is clicked, a detailed table of its attributes appears,
+  and a time-series panel plots one KPI (mean, p95 and the min-max band) over
+  the selected range from the kpi_rollups collection (network_health.rollups),
+  at the finest of the 1m/15m/1h resolutions that fits HISTORY_MAX_POINTS.
+• Serves Prometheus metrics (read/build timers, snapshot cache stats) at /metrics.
+
+Nothing connects or queries at import. For a WSGI server, use
+create_app(load_config("dashboard")).server.
+"""
+import logging
+import time
+
+import dash_bootstrap_components as dbc
+import dash_cytoscape as cyto
+from arango.exceptions import DocumentGetError
+from dash import Dash, Input, Output, Patch, State, ctx, dash_table, dcc, html, no_update
+from flask import Response, jsonify
+
+from network_health.commands import connect, require_collection
+from network_health.dashboard_cache import (
+    GraphSnapshotCache, arango_marker, cell_elements, drill_elements, segment_elements, segment_marker,
+)
+from network_health.data_access import ensure_indexes, fetch_dashboard_nodes, fetch_edge_rows, fetch_segment_summaries
+from network_health.instrumentation import CONTENT_TYPE, REGISTRY, gauge, timed_function
+from network_health.kpis import KPI_KEYS
+from network_health.layout import LayoutCache
+from network_health.rollups import fetch_series
+from network_health.topology import TopologyStore
+
+logger = logging.getLogger(__name__)
+
+# Positions come with the elements (server-side layout), so the browser
+# only places the nodes and fits the viewport; nothing is simulated.
+layout = {
+    'name': 'preset',
+    'fit': True,
+    'padding': 30,
+    'animate': False
+}
+
+# Define Cytoscape stylesheet
+cyto_stylesheet = [
+    {
+        'selector': 'node',
+        'style': {
+            'label': 'data(label)',
+            'background-color': 'data(color)',
+            'width': '40px',
+            'height': '40px',
+            'font-size': '12px',
+            'text-valign': 'center',
+            'color': 'white'
+        }
+    },
+    {
+        # Segment nodes: sized by the number of cells they aggregate.
+        'selector': 'node[cells]',
+        'style': {
+            'width': 'mapData(cells, 1, 20, 30, 90)',
+            'height': 'mapData(cells, 1, 20, 30, 90)',
+            'shape': 'round-rectangle'
+        }
+    },
+    {
+        'selector': 'edge',
+        'style': {
+            'line-color': '#ccc',
+            'target-arrow-color': '#ccc',
+            'target-arrow-shape': 'triangle',
+            'curve-style': 'bezier',
+            'width': 2
+        }
+    },
+    {
+        'selector': 'edge[links]',
+        'style': {
+            'target-arrow-shape': 'none',
+            'width': 'mapData(links, 1, 10, 2, 8)'
+        }
+    }
+]
+
+
+CACHE_GAUGE = gauge("dashboard_cache", "Snapshot cache statistics (see /cache-metrics)", ("stat",))
+
+
+def create_app(config):
+    """
+    Dash application (its Flask server is app.server) for the configured database.
+    """
+    db = connect(config)
+    require_collection(db, config.TRAFFIC_COLLECTION, "Ensure your data generator/updater has been run.")
+    require_collection(db, config.EDGE_COLLECTION)
+    ensure_indexes(db, {"traffic_data": config.TRAFFIC_COLLECTION, "SegmentPrediction": config.SEGMENT_COLLECTION})
+
+    # -------------------------------------------
+    # Helper Function: Fetch Graph Data from ArangoDB
+    # -------------------------------------------
+    layout_cache = LayoutCache(config.LAYOUT_CACHE, config.LAYOUT_ALGORITHM, config.LAYOUT_ITERATIONS)
+    topology = None
+    if config.TOPOLOGY_DIR:
+        topology = TopologyStore(config.TOPOLOGY_DIR, db, config.EDGE_COLLECTION, config.TRAFFIC_COLLECTION,
+                                 config.READ_BATCH_SIZE)
+
+    @timed_function("dashboard_elements_seconds", "Time to fetch and build the Cytoscape elements")
+    def get_graph_elements():
+        """
+        Fetch nodes from traffic_data; edges come from the topology snapshot of
+        cell_edges (rebuilt only when the collection changed), or from a scan of
+        cell_edges when TOPOLOGY_DIR is None.
+        Returns a list of elements formatted for Dash Cytoscape.
+        Each node's data includes its _key, cell_id, congestion, color, and timestamp,
+        and its position from the layout cache.
+        Only the displayed attributes are transferred (projected, streamed queries).
+        """
+        nodes, edges = [], []
+        # Fetch all cell nodes
+        try:
+            nodes = fetch_dashboard_nodes(db, config.TRAFFIC_COLLECTION, config.READ_BATCH_SIZE)
+        except Exception as e:
+            logger.error("Error fetching nodes: %s", e)
+
+        # Memory-mapped edges; the snapshot assumes _from and _to use the format "traffic_data/<key>"
+        try:
+            if topology is not None:
+                edges = topology.current()
+            else:
+                edges = fetch_edge_rows(db, config.EDGE_COLLECTION, config.READ_BATCH_SIZE, with_relation=True)
+        except Exception as e:
+            logger.error("Error fetching edges: %s", e)
+
+        # Stable element order so successive snapshots can be diffed by index.
+        return cell_elements(nodes, edges, layout_cache)
+
+    def get_segment_elements():
+        """
+        Segment-level elements from SegmentPrediction, placed on the cell layout.
+        """
+        try:
+            docs = fetch_segment_summaries(db, config.SEGMENT_COLLECTION, config.READ_BATCH_SIZE)
+        except Exception as e:
+            logger.error("Error fetching segments: %s", e)
+            docs = []
+        return segment_elements(docs, graph_cache.get().elements)
+
+    graph_cache = GraphSnapshotCache(
+        get_graph_elements,
+        arango_marker(db, config.TRAFFIC_COLLECTION, config.EDGE_COLLECTION),
+        ttl=config.CACHE_TTL
+    )
+    _segments_changed = segment_marker(db, config.SEGMENT_COLLECTION)
+    segment_cache = GraphSnapshotCache(
+        get_segment_elements,
+        lambda: (graph_cache.get().version, _segments_changed()),  # positions come from the cell snapshot
+        ttl=config.CACHE_TTL
+    )
+
+    def segment_members(segment_id):
+        """
+        Cell keys of one segment (a single document lookup).
+        """
+        try:
+            doc = db.collection(config.SEGMENT_COLLECTION).get(str(segment_id))
+        except DocumentGetError as e:
+            logger.error("Error fetching segment %s: %s", segment_id, e)
+            return []
+        return (doc or {}).get("device_ids") or []
+
+    # -------------------------------------------
+    # Dash App Setup
+    # -------------------------------------------
+    app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    server = app.server
+
+    @server.route('/cache-metrics')
+    def cache_metrics():
+        """
+        Snapshot cache hit rate and payload sizes as JSON.
+        """
+        return jsonify(graph_cache.metrics())
+
+    @server.route('/metrics')
+    def metrics():
+        """
+        All timers and counters of this process in the Prometheus text format.
+        """
+        for stat, value in graph_cache.metrics().items():
+            CACHE_GAUGE.set(value, stat=stat)
+        return Response(REGISTRY.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+    @server.route('/notify', methods=['POST'])
+    def notify():
+        """
+        Called by the pipeline command after each written cycle: drop the snapshot so
+        the next refresh rebuilds it instead of waiting out CACHE_TTL.
+        """
+        graph_cache.invalidate()
+        segment_cache.invalidate()
+        return jsonify({'invalidated': True})
+
+    # App Layout (a function, so every page load starts from the current snapshot):
+    history_ranges = list(config.HISTORY_RANGES.items())
+    default_range = config.HISTORY_RANGES.get("1 day", history_ranges[0][1])
+
+    def serve_layout():
+        snapshot = graph_cache.get()
+        num_cells = sum(1 for e in snapshot.elements if 'id' in e['data'])
+        has_segments = len(segment_cache.get().elements) > 0
+        view = 'segments' if has_segments and num_cells > config.LOD_CELL_LIMIT else 'cells'
+        view_key, elements, version = view_elements(view, None)
+        return dbc.Container([
+            dbc.Row(
+                dbc.Col(html.H3("Telecom Network Dashboard: KPI & Congestion Visualization"), width=12),
+                className="my-3"
+            ),
+            dbc.Row([
+                dbc.Col(
+                    dcc.RadioItems(
+                        id='view-mode',
+                        options=[
+                            {'label': ' Segments ', 'value': 'segments', 'disabled': not has_segments},
+                            {'label': ' Cells ', 'value': 'cells', 'disabled': num_cells > config.LOD_CELL_LIMIT},
+                        ],
+                        value=view,
+                        inline=True
+                    ),
+                    width="auto"
+                ),
+                dbc.Col(dbc.Button("Back to segments", id='back-button', size="sm", color="secondary"), width="auto"),
+                dbc.Col(html.Span(id='view-title'), width="auto")
+            ], className="my-2", align="center"),
+            dbc.Row(
+                dbc.Col(
+                    cyto.Cytoscape(
+                        id='cytoscape-graph',
+                        layout=layout,
+                        style={'width': '100%', 'height': '500px'},
+                        stylesheet=cyto_stylesheet,
+                        elements=elements
+                    ),
+                    width=12
+                ),
+                className="my-2"
+            ),
+            dbc.Row(
+                dbc.Col(html.H5("Selected Node Details:"), width=12)
+            ),
+            dbc.Row(
+                dbc.Col(
+                    dash_table.DataTable(
+                        id='node-details',
+                        columns=[
+                            {"name": "Attribute", "id": "Attribute"},
+                            {"name": "Value", "id": "Value"}
+                        ],
+                        data=[],
+                        style_table={'overflowX': 'auto'},
+                        style_cell={'textAlign': 'left', 'padding': '5px'},
+                        style_header={'backgroundColor': 'rgb(230, 230, 230)', 'fontWeight': 'bold'}
+                    ),
+                    width=12
+                )
+            ),
+            dbc.Row([
+                dbc.Col(html.H5("KPI History:"), width="auto"),
+                dbc.Col(
+                    dcc.Dropdown(
+                        id='history-kpi',
+                        options=[{'label': kpi, 'value': kpi} for kpi in KPI_KEYS],
+                        value=config.HISTORY_DEFAULT_KPI,
+                        clearable=False
+                    ),
+                    width=3
+                ),
+                dbc.Col(
+                    dcc.RadioItems(
+                        id='history-range',
+                        options=[{'label': f' {label} ', 'value': seconds} for label, seconds in history_ranges],
+                        value=default_range,
+                        inline=True
+                    ),
+                    width="auto"
+                )
+            ], className="mt-4 mb-2", align="center"),
+            dbc.Row(
+                dbc.Col(dcc.Graph(id='kpi-history', figure=history_figure(None, config.HISTORY_DEFAULT_KPI, default_range)), width=12)
+            ),
+            dcc.Interval(
+                id='interval-component',
+                interval=60*1000,  # 60 seconds
+                n_intervals=0
+            ),
+            dcc.Store(id='drill-segment', data=None),
+            dcc.Store(id='graph-version', data={'view': view_key, 'version': version})
+        ], fluid=True)
+
+    app.layout = serve_layout
+
+    # -------------------------------------------
+    # Callbacks
+    # -------------------------------------------
+    def view_elements(view, segment_id):
+        """
+        (view key, elements, snapshot version) for the segment view, the
+        whole-network cell view, or the cells of one segment.
+        """
+        if segment_id is not None:
+            cells, segments = graph_cache.get(), segment_cache.get()
+            elements = drill_elements(cells.elements, segment_members(segment_id))
+            return f"segment:{segment_id}", elements, f"{cells.version}.{segments.version}"
+        snapshot = segment_cache.get() if view == 'segments' else graph_cache.get()
+        return view, snapshot.elements, snapshot.version
+
+    @app.callback(
+        Output('drill-segment', 'data'),
+        Input('cytoscape-graph', 'tapNodeData'),
+        Input('back-button', 'n_clicks'),
+        Input('view-mode', 'value'),
+        prevent_initial_call=True
+    )
+    def select_segment(data, n_clicks, view):
+        """
+        Clicking a segment node drills into its cells; the back button or a
+        view change returns to the overview.
+        """
+        if ctx.triggered_id == 'cytoscape-graph':
+            if data and 'segment_id' in data:
+                return data['segment_id']
+            return no_update
+        return None
+
+    @app.callback(
+        Output('cytoscape-graph', 'elements'),
+        Output('graph-version', 'data'),
+        Output('view-title', 'children'),
+        Input('interval-component', 'n_intervals'),
+        Input('view-mode', 'value'),
+        Input('drill-segment', 'data'),
+        State('graph-version', 'data')
+    )
+    def update_graph(n_intervals, view, segment_id, client_state):
+        """
+        Every 60 seconds (or when the view changes), bring the client's graph up
+        to the latest cached snapshot of the selected view. In the cell view it
+        sends nothing if the client is current, a Patch of changed fields if the
+        graph shape is unchanged, and the full element list otherwise; the
+        segment and drill-down views are resent only when their snapshot moves.
+        """
+        client_state = client_state or {}
+        title = f"Segment {segment_id}" if segment_id is not None else ""
+        if segment_id is None and view == 'cells' and client_state.get('view') == 'cells':
+            version, payload = graph_cache.delta(client_state.get('version'))
+            if payload is None:
+                return no_update, no_update, title
+            state = {'view': 'cells', 'version': version}
+            if isinstance(payload, list):
+                return payload, state, title
+            patch = Patch()
+            for index, fields in payload.items():
+                for key, value in fields.items():
+                    patch[index]['data'][key] = value
+            return patch, state, title
+        view_key, elements, version = view_elements(view, segment_id)
+        state = {'view': view_key, 'version': version}
+        if state == client_state:
+            return no_update, no_update, title
+        return elements, state, title
+
+    @app.callback(
+        Output('node-details', 'data'),
+        Input('cytoscape-graph', 'tapNodeData')
+    )
+    def display_node_details(data):
+        """
+        When a node is clicked, display its attributes in a table.
+        """
+        if data is None:
+            return []
+        details = [{"Attribute": str(key), "Value": str(value)} for key, value in data.items()]
+        return details
+
+    def history_figure(cell_key, kpi, seconds):
+        """
+        Plotly figure of one KPI of one cell from the rollups: mean and p95
+        lines over the min-max band.
+        """
+        layout = {'height': 320, 'margin': {'l': 50, 'r': 20, 't': 40, 'b': 40}, 'yaxis': {'title': kpi}}
+        if cell_key is None:
+            return {'data': [], 'layout': {**layout, 'title': 'Click a cell to plot its KPI history'}}
+        if not config.ROLLUP_COLLECTION:
+            return {'data': [], 'layout': {**layout, 'title': 'KPI history is disabled (ROLLUP_COLLECTION is unset)'}}
+        if not db.has_collection(config.ROLLUP_COLLECTION):
+            return {'data': [], 'layout': {**layout, 'title': f'No KPI history ({config.ROLLUP_COLLECTION} not found)'}}
+        start = time.perf_counter()
+        try:
+            resolution, series = fetch_series(db, config.ROLLUP_COLLECTION, cell_key, seconds, kpis=[kpi],
+                                              max_points=config.HISTORY_MAX_POINTS)
+        except Exception as e:
+            logger.error("Error fetching KPI history of cell %s: %s", cell_key, e)
+            return {'data': [], 'layout': {**layout, 'title': f'Cell {cell_key}: history unavailable'}}
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        x = series['time'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
+        line = lambda stat: series[f'{kpi}_{stat}'].tolist()  # noqa: E731
+        data = [
+            {'x': x, 'y': line('max'), 'mode': 'lines', 'line': {'width': 0}, 'name': 'max', 'showlegend': False},
+            {'x': x, 'y': line('min'), 'mode': 'lines', 'line': {'width': 0}, 'name': 'min-max',
+             'fill': 'tonexty', 'fillcolor': 'rgba(31, 119, 180, 0.2)'},
+            {'x': x, 'y': line('mean'), 'mode': 'lines', 'name': 'mean', 'line': {'color': 'rgb(31, 119, 180)'}},
+            {'x': x, 'y': line('p95'), 'mode': 'lines', 'name': 'p95', 'line': {'dash': 'dot', 'color': 'firebrick'}},
+        ]
+        title = f'Cell {cell_key}: {kpi}, {len(series)} buckets at {resolution} ({elapsed_ms:.0f} ms)'
+        return {'data': data, 'layout': {**layout, 'title': title}}
+
+    @app.callback(
+        Output('kpi-history', 'figure'),
+        Input('cytoscape-graph', 'tapNodeData'),
+        Input('history-kpi', 'value'),
+        Input('history-range', 'value'),
+        Input('interval-component', 'n_intervals')
+    )
+    @timed_function("dashboard_history_seconds", "Time to fetch and plot a cell's KPI history")
+    def update_history(data, kpi, seconds, n_intervals):
+        """
+        Plot the selected KPI of the clicked cell (segment nodes have no history).
+        """
+        cell_key = data.get('id') if data and 'segment_id' not in data else None
+        return history_figure(cell_key, kpi, seconds)
+
+    return app
+
+
+def run(config, args):
+    app = create_app(config)
+    app.run(host=config.DASH_HOST, port=config.DASH_PORT, debug=config.DASH_DEBUG)
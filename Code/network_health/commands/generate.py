@@ -0,0 +1,68 @@
+"""
+generate: append a synthetic KPI batch to the KPI store every INTERVAL seconds.
+
+The first time the store is used, history from the legacy Excel file is
+imported. With SYNTHETIC_LAYOUT set, cells sit on a "hex" or "geometric"
+topology with drifting congestion hotspots and its cell_edges documents are
+written to EDGES_FILE.
+"""
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from network_health.kpi_store import ExcelKpiSink, ParquetKpiStore, import_excel
+from network_health.synthetic import SyntheticNetwork, generate_rows
+
+logger = logging.getLogger(__name__)
+
+
+def open_sinks(config):
+    sinks = [ParquetKpiStore(config.KPI_STORE_DIR)]
+    if sinks[0].total_rows == 0 and os.path.exists(config.EXCEL_FILENAME):
+        # Carry over history from the legacy Excel file the first time the store is used.
+        try:
+            imported = import_excel(sinks[0], config.EXCEL_FILENAME)
+            logger.info("Imported %d rows from '%s'.", imported, config.EXCEL_FILENAME)
+        except Exception as e:
+            logger.error("Error importing file: %s", e)
+    logger.info("Using KPI store '%s' with %d existing rows.", config.KPI_STORE_DIR, sinks[0].total_rows)
+    if config.EXCEL_EXPORT:
+        sinks.append(ExcelKpiSink(config.EXCEL_FILENAME))
+    return sinks
+
+
+def run(config, args):
+    sinks = open_sinks(config)
+    network = None
+    if config.SYNTHETIC_LAYOUT:
+        network = SyntheticNetwork(config.NUM_NODES, config.SYNTHETIC_LAYOUT, config.SYNTHETIC_DEGREE)
+        with open(config.EDGES_FILE, "w", encoding="utf-8") as fh:
+            json.dump(network.edge_documents(), fh, indent=2)
+        logger.info("Wrote %d %s edges to '%s'.", network.edges.shape[1], config.SYNTHETIC_LAYOUT, config.EDGES_FILE)
+
+    # --- Main Loop: Append new data every INTERVAL seconds ---
+    logger.info("Starting data generation. Press Ctrl+C to stop.")
+    current_time = datetime.now()
+    while True:
+        # Generate new batch for current timestamp
+        if network is not None:
+            df_new = network.frame(current_time)
+            network.drift()
+        else:
+            df_new = pd.DataFrame(generate_rows(current_time, config.NUM_NODES))
+
+        # Only the new batch is written; earlier history is never rewritten.
+        for sink in sinks:
+            try:
+                sink.append(df_new)
+            except Exception as e:
+                logger.error("Error writing to %s: %s", type(sink).__name__, e)
+        logger.info("Appended data for timestamp: %s", current_time.strftime('%m/%d/%Y %H:%M:%S'))
+
+        # Increment simulated time and wait for next update
+        current_time += timedelta(seconds=config.INTERVAL)
+        time.sleep(config.INTERVAL)
@@ -0,0 +1,77 @@
+"""
+ingest: upsert new and changed KPI store rows into ArangoDB every INTERVAL seconds.
+
+Only rows past the persisted watermark are read (WatermarkIngester). With
+ROLLUP_COLLECTION set, the same rows also feed the 1m/15m/1h KPI rollups.
+"""
+import logging
+import time
+
+from network_health.arango_writer import BulkWriter
+from network_health.commands import connect
+from network_health.data_access import ensure_indexes
+from network_health.ingest import WatermarkIngester
+from network_health.kpi_store import KpiReader
+from network_health.rollups import KpiRollups
+
+logger = logging.getLogger(__name__)
+
+
+def update_arango_from_store(ingester, writer, rollups=None, rollup_writer=None):
+    try:
+        docs = ingester.poll()
+        rollup_docs = rollups.poll(ingester.last_batch) if rollups is not None else []
+    except Exception as e:
+        logger.error("Error reading KPI store: %s", e)
+        return
+    if docs:
+        # Upsert all changed documents in batches: update if exists; insert if new.
+        report = writer.write(docs, label="traffic_data upsert")
+        report.log(logger)
+
+        # Advance the watermark; failed cells are retried on the next cycle.
+        ingester.commit(failed_keys=report.failed_keys)
+    else:
+        logger.info("No new or changed cells since the last cycle.")
+        ingester.commit()
+
+    if rollups is not None:
+        failed_keys = ()
+        if rollup_docs:
+            report = rollup_writer.write(rollup_docs, label="kpi rollups")
+            report.log(logger)
+            failed_keys = report.failed_keys
+        rollups.commit(failed_keys=failed_keys)
+
+
+def run(config, args):
+    db = connect(config)
+
+    # Create (or retrieve) the traffic collection.
+    if not db.has_collection(config.TRAFFIC_COLLECTION):
+        db.create_collection(config.TRAFFIC_COLLECTION)
+        logger.info("Created collection '%s' in '%s' database.", config.TRAFFIC_COLLECTION, config.DB_NAME)
+    else:
+        logger.info("Using existing collection '%s' in '%s' database.", config.TRAFFIC_COLLECTION, config.DB_NAME)
+    indexed = {"traffic_data": config.TRAFFIC_COLLECTION}
+    if config.ROLLUP_COLLECTION:
+        if not db.has_collection(config.ROLLUP_COLLECTION):
+            db.create_collection(config.ROLLUP_COLLECTION)
+        indexed["kpi_rollups"] = config.ROLLUP_COLLECTION
+    ensure_indexes(db, indexed)
+
+    reader = KpiReader(config.KPI_STORE_DIR)
+    writer = BulkWriter(db, config.TRAFFIC_COLLECTION, mode="upsert", batch_size=config.WRITE_BATCH_SIZE)
+    ingester = WatermarkIngester(reader, config.INGEST_STATE_FILE)
+    logger.info("Resuming ingestion at row offset %d (%d cells tracked).", ingester.offset, len(ingester.watermarks))
+    rollups = rollup_writer = None
+    if config.ROLLUP_COLLECTION:
+        rollups = KpiRollups(config.ROLLUP_STATE_FILE, reader)
+        rollup_writer = BulkWriter(db, config.ROLLUP_COLLECTION, mode="upsert", batch_size=config.WRITE_BATCH_SIZE)
+
+    logger.info("Starting updater using collection '%s' in database '%s'. Press Ctrl+C to stop.",
+                config.TRAFFIC_COLLECTION, config.DB_NAME)
+    while True:
+        logger.info("Reading KPI store and updating ArangoDB...")
+        update_arango_from_store(ingester, writer, rollups, rollup_writer)
+        time.sleep(config.INTERVAL)
@@ -0,0 +1,72 @@
+"""
+pipeline: generate -> ingest -> score -> write -> notify in one asyncio process.
+
+Replaces running generate, ingest and score --daemon as three polling
+loops. Stages hand work to each other through bounded queues
+(backpressure), ArangoDB writes go out concurrently over one pooled HTTP
+session, and per-stage latency histograms are logged every REPORT_EVERY
+cycles and on exit.
+
+GENERATE = false keeps feeding the KPI store from a separate generate
+process, SCORE = false only ingests, and NOTIFY_URL = null skips the
+dashboard notification.
+"""
+import asyncio
+import logging
+
+from network_health.async_arango import AsyncArangoClient
+from network_health.commands import connect, ensure_collections, require_collection
+from network_health.data_access import ensure_indexes
+from network_health.ingest import WatermarkIngester
+from network_health.kpi_store import KpiReader, ParquetKpiStore
+from network_health.pipeline import (
+    GenerateSource, IngestStage, NotifyStage, Pipeline, ScoreStage, TickSource, WriteStage,
+)
+from network_health.rollups import KpiRollups
+
+logger = logging.getLogger(__name__)
+
+
+async def main(config):
+    # --- Synchronous setup: collections, indexes, model ---
+    db = connect(config)
+    ensure_collections(db, config.TRAFFIC_COLLECTION, config.SEGMENT_COLLECTION, config.TRANSITION_COLLECTION,
+                       config.ROLLUP_COLLECTION)
+    ensure_indexes(db, {"traffic_data": config.TRAFFIC_COLLECTION, "SegmentPrediction": config.SEGMENT_COLLECTION,
+                        "SegmentTransition": config.TRANSITION_COLLECTION,
+                        "kpi_rollups": config.ROLLUP_COLLECTION or "kpi_rollups"})
+
+    reader = KpiReader(config.KPI_STORE_DIR)
+    ingester = WatermarkIngester(reader, config.INGEST_STATE_FILE)
+    logger.info("Resuming ingestion at row offset %d (%d cells tracked).", ingester.offset, len(ingester.watermarks))
+
+    if config.GENERATE:
+        source = GenerateSource([ParquetKpiStore(config.KPI_STORE_DIR)], config.NUM_NODES, config.INTERVAL)
+    else:
+        source = TickSource(config.INTERVAL)
+    client = AsyncArangoClient(config.ARANGO_URL, config.DB_NAME, config.USERNAME, config.PASSWORD,
+                               pool_size=config.HTTP_POOL_SIZE, max_in_flight=config.MAX_IN_FLIGHT)
+    rollups = KpiRollups(config.ROLLUP_STATE_FILE, reader) if config.ROLLUP_COLLECTION else None
+    stages = [IngestStage(ingester, rollups)]
+    if config.SCORE:
+        from network_health.commands.score import build_service  # torch is only needed when scoring
+
+        require_collection(db, config.EDGE_COLLECTION)
+        stages.append(ScoreStage(build_service(config, db, "streaming"), reader))
+    stages.append(WriteStage(client, config.TRAFFIC_COLLECTION, config.SEGMENT_COLLECTION, config.WRITE_BATCH_SIZE,
+                             config.TRANSITION_COLLECTION, config.ROLLUP_COLLECTION))
+    if config.NOTIFY_URL:
+        stages.append(NotifyStage(config.NOTIFY_URL))
+
+    pipeline = Pipeline(source, stages, queue_size=config.QUEUE_SIZE, stall_warning=config.STALL_WARNING,
+                        report_every=config.REPORT_EVERY)
+    logger.info("Starting pipeline: %s. Press Ctrl+C to stop.", " -> ".join([source.name] + [s.name for s in stages]))
+    try:
+        async with client:
+            await pipeline.run(max_cycles=config.MAX_CYCLES)
+    finally:
+        logger.info("%s", pipeline.report())
+
+
+def run(config, args):
+    asyncio.run(main(config))
@@ -0,0 +1,86 @@
+"""
+score: congestion scoring with the latest checkpoint written by train.
+
+One shot by default: build the device graph, score every device and
+segment and write the predictions back. With --daemon the graph stays in
+memory and is rescored only when ingest has pushed new KPI values; a new
+checkpoint is picked up on the next cycle.
+"""
+import logging
+import time
+
+from network_health.commands import connect, ensure_collections, require_collection
+from network_health.data_access import ensure_indexes
+from network_health.graph_build import arrays_from_frame
+from network_health.kpi_store import KpiReader
+from network_health.kpis import KPI_KEYS
+from network_health.scoring import ScoringService
+
+logger = logging.getLogger(__name__)
+
+
+def build_service(config, db, segment_threshold):
+    return ScoringService(
+        db, config.CHECKPOINT_DIR,
+        traffic_collection=config.TRAFFIC_COLLECTION,
+        edge_collection=config.EDGE_COLLECTION,
+        segment_collection=config.SEGMENT_COLLECTION,
+        read_batch_size=config.READ_BATCH_SIZE,
+        write_batch_size=config.WRITE_BATCH_SIZE,
+        inference_batch_size=config.INFERENCE_BATCH_SIZE,
+        inference_workers=config.INFERENCE_WORKERS,
+        segment_strategy=config.SEGMENT_STRATEGY,
+        segment_size=config.SEGMENT_SIZE,
+        segment_cache_path=config.SEGMENT_CACHE,
+        segment_threshold=config.SEGMENT_THRESHOLD or segment_threshold,
+        transition_collection=config.TRANSITION_COLLECTION,
+        detector_state_path=config.DETECTOR_STATE,
+        shards=config.SHARDS,
+        shard_workers=config.SHARD_WORKERS,
+        shard_strategy=config.SHARD_STRATEGY,
+        kpi_store_dir=config.KPI_STORE_DIR,
+        temporal_state_path=config.TEMPORAL_STATE,
+        inference=config.INFERENCE,
+        inference_threads=config.INFERENCE_THREADS,
+        topology_dir=config.TOPOLOGY_DIR,
+    )
+
+
+def load_graph(config, service):
+    """
+    Build the service's device graph from KPI_SOURCE (columnar, vectorized).
+    """
+    if config.KPI_SOURCE == "store":
+        latest_df = KpiReader(config.KPI_STORE_DIR).latest_per_cell(columns=KPI_KEYS)
+        service.load_graph(arrays_from_frame(latest_df, service.load_edges()))
+    else:
+        service.load_graph()
+
+
+def run(config, args):
+    db = connect(config)
+    require_collection(db, config.EDGE_COLLECTION)
+    ensure_collections(db, config.SEGMENT_COLLECTION, config.TRANSITION_COLLECTION)
+    ensure_indexes(db, {"traffic_data": config.TRAFFIC_COLLECTION, "SegmentPrediction": config.SEGMENT_COLLECTION,
+                        "SegmentTransition": config.TRANSITION_COLLECTION})
+    if args.daemon:
+        return run_daemon(config, build_service(config, db, "streaming"))
+
+    service = build_service(config, db, "global")
+    load_graph(config, service)
+
+    # --- Score all devices and segments, write back to DB ---
+    service.score()
+    logger.info("Prediction distribution: %s", service.predictions.bincount(minlength=2).tolist())
+
+
+def run_daemon(config, service):
+    logger.info("Starting scoring daemon (poll every %ds). Press Ctrl+C to stop.", config.INTERVAL)
+    while True:
+        try:
+            written = service.refresh()
+            if written:
+                logger.info("Rescored, wrote %d predictions", written)
+        except Exception as e:
+            logger.exception("Scoring cycle failed: %s", e)
+        time.sleep(config.INTERVAL)
@@ -0,0 +1,57 @@
+"""
+simulate: what-if KPI scenarios against the latest checkpoint written by train.
+
+Loads the current graph as score does, reads a JSON list of scenarios
+(format in network_health.whatif), evaluates them all in batched tensor
+passes and prints a JSON report: per scenario the cells that tip into
+congestion and the segments that newly FAIL, over all scenarios the cells
+most often congested and the segments most likely to FAIL. Nothing is
+written to the database.
+
+    echo '[{"name": "12+17", "saturate": ["12", "17"]}]' | python -m network_health simulate
+    python -m network_health simulate scenarios.json --output report.json --set WHATIF_SPILL=0.3
+"""
+import json
+import logging
+import sys
+
+from network_health.commands import connect, require_collection
+from network_health.commands.score import build_service, load_graph
+from network_health.whatif import WhatIfSimulator
+
+logger = logging.getLogger(__name__)
+
+
+def read_scenarios(path):
+    """
+    List of scenario dicts from a JSON file, or stdin when path is None or "-".
+    """
+    if path in (None, "-"):
+        scenarios = json.load(sys.stdin)
+    else:
+        with open(path, "r", encoding="utf-8") as fh:
+            scenarios = json.load(fh)
+    if not isinstance(scenarios, list) or not all(isinstance(s, dict) for s in scenarios):
+        raise ValueError("Scenarios must be a JSON list of objects")
+    return scenarios
+
+
+def run(config, args):
+    scenarios = read_scenarios(args.scenarios)
+    db = connect(config)
+    require_collection(db, config.EDGE_COLLECTION)
+    service = build_service(config, db, "global")
+    load_graph(config, service)
+
+    simulator = WhatIfSimulator.from_service(
+        service, spill=config.WHATIF_SPILL, hops=config.WHATIF_HOPS, batch_size=config.WHATIF_BATCH_SIZE,
+        saturation_quantile=config.WHATIF_SATURATION_QUANTILE,
+    )
+    result = simulator.run(scenarios)
+    report = json.dumps(result.report(config.WHATIF_TOP), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(report + "\n")
+        logger.info("Wrote what-if report for %d scenarios to %s", len(scenarios), args.output)
+    else:
+        print(report)
@@ -0,0 +1,71 @@
+"""
+train: offline training of the congestion model.
+
+Builds the device graph from ArangoDB (or the KPI store), trains the
+classifier and writes a new versioned checkpoint, plus the compiled
+artifacts in EXPORT_FORMATS, that score picks up.
+"""
+import logging
+
+from network_health.checkpoints import save_checkpoint
+from network_health.commands import connect, require_collection
+from network_health.export import export_checkpoint
+from network_health.graph_build import arrays_from_frame, build_hetero_data, load_edge_rows, load_graph_arrays
+from network_health.kpi_store import KpiReader
+from network_health.kpis import KPI_KEYS
+from network_health.temporal import TemporalFeatures
+from network_health.topology import TopologyStore
+from network_health.training import train_model
+
+logger = logging.getLogger(__name__)
+
+
+def run(config, args):
+    db = connect(config)
+    require_collection(db, config.EDGE_COLLECTION)
+
+    # --- Build graph data ---
+    topology = None
+    if config.TOPOLOGY_DIR:
+        topology = TopologyStore(config.TOPOLOGY_DIR, db, config.EDGE_COLLECTION, config.TRAFFIC_COLLECTION,
+                                 config.READ_BATCH_SIZE)
+    if config.KPI_SOURCE == "store":
+        latest_df = KpiReader(config.KPI_STORE_DIR).latest_per_cell(columns=KPI_KEYS)
+        if topology is not None:
+            edges = topology.current()
+        else:
+            edges = load_edge_rows(db, config.EDGE_COLLECTION, config.READ_BATCH_SIZE)
+        arrays = arrays_from_frame(latest_df, edges)
+    else:
+        arrays = load_graph_arrays(db, config.TRAFFIC_COLLECTION, config.EDGE_COLLECTION, config.READ_BATCH_SIZE,
+                                   topology=topology)
+    extra = {"seed": config.SEED, "lr": config.LEARNING_RATE}
+    if config.TEMPORAL_WINDOW:
+        temporal = TemporalFeatures(KpiReader(config.KPI_STORE_DIR), config.TEMPORAL_WINDOW, config.TEMPORAL_ALPHA,
+                                    state_path=config.TEMPORAL_STATE)
+        temporal.refresh()
+        arrays, kpi_x = temporal.attach(arrays)
+        data, labels = build_hetero_data(arrays, kpi_x=kpi_x)
+        extra["temporal"] = temporal.config
+        logger.info("Temporal features: window=%d, %d devicekpi features", config.TEMPORAL_WINDOW, kpi_x.shape[1])
+    else:
+        data, labels = build_hetero_data(arrays)
+
+    # --- Train and save ---
+    if config.TRAIN_MODE == "minibatch":
+        from network_health.minibatch import train_minibatch  # neighbour loaders pull in torch_geometric.loader
+
+        model, metrics = train_minibatch(
+            data, labels, epochs=config.MINIBATCH_EPOCHS, lr=config.LEARNING_RATE, fanout=config.FANOUT,
+            batch_size=config.BATCH_SIZE, num_workers=config.NUM_WORKERS, seed=config.SEED
+        )
+    else:
+        model, metrics = train_model(data, labels, epochs=config.EPOCHS, lr=config.LEARNING_RATE, seed=config.SEED)
+
+    logger.info("Evaluation metrics (test set): accuracy=%.4f precision=%.4f recall=%.4f",
+                metrics["accuracy"], metrics["precision"], metrics["recall"])
+
+    version, path = save_checkpoint(config.CHECKPOINT_DIR, model, metrics=metrics, extra=extra)
+    logger.info("Saved checkpoint v%s to %s", version, path)
+    if config.EXPORT_FORMATS:
+        export_checkpoint(path, config.EXPORT_FORMATS)
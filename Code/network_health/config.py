@@ -0,0 +1,252 @@
+"""
+Settings shared by all commands, loaded from defaults, a file and the environment.
+
+Every setting has a default in DEFAULTS. load_config() layers, later wins:
+
+    1. DEFAULTS
+    2. the config file (--config or $NH_CONFIG): top-level keys, then the
+       table named after the command, e.g.
+
+           PASSWORD = "secret"
+           KPI_STORE_DIR = "/data/kpi_store"
+
+           [score]
+           SHARDS = 4
+
+       TOML (.toml) or JSON (any other suffix, same shape)
+    3. environment variables NH_<KEY>, e.g. NH_SHARDS=4 or NH_TOPOLOGY_DIR=null
+    4. --set KEY=VALUE on the command line
+
+Environment and --set values are parsed as JSON when they are valid JSON
+(numbers, true/false, null, lists, objects) and kept as strings otherwise;
+settings whose default is a string always keep the text (NH_PASSWORD=1234
+stays "1234"). Every value, from any layer, must then have the type of its
+default: an integral float becomes an int (1e3 -> 1000), an int becomes a
+float, and anything else (NH_INTERVAL=abc) is an error. None is accepted
+where the default is None and for the NULLABLE settings that None turns
+off. TOML has no null, so those are turned off through the environment or
+--set. Unknown keys, NH_* variables other than NH_CONFIG and file tables
+that are not a command name are rejected, so a misspelt setting fails at
+startup instead of being ignored.
+
+The former per-script constants keep their names, except that the edge
+collection is EDGE_COLLECTION everywhere (was EDGE_COLLECTION_DEVICE),
+update_arango.py's COLLECTION_NAME is TRAFFIC_COLLECTION, the loop periods
+(UPDATE_INTERVAL, POLL_INTERVAL) are INTERVAL and generate_data.py's
+LAYOUT/DEGREE are SYNTHETIC_LAYOUT/SYNTHETIC_DEGREE.
+"""
+import json
+import os
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    tomllib = None
+
+ENV_PREFIX = "NH_"
+CONFIG_ENV = "NH_CONFIG"  # config file used when --config is not given
+
+DEFAULTS = {
+    # --- ArangoDB ---
+    "ARANGO_URL": "http://localhost:8529",
+    "DB_NAME": "_system",
+    "USERNAME": "root",
+    "PASSWORD": "yourpassword",
+    "TRAFFIC_COLLECTION": "traffic_data",      # one document per cell with its latest KPIs
+    "EDGE_COLLECTION": "cell_edges",           # cell-to-cell connections
+    "SEGMENT_COLLECTION": "SegmentPrediction",
+    "TRANSITION_COLLECTION": "SegmentTransition",  # OK<->FAIL events (streaming threshold)
+    "ROLLUP_COLLECTION": "kpi_rollups",        # 1m/15m/1h KPI rollups for the dashboard history; None disables
+    "READ_BATCH_SIZE": 10000,                  # documents per AQL cursor batch
+    "WRITE_BATCH_SIZE": 1000,                  # documents per bulk write request
+
+    # --- Local state ---
+    "KPI_STORE_DIR": "kpi_store",              # append-only columnar KPI store (system of record)
+    "INGEST_STATE_FILE": "ingest_state.json",  # offset + per-cell watermarks, survives restarts
+    "ROLLUP_STATE_FILE": "rollup_state.json",  # rollup offset + closed buckets, survives restarts
+    "CHECKPOINT_DIR": "checkpoints",           # written by train, read by the scorers
+    "TOPOLOGY_DIR": "topology",                # memory-mapped CSR snapshot of cell_edges; None = scan the collection
+    "SEGMENT_CACHE": "segments_cache.npz",     # stable segment ids across runs
+    "DETECTOR_STATE": "segment_detector.npz",  # streaming FAIL detector state (baselines, CUSUM, status) across runs
+    "TEMPORAL_STATE": "temporal_state.npz",    # rolling KPI windows, used if the checkpoint has temporal features
+    "LAYOUT_CACHE": "layout_cache.npz",        # dashboard node positions kept across restarts
+
+    # --- Generation ---
+    "NUM_NODES": 50,                           # number of cells
+    "INTERVAL": 30,                            # seconds between generate/ingest/score cycles
+    "EXCEL_EXPORT": False,                     # also mirror every batch into EXCEL_FILENAME (slow, O(history) per tick)
+    "EXCEL_FILENAME": "synthetic_telecom_data.xlsx",  # imported into an empty KPI store
+    "SYNTHETIC_LAYOUT": None,                  # "hex" or "geometric" topology with drifting hotspots; None = uniform KPIs
+    "SYNTHETIC_DEGREE": 6,                     # nearest neighbours per cell
+    "EDGES_FILE": "synthetic_edges.json",      # cell_edges documents of the synthetic topology
+
+    # --- Scoring ---
+    "KPI_SOURCE": "arango",                    # "arango" (traffic_data) or "store" (latest row per cell in the KPI store)
+    "INFERENCE_BATCH_SIZE": None,              # e.g. 4096 for bounded-memory mini-batch inference
+    "INFERENCE_WORKERS": 0,
+    "SHARDS": 1,                               # > 1: full passes run per shard (with halo replication) in a process pool
+    "SHARD_WORKERS": None,                     # pool size; defaults to min(SHARDS, CPU count)
+    "SHARD_STRATEGY": "metis",                 # splits components larger than a shard; "metis" needs pymetis,
+                                               # "bfs"/"components" work without it but replicate a larger halo
+    "INFERENCE": "eager",                      # "torchscript" or "onnx": compiled fixed-schema model, full passes only
+    "INFERENCE_THREADS": None,                 # intra-op threads for inference; None = one per core
+    "SEGMENT_STRATEGY": "bfs",                 # "bfs", "components", "label_propagation" or "metis"
+    "SEGMENT_SIZE": 4,
+    "SEGMENT_THRESHOLD": None,                 # "global", "rolling" or "streaming"; None = "global" for a
+                                               # one-shot score, "streaming" for the daemon and the pipeline
+
+    # --- What-if simulation ---
+    "WHATIF_SPILL": 0.0,                       # fraction of a cell's KPI change passed on to its neighbours; 0 = model only
+    "WHATIF_HOPS": 2,                          # spill-over hops over connected_to
+    "WHATIF_BATCH_SIZE": None,                 # scenarios per tensor pass; None = sized to the graph
+    "WHATIF_SATURATION_QUANTILE": 0.99,        # network quantile a saturated cell's threshold KPIs are raised to
+    "WHATIF_TOP": 10,                          # cells, segments and tipped cells listed in the report
+
+    # --- Training ---
+    "SEED": 42,
+    "TEMPORAL_WINDOW": None,                   # e.g. 12 samples of rolling-window features; None = latest snapshot only
+    "TEMPORAL_ALPHA": 0.3,
+    "TRAIN_MODE": "full",                      # "full" or "minibatch" (neighbour-sampled batches)
+    "EPOCHS": 100,                             # full mode
+    "LEARNING_RATE": 0.01,
+    "MINIBATCH_EPOCHS": 10,                    # minibatch mode
+    "FANOUT": [10],                            # sampled neighbours per relation, one entry per layer
+    "BATCH_SIZE": 1024,                        # seed devices per batch
+    "NUM_WORKERS": 0,                          # NeighborLoader worker processes (with pyg-lib/torch-sparse)
+    "EXPORT_FORMATS": ["torchscript"],         # compiled artifacts written next to the checkpoint; add "onnx" if installed
+
+    # --- Pipeline ---
+    "GENERATE": True,                          # False: a separate generate command feeds the store, the pipeline only ticks
+    "SCORE": True,                             # False: ingest only (needs no checkpoint)
+    "NOTIFY_URL": "http://127.0.0.1:8050/notify",  # dashboard endpoint; None to disable
+    "MAX_CYCLES": None,                        # stop after this many cycles (None = run forever)
+    "QUEUE_SIZE": 2,                           # cycles buffered between two stages before upstream blocks
+    "STALL_WARNING": 5.0,                      # seconds blocked on a full queue before a backpressure warning
+    "REPORT_EVERY": 10,                        # print latency histograms every N completed cycles
+    "HTTP_POOL_SIZE": 16,                      # pooled connections to ArangoDB
+    "MAX_IN_FLIGHT": 8,                        # concurrent write batches
+
+    # --- Dashboard ---
+    "DASH_HOST": "127.0.0.1",
+    "DASH_PORT": 8050,
+    "DASH_DEBUG": True,
+    "CACHE_TTL": 15,                           # seconds a graph snapshot is served before its marker is checked
+    "LAYOUT_ALGORITHM": "auto",                # "spring" (NetworkX), "spectral" (scales further) or "auto"
+    "LAYOUT_ITERATIONS": 50,
+    "LOD_CELL_LIMIT": 2000,                    # above this many cells only the segment view and single segments are shown
+    "HISTORY_RANGES": {"1 hour": 3600, "6 hours": 21600, "1 day": 86400, "1 week": 604800, "30 days": 2592000},
+    "HISTORY_MAX_POINTS": 500,                 # most buckets drawn per KPI history series
+    "HISTORY_DEFAULT_KPI": "latency_ms",
+
+    # --- Observability ---
+    "METRICS_PORT": None,                      # e.g. 9101 to serve Prometheus metrics at /metrics
+    "LOG_LEVEL": None,                         # None: $LOG_LEVEL or INFO
+}
+
+# Settings with a non-None default that can be set to None to turn them off.
+NULLABLE = frozenset({
+    "ROLLUP_COLLECTION", "TOPOLOGY_DIR", "SEGMENT_CACHE", "DETECTOR_STATE", "TEMPORAL_STATE", "LAYOUT_CACHE",
+    "NOTIFY_URL",
+})
+
+
+class Config(dict):
+    """
+    Settings dict whose keys can also be read as attributes (config.SHARDS).
+    """
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def parse_value(text, default=None):
+    """
+    JSON value of an environment/--set string, or the string itself. For a
+    string default only "null" is parsed.
+    """
+    if isinstance(default, str) and text != "null":
+        return text
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def coerce(key, value, source):
+    """
+    value converted to the type of DEFAULTS[key]; ValueError if it does not fit.
+    """
+    default = DEFAULTS[key]
+    if value is None and (default is None or key in NULLABLE):
+        return None
+    if default is None:
+        return value
+    expected = type(default)
+    if expected is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if expected is int and isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, expected) and (expected is bool or not isinstance(value, bool)):
+        return value
+    raise ValueError(f"Setting {key} in {source} must be {expected.__name__} like its default {default!r}, "
+                     f"got {value!r}")
+
+
+def read_config_file(path):
+    """
+    Raw contents of a TOML or JSON config file.
+    """
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise ValueError(f"Reading '{path}' needs Python 3.11+ (tomllib); use a JSON config file instead")
+        with open(path, "rb") as fh:
+            return tomllib.load(fh)
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _check(settings, source):
+    unknown = sorted(set(settings) - set(DEFAULTS))
+    if unknown:
+        raise ValueError(f"Unknown setting(s) in {source}: {', '.join(unknown)}")
+    return {key: coerce(key, value, source) for key, value in settings.items()}
+
+
+def load_config(command=None, path=None, environ=None, overrides=()):
+    """
+    Config for `command` from DEFAULTS, the file at path (default
+    $NH_CONFIG), NH_* environment variables and KEY=VALUE overrides.
+    """
+    environ = os.environ if environ is None else environ
+    config = Config(DEFAULTS)
+    path = path or environ.get(CONFIG_ENV)
+    if path:
+        from network_health.cli import COMMANDS  # the command registry; cli itself imports this module
+
+        raw = read_config_file(path)
+        tables = {key: value for key, value in raw.items() if key not in DEFAULTS and isinstance(value, dict)}
+        unknown = sorted(set(tables) - set(COMMANDS))
+        if unknown:
+            raise ValueError(f"Unknown command table(s) in {path}: {', '.join(unknown)}; "
+                             f"expected one of {sorted(COMMANDS)}")
+        config.update(_check({key: value for key, value in raw.items() if key not in tables}, path))
+        if command in tables:
+            config.update(_check(tables[command], f"{path} [{command}]"))
+    unknown = sorted(name for name in environ if name.startswith(ENV_PREFIX) and name != CONFIG_ENV
+                     and name[len(ENV_PREFIX):] not in DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown setting(s) in the environment: {', '.join(unknown)}")
+    for name, value in environ.items():
+        key = name[len(ENV_PREFIX):]
+        if name.startswith(ENV_PREFIX) and key in DEFAULTS:
+            config.update(_check({key: parse_value(value, DEFAULTS[key])}, name))
+    for item in overrides:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Expected KEY=VALUE, got '{item}'")
+        key = key.strip()
+        config.update(_check({key: parse_value(value, DEFAULTS.get(key))}, "--set"))
+    return config
@@ -0,0 +1,330 @@
+"""
+Server-side snapshot cache for the dashboard graph.
+
+All browser sessions share one GraphSnapshotCache. Within `ttl` seconds a
+refresh is served from memory without touching ArangoDB. After that a
+cheap marker decides whether the snapshot is still current: the edge
+collection's count and revision (topology.edge_marker), the node count
+and the latest congestion_updated_at/kpi_write_seq, each one index lookup
+(falling back to hashing the distinct last_congestion_update/timestamp
+values server-side for documents without the epoch fields). Only when the
+marker moves is the full element list rebuilt. Each snapshot gets a
+version number, and a client that reports the version it already has
+receives just the node/edge fields that changed since then instead of the
+whole element list.
+
+Node elements carry precomputed positions (layout.LayoutCache) for a
+Cytoscape "preset" layout. Besides the cell view, segment_elements() builds
+the zoomed-out level of detail (one node per SegmentPrediction document,
+at the centroid of its cells) and drill_elements() the cells of one segment.
+
+Edges can come from a topology.TopologySnapshot instead of a cell_edges
+scan: its CSR order is already the sort_elements() order, so the edge
+elements are built once per snapshot version and reused.
+"""
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from network_health.data_access import latest_value
+from network_health.topology import edge_marker
+
+MARKER_QUERY = """
+RETURN [
+    LENGTH(@@nodes),
+    SHA1(CONCAT_SEPARATOR("|", SORTED_UNIQUE(FOR d IN @@nodes RETURN d.last_congestion_update))),
+    SHA1(CONCAT_SEPARATOR("|", SORTED_UNIQUE(FOR d IN @@nodes RETURN d.timestamp)))
+]
+"""
+
+
+# Node attributes shown in the dashboard, "N/A" when a document lacks them.
+NODE_DETAIL_FIELDS = (
+    "device_congestion", "call_drop_rate", "handover_success_rate", "packet_loss_rate",
+    "latency_ms", "resource_utilization", "last_congestion_update",
+)
+
+
+def element_id(element):
+    data = element["data"]
+    return data.get("id") or f"{data.get('source')}->{data.get('target')}"
+
+
+def node_element(doc, position=None):
+    """
+    Cytoscape node element for a traffic_data document (projected fields),
+    placed at position (x, y) if given.
+    """
+    data = {
+        "id": doc["_key"],
+        "label": f"Cell {doc.get('cell_id', doc['_key'])}",
+        "color": doc.get("color", "grey"),
+    }
+    for field in NODE_DETAIL_FIELDS:
+        data[field] = doc.get(field, "N/A")
+    element = {"data": data}
+    if position is not None:
+        element["position"] = {"x": round(float(position[0]), 1), "y": round(float(position[1]), 1)}
+    return element
+
+
+def edge_element(_from, _to, relation=None):
+    """
+    Cytoscape edge element; _from/_to use the "traffic_data/<key>" format.
+    """
+    return {"data": {"source": _from.split("/")[1], "target": _to.split("/")[1], "relation": relation or ""}}
+
+
+def sort_elements(elements):
+    """
+    Stable element order (nodes first), so successive snapshots can be
+    diffed by index.
+    """
+    elements.sort(key=lambda e: ("source" in e["data"], e["data"].get("id", ""),
+                                 e["data"].get("source", ""), e["data"].get("target", "")))
+    return elements
+
+
+@functools.lru_cache(maxsize=2)
+def snapshot_edge_elements(snapshot):
+    """
+    Edge elements of a TopologySnapshot in CSR order (source key, then
+    target key: the sort_elements() order), built once per snapshot.
+    """
+    keys = snapshot.keys.tolist()
+    names = snapshot.relation_names
+    return [
+        {"data": {"source": keys[src], "target": keys[dst], "relation": names[relation]}}
+        for src, dst, relation in zip(snapshot.sources().tolist(), snapshot.indices.tolist(),
+                                      snapshot.relations.tolist())
+    ]
+
+
+def cell_elements(node_docs, edge_rows, layout=None):
+    """
+    Sorted cell view elements from projected node documents and
+    [_from, _to, relation] rows (or a TopologySnapshot); layout (a
+    LayoutCache) adds positions.
+    """
+    keys = [doc["_key"] for doc in node_docs]
+    positions = [None] * len(keys)
+    if hasattr(edge_rows, "edges_for"):
+        if layout is not None:
+            positions = layout.update(keys, edge_rows.edges_for(keys))
+        nodes = [node_element(doc, position) for doc, position in zip(node_docs, positions)]
+        return sort_elements(nodes) + snapshot_edge_elements(edge_rows)
+    if layout is not None:
+        index = pd.Index(keys)
+        if edge_rows:
+            ends = np.asarray([row[:2] for row in edge_rows], dtype=object)
+            src = index.get_indexer([e.split("/", 1)[1] for e in ends[:, 0]])
+            dst = index.get_indexer([e.split("/", 1)[1] for e in ends[:, 1]])
+            keep = (src >= 0) & (dst >= 0)
+            edges = np.stack([src[keep], dst[keep]])
+        else:
+            edges = np.empty((2, 0), dtype=np.int64)
+        positions = layout.update(keys, edges)
+    elements = [node_element(doc, position) for doc, position in zip(node_docs, positions)]
+    elements.extend(edge_element(*row) for row in edge_rows)
+    return sort_elements(elements)
+
+
+def segment_elements(segment_docs, cells):
+    """
+    Zoomed-out view: one node per SegmentPrediction document, placed at the
+    centroid of its cells in the cell view elements `cells`, and one edge
+    per pair of segments joined by at least one cell edge (data.links
+    counts them).
+    """
+    positions = {e["data"]["id"]: e["position"] for e in cells if "position" in e}
+    cell_segment = {}
+    elements = []
+    for doc in segment_docs:
+        segment_id = doc["segment_id"]
+        members = doc.get("device_ids") or []
+        for key in members:
+            cell_segment[key] = segment_id
+        placed = [positions[key] for key in members if key in positions]
+        data = {
+            "id": f"segment-{segment_id}",
+            "segment_id": segment_id,
+            "label": f"Segment {segment_id}",
+            "color": "red" if doc.get("status") == "FAIL" else "green",
+            "status": doc.get("status", "N/A"),
+            "cells": len(members),
+            "norm": doc.get("norm", "N/A"),
+            "threshold": doc.get("threshold", "N/A"),
+            "updated": doc.get("updated", "N/A"),
+        }
+        element = {"data": data}
+        if placed:
+            element["position"] = {"x": round(sum(p["x"] for p in placed) / len(placed), 1),
+                                   "y": round(sum(p["y"] for p in placed) / len(placed), 1)}
+        elements.append(element)
+    links = {}
+    for e in cells:
+        data = e["data"]
+        if "source" not in data:
+            continue
+        a, b = cell_segment.get(data["source"]), cell_segment.get(data["target"])
+        if a is None or b is None or a == b:
+            continue
+        pair = (min(a, b), max(a, b))
+        links[pair] = links.get(pair, 0) + 1
+    elements.extend({"data": {"source": f"segment-{a}", "target": f"segment-{b}", "links": count}}
+                    for (a, b), count in links.items())
+    return sort_elements(elements)
+
+
+def drill_elements(cells, members):
+    """
+    Drill-down view: the cells in `members` and the edges between them.
+    """
+    members = set(members)
+    return [e for e in cells if e["data"].get("id") in members
+            or (e["data"].get("source") in members and e["data"].get("target") in members)]
+
+
+class Snapshot:
+    def __init__(self, version, marker, elements):
+        self.version = version
+        self.marker = marker
+        self.elements = elements
+        self.ids = [element_id(e) for e in elements]
+        # Serialised size of the full element list and the delta from each
+        # older version, computed once per version rather than per request.
+        self.payload_bytes = None
+        self.deltas = {}
+
+
+def arango_marker(db, node_collection, edge_collection):
+    """
+    Marker function for GraphSnapshotCache backed by an ArangoDB query.
+    """
+    def marker():
+        edges = tuple(edge_marker(db, edge_collection))
+        latest = (
+            latest_value(db, node_collection, "congestion_updated_at"),
+            latest_value(db, node_collection, "kpi_write_seq"),
+        )
+        if latest == (None, None):
+            cursor = db.aql.execute(MARKER_QUERY, bind_vars={"@nodes": node_collection})
+            return edges + tuple(next(iter(cursor)))
+        return edges + (db.collection(node_collection).count(),) + latest
+    return marker
+
+
+def segment_marker(db, segment_collection):
+    """
+    Marker function for a segment view cache: document count plus the
+    newest epoch 'updated_at' (one lookup on idx_updated_at). Every scoring
+    write stamps it and retiring segments changes the count.
+    """
+    def marker():
+        if not db.has_collection(segment_collection):
+            return None
+        return db.collection(segment_collection).count(), latest_value(db, segment_collection, "updated_at")
+    return marker
+
+
+class GraphSnapshotCache:
+    def __init__(self, fetch_elements, fetch_marker, ttl=15, history=16):
+        self.fetch_elements = fetch_elements
+        self.fetch_marker = fetch_marker
+        self.ttl = ttl
+        self.history = history
+        self._snapshots = OrderedDict()
+        self._current = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "hits": 0,
+            "marker_checks": 0,
+            "rebuilds": 0,
+            "full_responses": 0,
+            "delta_responses": 0,
+            "unchanged_responses": 0,
+            "full_payload_bytes": 0,
+            "delta_payload_bytes": 0,
+        }
+
+    def get(self):
+        """
+        Current snapshot, rebuilding it only if the marker moved.
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            if self._current is not None and now - self._checked_at < self.ttl:
+                self.stats["hits"] += 1
+                return self._current
+            marker = self.fetch_marker()
+            self.stats["marker_checks"] += 1
+            self._checked_at = now
+            if self._current is not None and marker == self._current.marker:
+                self.stats["hits"] += 1
+                return self._current
+            version = self._current.version + 1 if self._current else 1
+            self._current = Snapshot(version, marker, self.fetch_elements())
+            self.stats["rebuilds"] += 1
+            self._snapshots[version] = self._current
+            while len(self._snapshots) > self.history:
+                self._snapshots.popitem(last=False)
+            return self._current
+
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = 0.0
+            if self._current is not None:
+                self._current.marker = None
+
+    def delta(self, client_version):
+        """
+        Return (version, payload) for a client holding client_version:
+          payload None            client is up to date
+          payload list            full element list
+          payload dict            {element index: {field: new value}}
+        """
+        snapshot = self.get()
+        if client_version == snapshot.version:
+            self._count(unchanged_responses=1)
+            return snapshot.version, None
+        with self._lock:
+            base = self._snapshots.get(client_version)
+            cached = snapshot.deltas.get(client_version)
+        if base is None or base.ids != snapshot.ids:
+            if snapshot.payload_bytes is None:
+                snapshot.payload_bytes = len(json.dumps(snapshot.elements, default=str))
+            self._count(full_responses=1, full_payload_bytes=snapshot.payload_bytes)
+            return snapshot.version, snapshot.elements
+        if cached is None:
+            changes = {}
+            for index, (old, new) in enumerate(zip(base.elements, snapshot.elements)):
+                if old is new or old["data"] == new["data"]:
+                    continue
+                changes[index] = {k: v for k, v in new["data"].items() if old["data"].get(k) != v}
+            cached = changes, len(json.dumps(changes, default=str))
+            with self._lock:
+                snapshot.deltas[client_version] = cached
+        changes, size = cached
+        self._count(delta_responses=1, delta_payload_bytes=size)
+        return snapshot.version, changes
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, amount in increments.items():
+                self.stats[name] += amount
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["hit_rate"] = stats["hits"] / stats["requests"] if stats["requests"] else 0.0
+        stats["version"] = self._current.version if self._current else 0
+        stats["elements"] = len(self._current.elements) if self._current else 0
+        return stats
@@ -0,0 +1,199 @@
+"""
+Shared ArangoDB read helpers.
+
+Every scan goes through a projected AQL query on a streaming cursor:
+either KEEP(d, fields) for dict-shaped results or a plain value array per
+document, which is smaller still on the wire. Only the attributes a caller
+actually uses are transferred, and batch_size controls how many documents
+come back per HTTP round trip.
+
+ensure_indexes() creates the persistent indexes these queries rely on.
+last_congestion_update is a "%m/%d/%Y %H:%M:%S" string, which does not sort
+chronologically, so writers also store an epoch-second twin (congestion_updated_at), and
+the ingester stamps KPI writes with kpi_write_seq, a strictly increasing
+write sequence (see ingest.py). Those are indexed, so "what changed since
+X" and "latest update" questions become index range scans rather than
+full collection scans.
+
+The fetch_* helpers record their duration (arango_read_seconds) and row
+count (arango_read_rows_total) per query and collection.
+"""
+import time
+
+from network_health.instrumentation import counter, histogram
+from network_health.kpis import KPI_KEYS
+
+DEFAULT_BATCH_SIZE = 10000
+
+# Attributes the dashboard shows for a cell.
+DASHBOARD_NODE_FIELDS = [
+    "_key", "cell_id", "color", "device_congestion", "call_drop_rate", "handover_success_rate",
+    "packet_loss_rate", "latency_ms", "resource_utilization", "last_congestion_update",
+]
+
+# SegmentPrediction attributes the dashboard's segment view shows.
+SEGMENT_VIEW_FIELDS = ["_key", "segment_id", "status", "norm", "threshold", "updated", "device_ids"]
+
+INDEXES = {
+    "traffic_data": [
+        {"type": "persistent", "fields": ["congestion_updated_at"], "name": "idx_congestion_updated_at"},
+        {"type": "persistent", "fields": ["kpi_write_seq"], "name": "idx_kpi_write_seq"},
+        {"type": "persistent", "fields": ["last_congestion_update"], "name": "idx_last_congestion_update"},
+    ],
+    "SegmentPrediction": [
+        {"type": "persistent", "fields": ["status"], "name": "idx_status"},
+        {"type": "persistent", "fields": ["updated_at"], "name": "idx_updated_at"},
+    ],
+    "SegmentTransition": [
+        {"type": "persistent", "fields": ["segment_id", "at_epoch"], "name": "idx_segment_at"},
+    ],
+    "kpi_rollups": [
+        {"type": "persistent", "fields": ["cell_id", "resolution", "bucket"], "name": "idx_cell_resolution_bucket"},
+    ],
+}
+
+
+def ensure_indexes(db, collections=None):
+    """
+    Create the persistent indexes used by the projected queries (idempotent).
+    collections maps a logical name ("traffic_data", "SegmentPrediction") to
+    the actual collection name, for deployments that renamed them.
+    """
+    collections = collections or {}
+    for logical, specs in INDEXES.items():
+        name = collections.get(logical, logical)
+        if not db.has_collection(name):
+            continue
+        collection = db.collection(name)
+        for spec in specs:
+            collection.add_index(dict(spec))
+
+
+READ_SECONDS = histogram("arango_read_seconds", "Time to run a read query and drain its cursor",
+                         ("query", "collection"))
+READ_ROWS = counter("arango_read_rows_total", "Rows read from ArangoDB", ("query", "collection"))
+
+
+def _attr(field):
+    return f"d.`{field}`"
+
+
+def _drain(name, collection, cursor):
+    start = time.perf_counter()
+    rows = list(cursor)
+    READ_SECONDS.observe(time.perf_counter() - start, query=name, collection=collection)
+    READ_ROWS.inc(len(rows), query=name, collection=collection)
+    return rows
+
+
+def stream(db, query, bind_vars, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Streaming cursor: results are produced batch by batch on the server.
+    """
+    return db.aql.execute(query, bind_vars=bind_vars, batch_size=batch_size, stream=True)
+
+
+def iter_projected(db, collection, fields, batch_size=DEFAULT_BATCH_SIZE, filter_clause="", bind_vars=None):
+    """
+    Yield dicts containing only `fields` for each document.
+    """
+    query = f"FOR d IN @@col {filter_clause} RETURN KEEP(d, @fields)"
+    return stream(db, query, {"@col": collection, "fields": list(fields), **(bind_vars or {})}, batch_size)
+
+
+def iter_rows(db, collection, expressions, batch_size=DEFAULT_BATCH_SIZE, filter_clause="", bind_vars=None):
+    """
+    Yield one value list per document. expressions are AQL expressions over `d`.
+    """
+    query = f"FOR d IN @@col {filter_clause} RETURN [{', '.join(expressions)}]"
+    return stream(db, query, {"@col": collection, **(bind_vars or {})}, batch_size)
+
+
+def kpi_row_expressions():
+    return ["d.cell_id", *(f"NOT_NULL({_attr(k)}, 0)" for k in KPI_KEYS)]
+
+
+def fetch_kpi_rows(db, collection, batch_size=DEFAULT_BATCH_SIZE, keys=None):
+    """
+    [cell_id, *KPI values] per cell, optionally only for the given _keys.
+    """
+    if keys is None:
+        return _drain("kpi_rows", collection, iter_rows(db, collection, kpi_row_expressions(), batch_size))
+    return _drain("kpi_rows_by_key", collection, iter_rows(
+        db, collection, ["d._key", *kpi_row_expressions()[1:]], batch_size,
+        filter_clause="FILTER d._key IN @keys", bind_vars={"keys": list(keys)},
+    ))
+
+
+def fetch_edge_rows(db, collection, batch_size=DEFAULT_BATCH_SIZE, with_relation=False):
+    """
+    [_from, _to] (plus relation) per edge.
+    """
+    expressions = ["d._from", "d._to"] + (["d.relation"] if with_relation else [])
+    return _drain("edge_rows", collection, iter_rows(db, collection, expressions, batch_size))
+
+
+def fetch_dashboard_nodes(db, collection, batch_size=DEFAULT_BATCH_SIZE):
+    return _drain("dashboard_nodes", collection, iter_projected(db, collection, DASHBOARD_NODE_FIELDS, batch_size))
+
+
+def fetch_segment_summaries(db, collection, batch_size=DEFAULT_BATCH_SIZE):
+    return _drain("segment_summaries", collection, iter_projected(db, collection, SEGMENT_VIEW_FIELDS, batch_size))
+
+
+def existing_keys(db, collection, keys=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    The subset of `keys` that have a document in collection (primary index
+    lookups), or every key in collection when keys is None.
+    """
+    if keys is None:
+        cursor = iter_rows(db, collection, ["d._key"], batch_size)
+    else:
+        cursor = iter_rows(db, collection, ["d._key"], batch_size,
+                           filter_clause="FILTER d._key IN @keys", bind_vars={"keys": list(keys)})
+    return [row[0] for row in _drain("existing_keys", collection, cursor)]
+
+
+def kpi_changes_since(db, collection, since, batch_size=DEFAULT_BATCH_SIZE, inclusive=False):
+    """
+    [_key, kpi_write_seq] for cells whose KPIs were written after write
+    sequence `since`. Served from idx_kpi_write_seq.
+    """
+    op = ">=" if inclusive else ">"
+    return _drain("kpi_changes", collection, iter_rows(
+        db, collection, ["d._key", "d.kpi_write_seq"], batch_size,
+        filter_clause=f"FILTER d.kpi_write_seq {op} @since", bind_vars={"since": since},
+    ))
+
+
+def fetch_rollup_rows(db, collection, cell_id, resolution, start, end, kpis=KPI_KEYS):
+    """
+    [bucket, count, [statistics per KPI in kpis]] per rollup bucket of one
+    cell in [start, end) (epoch seconds), oldest first. Served from
+    idx_cell_resolution_bucket.
+    """
+    return _drain("rollup_rows", collection, db.aql.execute(
+        "FOR r IN @@col FILTER r.cell_id == @cell AND r.resolution == @resolution "
+        "AND r.bucket >= @start AND r.bucket < @end SORT r.bucket "
+        "RETURN [r.bucket, r.`count`, (FOR k IN @kpis RETURN r[k])]",
+        bind_vars={"@col": collection, "cell": int(cell_id), "resolution": resolution,
+                   "start": int(start), "end": int(end), "kpis": list(kpis)},
+    ))
+
+
+def latest_rollup_bucket(db, collection, cell_id, resolution):
+    """
+    Start of the newest rollup bucket of one cell (one index lookup), or None.
+    """
+    query = ("FOR r IN @@col FILTER r.cell_id == @cell AND r.resolution == @resolution "
+             "SORT r.bucket DESC LIMIT 1 RETURN r.bucket")
+    bind_vars = {"@col": collection, "cell": int(cell_id), "resolution": resolution}
+    return next(iter(db.aql.execute(query, bind_vars=bind_vars)), None)
+
+
+def latest_value(db, collection, field):
+    """
+    Largest value of an indexed numeric field (one index lookup), or None.
+    """
+    query = f"FOR d IN @@col FILTER {_attr(field)} != null SORT {_attr(field)} DESC LIMIT 1 RETURN {_attr(field)}"
+    return next(iter(db.aql.execute(query, bind_vars={"@col": collection})), None)
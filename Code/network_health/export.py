@@ -0,0 +1,274 @@
+"""
+Compiled CPU inference for the congestion model.
+
+The eager model dispatches through HeteroConv over four relation types on
+every call. The device graph always has the same schema, though: node
+types device and devicekpi, devicekpi i attached to device i by has_kpi,
+and device-device links in connected_to (both directions are messaged).
+FixedSchemaCongestion computes exactly the device embeddings and logits of
+CongestionModel for that schema with plain tensor ops:
+
+    embedding = W_kpi (x_kpi - mean) / std          rev_has_kpi (one KPI node per device)
+              + W_in  mean_{j -> i} x_device[j]      connected_to
+              + W_out mean_{i -> j} x_device[j]      rev_connected_to
+              + W_root x_device[i] + b               the three lin_r terms and all biases, summed
+
+The KPI normalization is folded into W_kpi and b, and the has_kpi relation
+(which only feeds devicekpi outputs, never read) is dropped. The module is
+scripted and frozen with TorchScript, or exported to ONNX when the onnx
+package is installed.
+
+Artifacts sit next to their checkpoint (congestion-v0007.pt ->
+congestion-v0007.ts / .onnx) with the checkpoint metadata embedded.
+load_compiled() only needs torch (or onnxruntime); it does not import
+torch_geometric, and loading an artifact takes milliseconds. The returned
+CompiledModel has the embed()/classifier() interface of CongestionModel
+that IncrementalEmbedder calls, so full and incremental passes run
+compiled unchanged.
+"""
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("torchscript", "onnx")
+SUFFIXES = {"torchscript": ".ts", "onnx": ".onnx"}
+METADATA_FILE = "metadata.json"
+DEVICE_EDGES = ("device", "connected_to", "device")  # model.CONNECTED_TO, without importing torch_geometric
+SCHEMA = {
+    "node_types": ["device", "devicekpi"],
+    "edge_types": [["device", "has_kpi", "devicekpi"], list(DEVICE_EDGES)],
+}
+ONNX_OPSET = 17
+
+
+# --- Fixed-schema module ---
+def _mean_aggregate(messages, src, dst):
+    """
+    Mean of messages[src] per dst node, with one row of messages per node
+    (zero for nodes without incoming edges).
+    """
+    index = dst.unsqueeze(1).expand(-1, messages.shape[1])
+    total = torch.zeros_like(messages).scatter_add(0, index, messages[src])
+    count = torch.zeros_like(messages[:, 0]).scatter_add(0, dst, torch.ones_like(dst, dtype=messages.dtype))
+    return total / count.clamp(min=1.0).unsqueeze(1)
+
+
+class FixedSchemaCongestion(torch.nn.Module):
+    """
+    Device embeddings and logits of a CongestionModel, for graphs built by
+    build_hetero_data(). Inputs: x_device [n, device_features], x_kpi
+    [n, num_features] (raw, unnormalized) and device_edges int64 [2, e].
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        convs = {relation[1]: conv for relation, conv in model.conv.convs.items()}
+        kpi, inward, outward = convs["rev_has_kpi"], convs["connected_to"], convs["rev_connected_to"]
+        with torch.no_grad():
+            scale = 1.0 / model.kpi_std
+            w_kpi = kpi.lin_l.weight * scale
+            bias = (kpi.lin_l.bias - w_kpi @ model.kpi_mean) + inward.lin_l.bias + outward.lin_l.bias
+            w_root = kpi.lin_r.weight + inward.lin_r.weight + outward.lin_r.weight
+        self.w_kpi = torch.nn.Parameter(w_kpi.t().contiguous(), requires_grad=False)
+        self.w_in = torch.nn.Parameter(inward.lin_l.weight.detach().t().contiguous(), requires_grad=False)
+        self.w_out = torch.nn.Parameter(outward.lin_l.weight.detach().t().contiguous(), requires_grad=False)
+        self.w_root = torch.nn.Parameter(w_root.t().contiguous(), requires_grad=False)
+        self.bias = torch.nn.Parameter(bias.detach().clone(), requires_grad=False)
+        self.w_cls = torch.nn.Parameter(model.classifier.weight.detach().t().contiguous(), requires_grad=False)
+        self.b_cls = torch.nn.Parameter(model.classifier.bias.detach().clone(), requires_grad=False)
+
+    @torch.jit.export
+    def embed(self, x_device, x_kpi, device_edges):
+        src, dst = device_edges[0], device_edges[1]
+        out = torch.addmm(self.bias, x_kpi, self.w_kpi) + x_device @ self.w_root
+        out = out + _mean_aggregate(x_device @ self.w_in, src, dst)
+        out = out + _mean_aggregate(x_device @ self.w_out, dst, src)
+        return out
+
+    @torch.jit.export
+    def classify(self, embeddings):
+        return torch.addmm(self.b_cls, embeddings, self.w_cls)
+
+    def forward(self, x_device, x_kpi, device_edges):
+        embeddings = self.embed(x_device, x_kpi, device_edges)
+        return embeddings, self.classify(embeddings)
+
+
+# --- Export ---
+def artifact_path(checkpoint_path, fmt="torchscript"):
+    if fmt not in SUFFIXES:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {FORMATS}")
+    return os.path.splitext(checkpoint_path)[0] + SUFFIXES[fmt]
+
+
+def _example_inputs(model, num_devices=8):
+    x_device = torch.rand(num_devices, model.device_features)
+    x_kpi = torch.rand(num_devices, model.num_features)
+    ring = torch.arange(num_devices)
+    return x_device, x_kpi, torch.stack([ring, (ring + 1) % num_devices])
+
+
+def export_torchscript(model, path, metadata=None):
+    """
+    Script, freeze and save the fixed-schema module; metadata (checkpoint
+    metadata plus the schema) is stored inside the archive.
+    """
+    module = FixedSchemaCongestion(model).eval()
+    scripted = torch.jit.freeze(torch.jit.script(module), preserved_attrs=["embed", "classify"])
+    extra = {METADATA_FILE: json.dumps({**(metadata or {}), "schema": SCHEMA})}
+    torch.jit.save(scripted, path + ".tmp", _extra_files=extra)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def export_onnx(model, path, metadata=None):
+    """
+    Export the fixed-schema module to ONNX (outputs: embeddings, logits),
+    with dynamic device and edge counts. Needs the onnx package.
+    """
+    try:
+        import onnx
+    except ImportError as exc:
+        raise ImportError("ONNX export needs the onnx package (pip install onnx onnxruntime)") from exc
+    module = FixedSchemaCongestion(model).eval()
+    classifier = {"weight": model.classifier.weight.tolist(), "bias": model.classifier.bias.tolist()}
+    torch.onnx.export(
+        module, _example_inputs(model), path + ".tmp",
+        input_names=["x_device", "x_kpi", "device_edges"], output_names=["embeddings", "logits"],
+        dynamic_axes={"x_device": {0: "devices"}, "x_kpi": {0: "devices"}, "device_edges": {1: "edges"},
+                      "embeddings": {0: "devices"}, "logits": {0: "devices"}},
+        opset_version=ONNX_OPSET,
+    )
+    proto = onnx.load(path + ".tmp")
+    entry = proto.metadata_props.add()
+    entry.key, entry.value = METADATA_FILE, json.dumps({**(metadata or {}), "schema": SCHEMA, "classifier": classifier})
+    onnx.save(proto, path)
+    os.remove(path + ".tmp")
+    return path
+
+
+def export_checkpoint(path, formats=("torchscript",)):
+    """
+    Export a checkpoint file (or the LATEST one in a directory) next to
+    itself. Returns {format: artifact path}.
+    """
+    from network_health.checkpoints import latest_path, load_checkpoint
+
+    if os.path.isdir(path):
+        path = latest_path(path)
+        if path is None:
+            raise FileNotFoundError("No checkpoint to export. Run train.py first.")
+    model, metadata = load_checkpoint(path)
+    exporters = {"torchscript": export_torchscript, "onnx": export_onnx}
+    written = {}
+    for fmt in formats:
+        written[fmt] = exporters[fmt](model, artifact_path(path, fmt), metadata)
+        logger.info("Exported checkpoint v%s to %s", metadata["version"], written[fmt])
+    return written
+
+
+# --- Inference ---
+def set_inference_threads(threads=None):
+    """
+    Intra-op threads for CPU inference (None keeps torch's default, one per
+    core). Inter-op parallelism does not help a single forward pass, so it
+    is pinned to one thread where torch still allows changing it.
+    """
+    if threads:
+        torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # only settable before the first parallel op in the process
+
+
+class CompiledModel:
+    """
+    A loaded artifact with the inference interface of CongestionModel:
+    embed(x_dict, edge_index_dict) and classifier(embeddings), plus
+    predict(x_device, x_kpi, device_edges) -> (embeddings, classes).
+    """
+
+    def __init__(self, path, threads=None):
+        start = time.perf_counter()
+        set_inference_threads(threads)
+        self.path = path
+        self.format = "onnx" if path.endswith(SUFFIXES["onnx"]) else "torchscript"
+        if self.format == "onnx":
+            self._load_onnx(path, threads)
+        else:
+            extra = {METADATA_FILE: ""}
+            self.module = torch.jit.load(path, map_location="cpu", _extra_files=extra)
+            self.metadata = json.loads(extra[METADATA_FILE])
+        self.hidden = self.metadata["hidden"]
+        self.num_features = self.metadata["num_features"]
+        self.device_features = self.metadata["device_features"]
+        self.num_layers = 1
+        logger.debug("Loaded %s in %.3f s", path, time.perf_counter() - start)
+
+    def _load_onnx(self, path, threads):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads or 0
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.metadata = json.loads(self.session.get_modelmeta().custom_metadata_map[METADATA_FILE])
+        # The graph has no separate classifier entry point; its weights travel in the metadata.
+        self._w_cls = torch.tensor(self.metadata["classifier"]["weight"]).t().contiguous()
+        self._b_cls = torch.tensor(self.metadata["classifier"]["bias"])
+
+    def __call__(self, x_device, x_kpi, device_edges):
+        """
+        (embeddings, logits) as tensors.
+        """
+        if self.format == "onnx":
+            feeds = {"x_device": np.asarray(x_device, dtype=np.float32), "x_kpi": np.asarray(x_kpi, dtype=np.float32),
+                     "device_edges": np.asarray(device_edges, dtype=np.int64)}
+            embeddings, logits = self.session.run(None, feeds)
+            return torch.from_numpy(embeddings), torch.from_numpy(logits)
+        with torch.no_grad():
+            return self.module(torch.as_tensor(x_device), torch.as_tensor(x_kpi), torch.as_tensor(device_edges))
+
+    def predict(self, x_device, x_kpi, device_edges):
+        embeddings, logits = self(x_device, x_kpi, device_edges)
+        return embeddings, logits.argmax(dim=1)
+
+    def embed(self, x_dict, edge_index_dict):
+        if self.format == "onnx":
+            return self(x_dict["device"], x_dict["devicekpi"], edge_index_dict[DEVICE_EDGES])[0]
+        with torch.no_grad():
+            return self.module.embed(x_dict["device"], x_dict["devicekpi"], edge_index_dict[DEVICE_EDGES])
+
+    def classifier(self, embeddings):
+        if self.format == "onnx":
+            return torch.addmm(self._b_cls, embeddings, self._w_cls)
+        with torch.no_grad():
+            return self.module.classify(embeddings)
+
+
+def load_compiled(path, fmt="torchscript", threads=None):
+    """
+    Load an artifact, a checkpoint's artifact, or that of the LATEST
+    checkpoint in a directory. Returns a CompiledModel.
+    """
+    if os.path.isdir(path):
+        from network_health.checkpoints import latest_path
+
+        checkpoint = latest_path(path)
+        if checkpoint is None:
+            raise FileNotFoundError(f"No checkpoint found in '{path}'. Run train.py first.")
+        path = checkpoint
+    if path.endswith(".pt"):
+        path = artifact_path(path, fmt)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No compiled model at '{path}'; export it with export_checkpoint().")
+    return CompiledModel(path, threads)
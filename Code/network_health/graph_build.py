@@ -0,0 +1,138 @@
+"""
+Columnar graph and feature construction for the congestion model.
+
+Documents and edges are streamed from ArangoDB as plain value arrays in
+large cursor batches (see data_access.py) and land directly in NumPy arrays. Features, labels
+and both edge_index tensors are then built with vectorized operations and
+handed to PyTorch with torch.from_numpy (no copy).
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+import torch
+
+from network_health.data_access import DEFAULT_BATCH_SIZE, fetch_edge_rows, fetch_kpi_rows
+from network_health.instrumentation import timed_function
+from network_health.kpis import KPI_KEYS, congestion_labels
+
+logger = logging.getLogger(__name__)
+
+class GraphArrays:
+    """
+    Column-oriented snapshot of the device graph.
+      device_keys:  array of traffic_data keys (str), one per device
+      kpi:          float32 [num_devices, len(KPI_KEYS)]
+      device_edges: int64 [2, num_edges] device index pairs from cell_edges
+    """
+
+    def __init__(self, device_keys, kpi, device_edges):
+        self.device_keys = device_keys
+        self.kpi = kpi
+        self.device_edges = device_edges
+
+    @property
+    def num_devices(self):
+        return len(self.device_keys)
+
+
+@timed_function("graph_build_seconds", "Time to build graph arrays and tensors", step="arrays")
+def arrays_from_rows(cell_rows, edge_rows, node_collection="traffic_data"):
+    """
+    Build GraphArrays from [cell_id, *kpis] rows and [_from, _to] rows (or
+    a topology.TopologySnapshot, whose edges are already indexed).
+    Edges whose endpoints are not known devices are dropped.
+    """
+    if cell_rows:
+        table = np.asarray(cell_rows, dtype=np.float64)
+    else:
+        table = np.empty((0, len(KPI_KEYS) + 1))
+    device_keys = table[:, 0].astype(np.int64).astype(str)
+    kpi = np.ascontiguousarray(table[:, 1:], dtype=np.float32)
+    return GraphArrays(device_keys, kpi, _device_edges(device_keys, edge_rows, node_collection))
+
+
+def _device_edges(device_keys, edge_rows, node_collection):
+    if hasattr(edge_rows, "edges_for"):
+        device_edges = edge_rows.edges_for(device_keys)
+    elif edge_rows:
+        ends = np.asarray(edge_rows, dtype=object)
+        index = pd.Index(np.char.add(f"{node_collection}/", device_keys))
+        src = index.get_indexer(ends[:, 0])
+        dst = index.get_indexer(ends[:, 1])
+        keep = (src >= 0) & (dst >= 0)
+        device_edges = np.stack([src[keep], dst[keep]]).astype(np.int64)
+    else:
+        device_edges = np.empty((2, 0), dtype=np.int64)
+    return device_edges
+
+
+def arrays_from_frame(df, edge_rows, node_collection="traffic_data"):
+    """
+    Same as arrays_from_rows() for a latest-per-cell DataFrame from the KPI
+    store, read column-wise straight into float32. Rows without a numeric
+    cell_id are dropped.
+    """
+    cell_ids = pd.to_numeric(df.reindex(columns=["cell_id"])["cell_id"], errors="coerce").to_numpy(np.float64)
+    valid = ~np.isnan(cell_ids)
+    if not valid.all():
+        logger.warning("Dropping %d KPI row(s) without a numeric cell_id.", int((~valid).sum()))
+        df = df[valid]
+    device_keys = cell_ids[valid].astype(np.int64).astype(str)
+    kpi = np.ascontiguousarray(df.reindex(columns=KPI_KEYS).fillna(0).to_numpy(dtype=np.float32))
+    return GraphArrays(device_keys, kpi, _device_edges(device_keys, edge_rows, node_collection))
+
+
+def load_edge_rows(db, edge_collection, batch_size=DEFAULT_BATCH_SIZE):
+    return fetch_edge_rows(db, edge_collection, batch_size)
+
+
+def load_graph_arrays(db, traffic_collection, edge_collection, batch_size=DEFAULT_BATCH_SIZE, topology=None):
+    """
+    Pull KPI values and edges from ArangoDB in cursor batches of batch_size.
+    With topology (a topology.TopologyStore) the edges come from its
+    memory-mapped snapshot instead of an edge scan.
+    """
+    cell_rows = fetch_kpi_rows(db, traffic_collection, batch_size)
+    edge_rows = topology.current() if topology is not None else load_edge_rows(db, edge_collection, batch_size)
+    return arrays_from_rows(cell_rows, edge_rows, traffic_collection)
+
+
+def device_identity_features(device_keys, dim=len(KPI_KEYS)):
+    """
+    Pseudo-random features in [0, 1) derived from each cell id with a
+    splitmix64 hash, so a device gets the same vector in every process and
+    every run (the model used to draw fresh random.random() values).
+    """
+    ids = np.asarray(device_keys).astype(np.uint64)
+    x = ids[:, None] * np.uint64(dim) + np.arange(dim, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return ((x >> np.uint64(40)).astype(np.float32) / np.float32(1 << 24))
+
+
+@timed_function("graph_build_seconds", "Time to build graph arrays and tensors", step="tensors")
+def build_hetero_data(arrays, device_x=None, kpi_x=None):
+    """
+    Return (HeteroData, labels) for a GraphArrays snapshot.
+    device_x defaults to device_identity_features() of the device keys,
+    kpi_x (the devicekpi features) to arrays.kpi; labels always come from
+    arrays.kpi.
+    """
+    from torch_geometric.data import HeteroData  # slow import; the compiled inference path never needs it
+
+    n = arrays.num_devices
+    if device_x is None:
+        device_x = device_identity_features(arrays.device_keys)
+    kpi_edges = np.arange(n, dtype=np.int64)
+
+    data = HeteroData()
+    data["device"].x = torch.from_numpy(device_x)
+    data["devicekpi"].x = torch.from_numpy(arrays.kpi if kpi_x is None else kpi_x)
+    data["device", "has_kpi", "devicekpi"].edge_index = torch.from_numpy(np.stack([kpi_edges, kpi_edges]))
+    data["device", "connected_to", "device"].edge_index = torch.from_numpy(arrays.device_edges)
+    labels = torch.from_numpy(congestion_labels(arrays.kpi))
+    return data, labels
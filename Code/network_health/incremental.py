@@ -0,0 +1,170 @@
+"""
+Incremental re-embedding of devices whose KPIs changed.
+
+With L message-passing layers, a change to the KPI node of device c can
+only reach devices within L-1 device hops of c (the KPI node is one hop
+away from its own device). IncrementalEmbedder caches every device
+embedding and logit, collects the devices whose KPIs changed, and on
+update() extracts the k-hop computation subgraph around them (the same
+node/edge selection PyG's k_hop_subgraph makes, but walked through CSR
+adjacency so the cost depends on the changed nodes' degrees rather than on
+the total edge count). Only that subgraph is run through the model and the
+affected rows are patched into the cache.
+"""
+import numpy as np
+import torch
+
+from network_health.instrumentation import counter, timed
+from network_health.model import CONNECTED_TO, HAS_KPI, REV_CONNECTED_TO, REV_HAS_KPI, edge_index_dict
+
+
+EMBEDDED_DEVICES = counter("embed_devices_total", "Device embeddings recomputed", ("mode",))
+
+
+def _csr_by(endpoints, num_nodes):
+    """
+    (indptr, edge_ids) grouping edge ids by the given endpoint array.
+    """
+    order = np.argsort(endpoints, kind="stable")
+    counts = np.bincount(endpoints, minlength=num_nodes)
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, order
+
+
+def _gather(indptr, edge_ids, nodes):
+    if len(nodes) == 0:
+        return np.empty(0, dtype=np.int64)
+    starts, ends = indptr[nodes], indptr[nodes + 1]
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    # Concatenate edge_ids[starts[i]:ends[i]] for all i without a Python loop.
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return edge_ids[np.arange(total) + offsets]
+
+
+class IncrementalEmbedder:
+    """
+    batch_size, when set, makes full refreshes run through neighbour-sampled
+    mini-batches (see minibatch.embed_minibatch) instead of one full pass;
+    sharded, a sharded.ShardedScorer, runs them shard by shard in a process
+    pool instead.
+    """
+
+    def __init__(self, model, data, batch_size=None, num_workers=0, sharded=None):
+        self.model = model
+        self.data = data
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.sharded = sharded
+        self.num_layers = getattr(model, "num_layers", 1)
+        self.num_devices = data["device"].num_nodes
+        self.edges = data[CONNECTED_TO].edge_index.numpy()
+        self._out = _csr_by(self.edges[0], self.num_devices)
+        self._in = _csr_by(self.edges[1], self.num_devices)
+        self.dirty = set()
+        self.previous_rows = None
+        self.embeddings = None
+        self.logits = None
+        self.full_refresh()
+
+    @property
+    def predictions(self):
+        return self.logits.argmax(dim=1)
+
+    def full_refresh(self):
+        with timed("embed_seconds", "Message passing (conv + classifier) time", mode="full"):
+            self._full_pass()
+        EMBEDDED_DEVICES.inc(self.num_devices, mode="full")
+        self.dirty.clear()
+
+    def _full_pass(self):
+        if self.sharded is not None:
+            self.embeddings, self.logits = self.sharded.embed(self.model, self.data)
+        elif self.batch_size:
+            from network_health.minibatch import embed_minibatch
+
+            self.embeddings, self.logits = embed_minibatch(
+                self.model, self.data, batch_size=self.batch_size, num_workers=self.num_workers
+            )
+        else:
+            with torch.no_grad():
+                self.embeddings = self.model.embed(self.data.x_dict, edge_index_dict(self.data))
+                self.logits = self.model.classifier(self.embeddings)
+
+    def mark_changed(self, indices):
+        """
+        Record devices whose KPI row changed since the last update().
+        """
+        self.dirty.update(int(i) for i in indices)
+
+    # --- Neighbourhood extraction ---
+    def incident_edges(self, nodes):
+        edge_ids = np.concatenate([_gather(*self._out, nodes), _gather(*self._in, nodes)])
+        return np.unique(edge_ids)
+
+    def expand(self, nodes, hops):
+        """
+        Nodes within `hops` undirected device hops of `nodes` (sorted, unique).
+        """
+        nodes = np.unique(np.asarray(nodes, dtype=np.int64))
+        for _ in range(hops):
+            edge_ids = self.incident_edges(nodes)
+            if len(edge_ids) == 0:
+                break
+            nodes = np.union1d(nodes, self.edges[:, edge_ids].ravel())
+        return nodes
+
+    def affected_devices(self, changed):
+        return self.expand(changed, self.num_layers - 1)
+
+    # --- Update ---
+    def update(self):
+        """
+        Re-embed only the devices affected by the dirty KPI rows.
+        Returns the indices of devices whose embeddings were recomputed; their
+        embeddings before the update are left in previous_rows.
+        """
+        if not self.dirty:
+            self.previous_rows = self.embeddings[:0].clone()
+            return np.empty(0, dtype=np.int64)
+        changed = np.fromiter(self.dirty, dtype=np.int64)
+        self.dirty.clear()
+        with timed("embed_seconds", "Message passing (conv + classifier) time", mode="incremental"):
+            affected = self._update(changed)
+        EMBEDDED_DEVICES.inc(len(affected), mode="incremental")
+        return affected
+
+    def _update(self, changed):
+        affected = self.affected_devices(changed)
+        # Exact outputs for `affected` need every edge into nodes within
+        # num_layers - 1 hops of them, and the endpoints of those edges.
+        inner = self.expand(affected, self.num_layers - 1)
+        edge_ids = self.incident_edges(inner)
+        nodes = np.union1d(inner, self.edges[:, edge_ids].ravel())
+
+        sub_edges = np.searchsorted(nodes, self.edges[:, edge_ids])
+        local = np.arange(len(nodes), dtype=np.int64)
+        node_index = torch.from_numpy(nodes)
+        kpi_edges = torch.from_numpy(np.stack([local, local]))
+        device_edges = torch.from_numpy(sub_edges)
+        x_dict = {
+            "device": self.data["device"].x[node_index],
+            "devicekpi": self.data["devicekpi"].x[node_index],
+        }
+        sub_edge_index = {
+            HAS_KPI: kpi_edges,
+            REV_HAS_KPI: kpi_edges.flip(0),
+            CONNECTED_TO: device_edges,
+            REV_CONNECTED_TO: device_edges.flip(0),
+        }
+        with torch.no_grad():
+            sub_embeddings = self.model.embed(x_dict, sub_edge_index)
+            rows = torch.from_numpy(np.searchsorted(nodes, affected))
+            target = torch.from_numpy(affected)
+            self.previous_rows = self.embeddings[target].clone()
+            self.embeddings[target] = sub_embeddings[rows]
+            self.logits[target] = self.model.classifier(sub_embeddings[rows])
+        return affected
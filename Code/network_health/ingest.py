@@ -0,0 +1,166 @@
+"""
+Incremental, watermark-based ingestion from the KPI store.
+
+The ingester remembers the global row offset it has consumed up to, the
+latest timestamp it has seen for every cell (the watermark) and a checksum
+of the values it last pushed for every cell. Each poll reads only the rows
+appended since the previous poll, keeps the newest row per cell within that
+batch, and returns just the cells whose values actually changed. The state
+is written to a small JSON file so it survives restarts.
+
+Every document of a poll is stamped with kpi_write_seq, a write sequence
+that strictly increases from poll to poll (microseconds since the epoch,
+bumped past the previous value if the clock is behind it). Unlike
+kpi_updated_at, the row's data time, it orders writes: a retried upsert or
+a lagging cell whose data is older than what other cells already carry
+still gets a sequence above every earlier write, so consumers watching
+MAX(kpi_write_seq) never skip it.
+
+The raw rows of the last poll stay available as last_batch, so other
+consumers of the same rows (rollups.KpiRollups) do not read them again.
+"""
+import json
+import os
+import time
+import zlib
+
+import pandas as pd
+
+from network_health.instrumentation import counter, histogram
+from network_health.kpi_store import TIMESTAMP_FORMAT
+
+POLL_SECONDS = histogram("ingest_poll_seconds", "Time to read and diff newly appended KPI rows")
+ROWS_READ = counter("ingest_rows_total", "KPI store rows read by the ingester")
+DOCUMENTS = counter("ingest_documents_total", "Changed cell documents produced by the ingester")
+
+
+# Bookkeeping attributes that do not count as a value change.
+_UNFINGERPRINTED = {"_key", "timestamp", "kpi_updated_at", "kpi_write_seq"}
+
+
+def _fingerprint(doc):
+    payload = json.dumps({k: v for k, v in doc.items() if k not in _UNFINGERPRINTED}, sort_keys=True, default=str)
+    return zlib.crc32(payload.encode("utf-8"))
+
+
+class WatermarkIngester:
+    """
+    Stateful reader that turns newly appended KPI rows into per-cell upserts.
+
+    Typical use:
+        docs = ingester.poll()
+        failed = push(docs)
+        ingester.commit(failed_keys=failed)
+    """
+
+    def __init__(self, reader, state_path):
+        self.reader = reader
+        self.state_path = state_path
+        self.offset = 0
+        self.watermarks = {}     # cell key -> latest epoch seconds seen
+        self.fingerprints = {}   # cell key -> checksum of last pushed values
+        self.pending = {}        # cell key -> doc that failed to push last time
+        self.write_seq = 0       # kpi_write_seq of the last committed poll
+        self.last_batch = None   # raw rows read by the last poll, indexed by global row offset
+        self._staged = None
+        self._load_state()
+
+    # --- State persistence ---
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, "r", encoding="utf-8") as fh:
+            state = json.load(fh)
+        self.offset = state.get("offset", 0)
+        self.watermarks = state.get("watermarks", {})
+        self.fingerprints = state.get("fingerprints", {})
+        self.pending = state.get("pending", {})
+        self.write_seq = state.get("write_seq", 0)
+
+    def _save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({
+                "offset": self.offset,
+                "watermarks": self.watermarks,
+                "fingerprints": self.fingerprints,
+                "pending": self.pending,
+                "write_seq": self.write_seq,
+            }, fh)
+        os.replace(tmp_path, self.state_path)
+
+    # --- Polling ---
+    def poll(self):
+        """
+        Read rows appended since the last commit and return a list of documents
+        (keyed by '_key' = cell_id) for cells that have newer, changed values.
+        Nothing is persisted until commit() is called.
+        """
+        start = time.perf_counter()
+        df, next_offset = self.reader.read_since(self.offset)
+        ROWS_READ.inc(len(df))
+        self.last_batch = df
+        changed = dict(self.pending)
+        new_watermarks = {}
+
+        if not df.empty:
+            ts = pd.to_datetime(df["timestamp"], format=TIMESTAMP_FORMAT)
+            epoch = (ts - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+            df = df.assign(_ts=epoch, _key=df["cell_id"].astype(int).astype(str))
+
+            # Newest row per cell within this batch only.
+            latest = df.sort_values("_ts", kind="stable").groupby("_key", as_index=False).last()
+
+            # Drop rows that are not newer than the persisted watermark (late or replayed data).
+            previous = latest["_key"].map(self.watermarks).fillna(-1)
+            latest = latest[latest["_ts"] > previous]
+
+            for doc in latest.to_dict("records"):
+                key = doc.pop("_key")
+                new_watermarks[key] = int(doc.pop("_ts"))
+                doc = {k: (None if pd.isna(v) else v) for k, v in doc.items()}
+                if self.fingerprints.get(key) == _fingerprint(doc):
+                    continue
+                doc["_key"] = key
+                doc["kpi_updated_at"] = new_watermarks[key]  # epoch twin of 'timestamp'
+                changed[key] = doc
+
+        # One sequence per poll, above every earlier one; retried pending docs are restamped.
+        write_seq = max(self.write_seq + 1, time.time_ns() // 1000)
+        for doc in changed.values():
+            doc["kpi_write_seq"] = write_seq
+        self._staged = (next_offset, new_watermarks, changed, write_seq)
+        POLL_SECONDS.observe(time.perf_counter() - start)
+        DOCUMENTS.inc(len(changed))
+        return list(changed.values())
+
+    def commit(self, failed_keys=()):
+        """
+        Persist the state produced by the last poll(). Documents listed in
+        failed_keys are kept as pending and returned again by the next poll.
+        """
+        if self._staged is None:
+            return
+        next_offset, new_watermarks, changed, write_seq = self._staged
+        failed_keys = set(failed_keys)
+
+        self.offset = next_offset
+        self.write_seq = write_seq
+        self.watermarks.update(new_watermarks)
+        self.pending = {k: doc for k, doc in changed.items() if k in failed_keys}
+        for key, doc in changed.items():
+            if key not in failed_keys:
+                self.fingerprints[key] = _fingerprint(doc)
+        self._staged = None
+        self._save_state()
+
+    def reset(self):
+        """
+        Forget all progress so the next poll re-reads the whole store.
+        """
+        self.offset = 0
+        self.watermarks = {}
+        self.fingerprints = {}
+        self.pending = {}
+        self._staged = None
+        self._save_state()
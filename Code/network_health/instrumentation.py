@@ -0,0 +1,357 @@
+"""
+Timers, counters and logging for the hot paths.
+
+Metrics live in one process-wide Registry (REGISTRY) and are rendered in
+the Prometheus text format: dash_code.py serves them at /metrics on its
+Flask server, and the other scripts can expose the same endpoint from a
+background thread with start_metrics_server(port).
+
+    ROWS_READ = counter("arango_read_rows_total", "Rows read from ArangoDB", ("collection",))
+    ROWS_READ.inc(len(rows), collection="traffic_data")
+
+    with timed("graph_build_seconds", step="arrays"):
+        ...
+
+Timers are histograms of seconds with LATENCY_BUCKETS; recording one costs
+a perf_counter() pair and a lock, so they wrap whole operations (a query, a
+batch, an epoch), never single documents.
+
+Logging: configure_logging() sets up leveled logging for a script (level
+from the LOG_LEVEL environment variable, default INFO). SampledLogger is for
+per-document messages such as write errors: it logs the first few and then
+every Nth, and reports how many were suppressed, so a bad batch of a
+million documents does not turn into a million log lines.
+
+Profiling: Profiler(mode, path) runs cProfile (stats written to path and
+the top entries logged) or attaches py-spy to the current process when it
+is installed. The scripts start profile_from_env(), so setting PROFILE=cprofile
+or PROFILE=py-spy profiles any of them without code changes.
+"""
+import atexit
+import contextlib
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in seconds.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+
+# --- Metrics ---
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, key, (), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def count(self, **labels):
+        series = self._series.get(_label_key(self.labelnames, labels))
+        return sum(series[:-1]) if series else 0
+
+    def sum(self, **labels):
+        series = self._series.get(_label_key(self.labelnames, labels))
+        return series[-1] if series else 0.0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", key, (("le", le),), cumulative
+            yield f"{self.name}_sum", key, (), series[-1]
+            yield f"{self.name}_count", key, (), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name!r} is already registered with a different type or labels")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(metric.labelnames, key, extra)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.counter(name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.gauge(name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+
+@contextlib.contextmanager
+def timed(name, documentation=None, **labels):
+    """
+    Observe the duration of the block (seconds) in histogram `name`, whose
+    label names are the keyword arguments given.
+    """
+    metric = histogram(name, documentation or f"Duration of {name.replace('_', ' ')}", tuple(labels))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start, **labels)
+
+
+def timed_function(name, documentation=None, **labels):
+    """
+    Decorator form of timed().
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name, documentation, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# --- Metrics endpoint ---
+def start_metrics_server(port, host="0.0.0.0", registry=REGISTRY):
+    """
+    Serve GET /metrics from a daemon thread; returns the server.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug("metrics request: " + format, *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+    return server
+
+
+# --- Logging ---
+def configure_logging(level=None):
+    """
+    Leveled logging for a script; level defaults to $LOG_LEVEL or INFO.
+    """
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    logging.basicConfig(level=level.upper() if isinstance(level, str) else level,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s", datefmt="%H:%M:%S")
+
+
+class SampledLogger:
+    """
+    Logs the first `first` messages, then every `every`-th; flush() reports
+    how many were suppressed. Use one instance per loop over documents.
+    """
+
+    def __init__(self, log, level=logging.WARNING, first=10, every=1000):
+        self.log = log
+        self.level = level
+        self.first = first
+        self.every = every
+        self.seen = 0
+        self.suppressed = 0
+
+    def __call__(self, message, *args):
+        self.seen += 1
+        if self.seen <= self.first or (self.every and self.seen % self.every == 0):
+            self.log.log(self.level, message, *args)
+        else:
+            self.suppressed += 1
+
+    def flush(self):
+        if self.suppressed:
+            self.log.log(self.level, "... %d similar messages suppressed (%d total)", self.suppressed, self.seen)
+        self.seen = self.suppressed = 0
+
+
+def log_sampled(log, messages, level=logging.WARNING, first=10, every=1000):
+    """
+    Log an iterable of (format, *args) tuples through a SampledLogger.
+    """
+    sampled = SampledLogger(log, level, first, every)
+    for message, *args in messages:
+        sampled(message, *args)
+    sampled.flush()
+
+
+# --- Profiling ---
+class Profiler:
+    """
+    mode None: no-op. "cprofile": profile with cProfile, write the stats to
+    path (default profile.pstats) and log the top entries by cumulative
+    time. "py-spy": run `py-spy record` against this process (flame graph
+    at path, default profile.svg); needs py-spy on PATH and ptrace
+    permission.
+
+    Use as a context manager around a block, or start() it at the top of a
+    script: stop() is then also registered to run at exit (Ctrl+C included).
+    """
+
+    def __init__(self, mode=None, path=None, top=25):
+        if mode not in (None, "cprofile", "py-spy"):
+            raise ValueError(f"Unknown profiling mode {mode!r}; expected None, 'cprofile' or 'py-spy'")
+        self.mode = mode
+        self.path = path or ("profile.svg" if mode == "py-spy" else "profile.pstats")
+        self.top = top
+        self._profiler = None
+        self._process = None
+
+    def start(self):
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.mode == "py-spy":
+            executable = shutil.which("py-spy")
+            if executable is None:
+                logger.warning("py-spy is not installed; running without profiling")
+                return self
+            self._process = subprocess.Popen([executable, "record", "--pid", str(os.getpid()), "--output", self.path])
+        if self.mode:
+            atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.path)
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(self.top)
+            logger.info("cProfile stats written to %s\n%s", self.path, out.getvalue())
+            self._profiler = None
+        if self._process is not None:
+            self._process.send_signal(signal.SIGINT)  # py-spy writes the flame graph on SIGINT
+            self._process.wait()
+            logger.info("py-spy flame graph written to %s", self.path)
+            self._process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def profile_from_env():
+    """
+    Profiler configured from $PROFILE ("cprofile" or "py-spy") and $PROFILE_OUTPUT.
+    """
+    return Profiler(os.environ.get("PROFILE") or None, os.environ.get("PROFILE_OUTPUT") or None)
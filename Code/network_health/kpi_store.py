@@ -0,0 +1,250 @@
+"""
+Append-only columnar KPI store.
+
+Every batch produced by the generator is written as its own Parquet part
+file inside a store directory. A small JSON manifest lists the parts in
+write order together with the global row offset at which each part starts.
+Appending a batch therefore costs O(batch) no matter how much history has
+accumulated, and readers can fetch just the rows after a given offset
+without opening older parts.
+
+Excel is still available as an optional export sink for people who want to
+open the data in a spreadsheet, but it is no longer the system of record.
+"""
+import json
+import logging
+import os
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "_manifest.json"
+PART_TEMPLATE = "part-{:08d}.parquet"
+TIMESTAMP_FORMAT = "%m/%d/%Y %H:%M:%S"
+
+
+# --- Manifest helpers ---
+def _empty_manifest():
+    return {"version": 1, "next_part": 0, "total_rows": 0, "parts": []}
+
+
+def _load_manifest(root):
+    path = os.path.join(root, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return _empty_manifest()
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _write_manifest(root, manifest):
+    # Write to a temporary file and rename so readers never see a torn manifest.
+    path = os.path.join(root, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp_path, path)
+
+
+# --- Sinks ---
+class KpiSink:
+    """
+    Destination for batches of generated KPI rows.
+    Subclasses implement append(); close() is optional.
+    """
+
+    def append(self, df):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ParquetKpiStore(KpiSink):
+    """
+    Append-only store made of one Parquet part per appended batch.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._manifest = _load_manifest(root)
+
+    @property
+    def total_rows(self):
+        return self._manifest["total_rows"]
+
+    def append(self, df):
+        """
+        Write df as a new part and record it in the manifest.
+        Returns the number of rows written.
+        """
+        if df is None or df.empty:
+            return 0
+        name = PART_TEMPLATE.format(self._manifest["next_part"])
+        path = os.path.join(self.root, name)
+        tmp_path = path + ".tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+        self._manifest["parts"].append({
+            "file": name,
+            "start": self._manifest["total_rows"],
+            "rows": len(df),
+        })
+        self._manifest["next_part"] += 1
+        self._manifest["total_rows"] += len(df)
+        _write_manifest(self.root, self._manifest)
+        return len(df)
+
+    def compact(self, target_rows=100_000):
+        """
+        Merge runs of small consecutive parts into parts of roughly target_rows.
+        Global row offsets are preserved, so reader watermarks stay valid.
+        Returns the number of parts after compaction.
+        """
+        merged_parts = []
+        obsolete = []
+        run = []
+
+        def flush_run():
+            if len(run) == 1:
+                merged_parts.append(run[0])
+            elif run:
+                frames = [pd.read_parquet(os.path.join(self.root, p["file"])) for p in run]
+                name = PART_TEMPLATE.format(self._manifest["next_part"])
+                self._manifest["next_part"] += 1
+                path = os.path.join(self.root, name)
+                pd.concat(frames, ignore_index=True).to_parquet(path + ".tmp", index=False)
+                os.replace(path + ".tmp", path)
+                merged_parts.append({
+                    "file": name,
+                    "start": run[0]["start"],
+                    "rows": sum(p["rows"] for p in run),
+                })
+                obsolete.extend(p["file"] for p in run)
+            run.clear()
+
+        for part in self._manifest["parts"]:
+            if run and sum(p["rows"] for p in run) + part["rows"] > target_rows:
+                flush_run()
+            run.append(part)
+        flush_run()
+
+        self._manifest["parts"] = merged_parts
+        _write_manifest(self.root, self._manifest)
+        for name in obsolete:
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+        return len(merged_parts)
+
+
+class ExcelKpiSink(KpiSink):
+    """
+    Optional spreadsheet export. This rewrites the whole workbook on every
+    append (openpyxl cannot append in place), so it is O(history) per call
+    and should only be enabled for small demos.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        if os.path.exists(filename):
+            try:
+                self._df = pd.read_excel(filename)
+            except Exception as e:
+                logger.error("Error loading file: %s", e)
+                self._df = pd.DataFrame()
+        else:
+            self._df = pd.DataFrame()
+
+    def append(self, df):
+        self._df = pd.concat([self._df, df], ignore_index=True)
+        self._df.to_excel(self.filename, index=False, engine="openpyxl")
+        return len(df)
+
+
+def export_excel(reader, filename, columns=None):
+    """
+    One-off export of the whole store (or selected columns) to an Excel file.
+    """
+    df = reader.read_all(columns=columns)
+    df.to_excel(filename, index=False, engine="openpyxl")
+    return len(df)
+
+
+def import_excel(store, filename):
+    """
+    Seed a store from a legacy synthetic_telecom_data.xlsx workbook.
+    Returns the number of rows imported.
+    """
+    df = pd.read_excel(filename, engine="openpyxl")
+    return store.append(df)
+
+
+# --- Reader ---
+class KpiReader:
+    """
+    Shared read API over a ParquetKpiStore directory.
+    The manifest is re-read on every call so a reader always sees parts
+    appended by a writer running in another process.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def total_rows(self):
+        return _load_manifest(self.root)["total_rows"]
+
+    def read_since(self, offset=0, columns=None):
+        """
+        Return (df, next_offset) with every row whose global offset is >= offset.
+        The returned frame is indexed by global row offset.
+        """
+        for attempt in range(2):
+            manifest = _load_manifest(self.root)
+            try:
+                frames = []
+                for part in manifest["parts"]:
+                    end = part["start"] + part["rows"]
+                    if end <= offset:
+                        continue
+                    df = pd.read_parquet(os.path.join(self.root, part["file"]), columns=columns)
+                    df.index = pd.RangeIndex(part["start"], end)
+                    if part["start"] < offset:
+                        df = df.loc[offset:]
+                    frames.append(df)
+                break
+            except FileNotFoundError:
+                # A concurrent compaction replaced the parts; retry with the new manifest.
+                if attempt:
+                    raise
+        next_offset = max(offset, manifest["total_rows"])
+        if not frames:
+            return pd.DataFrame(columns=columns), next_offset
+        return pd.concat(frames), next_offset
+
+    def read_all(self, columns=None):
+        df, _ = self.read_since(0, columns=columns)
+        return df.reset_index(drop=True)
+
+    def latest_per_cell(self, columns=None):
+        """
+        Latest row per cell_id, ordered by cell_id.
+        """
+        if columns is not None:
+            columns = list(dict.fromkeys(["timestamp", "cell_id", *columns]))
+        df = self.read_all(columns=columns)
+        if df.empty:
+            return df
+        df["timestamp_dt"] = pd.to_datetime(df["timestamp"], format=TIMESTAMP_FORMAT)
+        latest = df.sort_values("timestamp_dt", kind="stable").groupby("cell_id", as_index=False).last()
+        return latest.drop(columns="timestamp_dt")
+
+    def latest_records(self, columns=None):
+        """
+        Same as latest_per_cell() but as a list of dicts, shaped like the
+        traffic_data documents the scripts read from ArangoDB.
+        """
+        return self.latest_per_cell(columns=columns).to_dict("records")
@@ -0,0 +1,40 @@
+"""
+KPI schema shared by the model, the ingester and the dashboard.
+"""
+import numpy as np
+
+# Order matters: this is the column order of the devicekpi node features.
+KPI_KEYS = [
+    'uplink_traffic_MB', 'downlink_traffic_MB', 'active_users', 'call_drop_rate',
+    'latency_ms', 'throughput_Mbps', 'signal_strength_dBm', 'resource_utilization',
+    'handover_success_rate', 'packet_loss_rate', 'jitter_ms'
+]
+
+# Heuristic congestion label: a cell is congested when at least
+# CONGESTION_MIN_SCORE of these thresholds are exceeded.
+CONGESTION_THRESHOLDS = {
+    'uplink_traffic_MB': 40,
+    'latency_ms': 80,
+    'resource_utilization': 75,
+    'packet_loss_rate': 1.5,
+    'jitter_ms': 20,
+    'call_drop_rate': 2.0,
+}
+CONGESTION_MIN_SCORE = 2
+
+_THRESHOLD_COLUMNS = np.array([KPI_KEYS.index(k) for k in CONGESTION_THRESHOLDS])
+_THRESHOLD_VALUES = np.array(list(CONGESTION_THRESHOLDS.values()), dtype=np.float32)
+
+
+def congestion_scores(kpi):
+    """
+    Number of exceeded thresholds per row of an [n, len(KPI_KEYS)] KPI matrix.
+    """
+    return (kpi[:, _THRESHOLD_COLUMNS] > _THRESHOLD_VALUES).sum(axis=1)
+
+
+def congestion_labels(kpi):
+    """
+    Vectorized six-threshold congestion label (1 = congested) as int64.
+    """
+    return (congestion_scores(kpi) >= CONGESTION_MIN_SCORE).astype(np.int64)
@@ -0,0 +1,241 @@
+"""
+Server-side node positions for the dashboard graph.
+
+Cytoscape's in-browser cose layout re-runs on every refresh and freezes
+the page past a few thousand cells. Instead, positions are computed once
+on the server and sent with a "preset" layout; LayoutCache recomputes them
+only when the topology (the set of cells and cell_edges pairs) changes,
+and keeps them in a file so a dashboard restart does not pay again.
+
+compute_layout() lays out every connected component on its own and packs
+the components in rows, largest first:
+
+  "spring"    NetworkX Fruchterman-Reingold, warm-started from the previous
+              positions so an edge change does not reshuffle the picture;
+              O(n^2) per iteration, for components up to SPRING_MAX_NODES
+  "spectral"  the two smallest non-trivial Laplacian eigenvectors (sparse
+              shift-invert solve), which unfolds mesh-like cell topologies,
+              then force-directed refinement with cut-off repulsion;
+              scales to a few hundred thousand cells
+  "auto"      spring for small components, spectral for the rest
+
+Positions are in Cytoscape pixels, NODE_SPACING apart on average.
+"""
+import hashlib
+import logging
+import os
+
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import eigsh
+from scipy.spatial import cKDTree
+
+from network_health.instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+ALGORITHMS = ("auto", "spring", "spectral")
+SPRING_MAX_NODES = 150  # spring takes ~0.07 s at 150 hex cells, 0.26 s at 300, seconds at 1000
+NODE_SPACING = 60.0  # pixels per cell; nodes are drawn 40px wide
+COMPONENT_GAP = 2.0  # spacings between packed components
+
+
+def topology_signature(node_keys, edges):
+    """
+    SHA1 of the node key set and the undirected edge set between them
+    (independent of node and edge order).
+    """
+    node_keys = np.asarray(node_keys, dtype=str)
+    n = len(node_keys)
+    order = np.argsort(node_keys, kind="stable")
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    digest = hashlib.sha1()
+    digest.update("\x00".join(node_keys[order].tolist()).encode("utf-8"))
+    edges = rank[np.asarray(edges, dtype=np.int64).reshape(2, -1)]
+    pairs = np.unique(np.minimum(edges[0], edges[1]) * max(n, 1) + np.maximum(edges[0], edges[1]))
+    digest.update(pairs.tobytes())
+    return digest.hexdigest()
+
+
+def _normalize(coords):
+    """
+    Centre on the origin and scale the larger extent to [-1, 1].
+    """
+    coords = coords - coords.mean(axis=0)
+    extent = np.abs(coords).max()
+    return coords / extent if extent > 0 else coords
+
+
+def _spectral(adjacency):
+    n = adjacency.shape[0]
+    laplacian = sp.diags(np.asarray(adjacency.sum(axis=1)).ravel()) - adjacency
+    # Shift-invert just below zero: the smallest eigenvalues converge in a
+    # few factorized solves instead of thousands of plain Lanczos steps.
+    _, vectors = eigsh(laplacian.tocsc(), k=3, sigma=-1e-2, which="LM", v0=np.ones(n))
+    coords = vectors[:, 1:3]
+    # Eigenvectors have an arbitrary sign; fix it so recomputes do not mirror the picture.
+    flip = np.sign(coords[np.abs(coords).argmax(axis=0), [0, 1]])
+    return _normalize(coords * np.where(flip == 0, 1, flip))
+
+
+def _refine(coords, adjacency, iterations):
+    """
+    Fruchterman-Reingold with the repulsion cut off at two spacings (the
+    grid variant of the original paper): pairs come from a k-d tree, so an
+    iteration is O(n log n) instead of O(n^2). Spreads out the nodes the
+    spectral embedding squeezes together near the border.
+    """
+    n = adjacency.shape[0]
+    pos = coords * (np.sqrt(n) / 2)  # spacing units, ideal edge length 1
+    upper = sp.triu(adjacency).tocoo()
+    src, dst = upper.row, upper.col
+    temperature = 0.5
+    for _ in range(iterations):
+        pairs = cKDTree(pos).query_pairs(2.0, output_type="ndarray")
+        delta = pos[pairs[:, 0]] - pos[pairs[:, 1]]
+        dist = np.maximum(np.linalg.norm(delta, axis=1), 1e-3)
+        push = delta * (1.0 / dist ** 2)[:, None]  # k^2 / d along the unit vector
+        delta = pos[src] - pos[dst]
+        pull = delta * np.linalg.norm(delta, axis=1)[:, None]  # d^2 / k along the unit vector
+        ends = np.concatenate([pairs[:, 0], pairs[:, 1], src, dst])
+        force = np.column_stack([
+            np.bincount(ends, np.concatenate([push[:, i], -push[:, i], -pull[:, i], pull[:, i]]), minlength=n)
+            for i in range(2)
+        ])
+        length = np.maximum(np.linalg.norm(force, axis=1), 1e-9)
+        pos += force * (np.minimum(length, temperature) / length)[:, None]
+        temperature *= 0.95
+    return _normalize(pos)
+
+
+def _spring(adjacency, iterations, seed, initial):
+    graph = nx.from_scipy_sparse_array(adjacency)
+    pos = nx.spring_layout(graph, pos=initial, iterations=iterations, seed=seed)
+    return _normalize(np.array([pos[i] for i in range(adjacency.shape[0])]))
+
+
+def _component_layout(adjacency, algorithm, iterations, seed, initial):
+    n = adjacency.shape[0]
+    if n == 1:
+        return np.zeros((1, 2))
+    if n == 2:
+        return np.array([[-1.0, 0.0], [1.0, 0.0]])
+    if algorithm == "spring" or (algorithm == "auto" and n <= SPRING_MAX_NODES):
+        return _spring(adjacency, iterations, seed, initial)
+    return _refine(_spectral(adjacency), adjacency, iterations)
+
+
+def compute_layout(num_nodes, edges, algorithm="auto", iterations=50, seed=0, initial=None):
+    """
+    float [num_nodes, 2] pixel positions for the graph with int64 [2, e]
+    edges. initial (optional, earlier positions with NaN rows for new
+    nodes) warm-starts the spring layout of components without new nodes.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown layout algorithm {algorithm!r}; expected one of {ALGORITHMS}")
+    edges = np.asarray(edges, dtype=np.int64).reshape(2, -1)
+    adjacency = sp.coo_matrix((np.ones(edges.shape[1]), (edges[0], edges[1])), shape=(num_nodes, num_nodes)).tocsr()
+    adjacency = ((adjacency + adjacency.T) > 0).astype(np.float64)
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+    num_components, labels = connected_components(adjacency, directed=False)
+    order = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[order], np.arange(num_components + 1))
+    sizes = np.diff(bounds)
+
+    positions = np.zeros((num_nodes, 2))
+    # Shelf packing: each component gets a square box of side ~sqrt(size)
+    # spacings; boxes fill rows up to the width of a square holding them all.
+    sides = np.sqrt(sizes) + COMPONENT_GAP
+    row_width = np.sqrt((sides ** 2).sum())
+    x = y = row_height = 0.0
+    for c in np.argsort(-sizes, kind="stable"):
+        nodes = order[bounds[c]:bounds[c + 1]]
+        start = None
+        if initial is not None and len(nodes) > 2:
+            known = initial[nodes]
+            if not np.isnan(known).any():
+                start = dict(enumerate(_normalize(known)))
+        local = _component_layout(adjacency[nodes][:, nodes], algorithm, iterations, seed, start)
+        side = sides[c]
+        if x > 0 and x + side > row_width:
+            x, y, row_height = 0.0, y + row_height, 0.0
+        half = (side - COMPONENT_GAP) / 2
+        positions[nodes] = (local * half + [x + side / 2, y + side / 2]) * NODE_SPACING
+        x += side
+        row_height = max(row_height, side)
+    return positions
+
+
+class LayoutCache:
+    """
+    Positions per node key, recomputed only when topology_signature()
+    changes. path (optional) persists them across restarts.
+    """
+
+    def __init__(self, path=None, algorithm="auto", iterations=50, seed=0):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown layout algorithm {algorithm!r}; expected one of {ALGORITHMS}")
+        self.path = path
+        self.algorithm = algorithm
+        self.iterations = iterations
+        self.seed = seed
+        self.signature = None
+        self.keys = np.empty(0, dtype=str)
+        self.positions = np.empty((0, 2))
+        self.recomputes = 0
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with np.load(self.path, allow_pickle=False) as saved:
+            if str(saved["algorithm"]) != self.algorithm:
+                return
+            self.signature = str(saved["signature"])
+            self.keys = saved["keys"]
+            self.positions = saved["positions"]
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, keys=self.keys, positions=self.positions, signature=self.signature,
+                 algorithm=self.algorithm)
+        os.replace(tmp_path, self.path)
+
+    def update(self, node_keys, edges):
+        """
+        Positions aligned with node_keys for int64 [2, e] edges between
+        them, computed only if the topology changed since the last call.
+        """
+        node_keys = np.asarray(node_keys, dtype=str)
+        signature = topology_signature(node_keys, edges)
+        if signature == self.signature and np.array_equal(node_keys, self.keys):
+            return self.positions
+        if signature != self.signature:
+            initial = self.lookup(node_keys)
+            with timed("dashboard_layout_seconds", "Time to compute server-side node positions"):
+                positions = compute_layout(len(node_keys), edges, self.algorithm, self.iterations, self.seed, initial)
+            self.recomputes += 1
+            logger.info("Computed %s layout for %d nodes", self.algorithm, len(node_keys))
+        else:
+            positions = self.lookup(node_keys)  # same topology, nodes only reordered
+        self.signature, self.keys, self.positions = signature, node_keys, positions
+        self._save()
+        return positions
+
+    def lookup(self, node_keys):
+        """
+        Cached positions for node_keys (NaN rows for unknown keys).
+        """
+        positions = np.full((len(node_keys), 2), np.nan)
+        if len(self.keys):
+            order = np.argsort(self.keys)
+            found = np.searchsorted(self.keys[order], node_keys).clip(max=len(order) - 1)
+            hit = self.keys[order[found]] == node_keys
+            positions[hit] = self.positions[order[found[hit]]]
+        return positions
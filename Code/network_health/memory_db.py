@@ -0,0 +1,118 @@
+"""
+In-memory stand-in for the parts of a python-arango database the writers
+and readers use, for benchmarks and dry runs without an ArangoDB server.
+
+MemoryDatabase supports has_collection/create_collection/collection, and
+MemoryCollection the document calls BulkWriter makes (insert_many with
+overwrite_mode, update_many, delete_many, count, revision). Each batch is
+serialized to JSON on the way in, as the HTTP client would, so write
+timings include the client-side encoding cost. AQL is not available; the
+read helpers return the same row shapes as the projected queries in
+data_access.py.
+"""
+import json
+import uuid
+
+from network_health.data_access import DASHBOARD_NODE_FIELDS
+from network_health.kpis import KPI_KEYS
+
+
+class DocumentNotFound(Exception):
+    http_code = 404
+    error_code = 1202
+
+
+class MemoryCollection:
+    def __init__(self, name):
+        self.name = name
+        self.documents = {}
+        self._revision = 0
+
+    def count(self):
+        return len(self.documents)
+
+    def revision(self):
+        """
+        Changes on every write, like ArangoDB's collection revision.
+        """
+        return str(self._revision)
+
+    def _encode(self, batch):
+        return json.loads(json.dumps(batch, default=str))
+
+    def insert_many(self, documents, overwrite_mode=None, silent=False):
+        self._revision += 1
+        results = []
+        for doc in self._encode(documents):
+            key = doc.setdefault("_key", uuid.uuid4().hex)
+            if overwrite_mode == "update" and key in self.documents:
+                self.documents[key].update(doc)
+            else:
+                self.documents[key] = doc
+            results.append({"_key": key})
+        return results
+
+    def update_many(self, documents, silent=False):
+        self._revision += 1
+        results = []
+        for doc in self._encode(documents):
+            current = self.documents.get(doc.get("_key"))
+            if current is None:
+                results.append(DocumentNotFound(f"document {doc.get('_key')} not found"))
+                continue
+            current.update(doc)
+            results.append({"_key": doc["_key"]})
+        return results
+
+    def delete_many(self, documents, silent=False):
+        self._revision += 1
+        results = []
+        for doc in documents:
+            if self.documents.pop(doc["_key"], None) is None:
+                results.append(DocumentNotFound(f"document {doc['_key']} not found"))
+            else:
+                results.append({"_key": doc["_key"]})
+        return results
+
+    def truncate(self):
+        self._revision += 1
+        self.documents.clear()
+
+
+class MemoryDatabase:
+    def __init__(self):
+        self.collections = {}
+
+    def has_collection(self, name):
+        return name in self.collections
+
+    def create_collection(self, name, edge=False):
+        self.collections[name] = MemoryCollection(name)
+        return self.collections[name]
+
+    def collection(self, name):
+        return self.collections[name]
+
+    # --- Reads, same shapes as data_access ---
+    def kpi_rows(self, collection):
+        """
+        [cell_id, *KPI_KEYS] rows, like fetch_kpi_rows().
+        """
+        return [[doc.get("cell_id"), *(doc.get(k) or 0 for k in KPI_KEYS)]
+                for doc in self.collections[collection].documents.values()]
+
+    def edge_rows(self, collection, with_relation=False):
+        """
+        [_from, _to] (or [_from, _to, relation]) rows, like fetch_edge_rows().
+        """
+        docs = self.collections[collection].documents.values()
+        if with_relation:
+            return [[doc["_from"], doc["_to"], doc.get("relation")] for doc in docs]
+        return [[doc["_from"], doc["_to"]] for doc in docs]
+
+    def dashboard_nodes(self, collection):
+        """
+        Projected node documents, like fetch_dashboard_nodes().
+        """
+        return [{field: doc[field] for field in DASHBOARD_NODE_FIELDS if field in doc}
+                for doc in self.collections[collection].documents.values()]
@@ -0,0 +1,259 @@
+"""
+Mini-batch, neighbour-sampled training and inference.
+
+Instead of running the conv over the whole graph at once, a loader samples
+a fixed fan-out of neighbours per relation around each batch of seed
+devices. Training updates the SAGEConv layers and the classifier end to
+end; inference visits every device in batches.
+
+PyG's NeighborLoader is used when a hetero sampling backend (pyg-lib or
+torch-sparse) is installed. Otherwise EgoNetLoader samples the same
+subgraphs from CSR adjacency over connected_to in NumPy: per hop and
+direction at most fan-out incoming edges of every frontier device, plus
+each sampled device's own KPI node. Both yield HeteroData batches with the
+seed devices first.
+
+Activations, messages and the gathered feature rows of a batch are bounded
+by batch_size x fan-out, independent of the number of cells. What stays
+O(cells) is the input (the device and devicekpi feature matrices, the edge
+list and, for EgoNetLoader, its CSR index) and the output embeddings;
+benchmarks/bench_minibatch.py measures peak RSS against a full pass.
+"""
+import logging
+import time
+
+import numpy as np
+import torch
+from sklearn.metrics import accuracy_score, precision_score, recall_score
+from sklearn.model_selection import train_test_split
+from torch_geometric.data import HeteroData
+
+from network_health.incremental import _csr_by, _gather
+from network_health.instrumentation import counter
+from network_health.model import (CONNECTED_TO, HAS_KPI, RELATIONS, REV_CONNECTED_TO, REV_HAS_KPI, CongestionModel,
+                                  edge_index_dict)
+from network_health.training import EPOCH_SECONDS, TRAIN_LOSS
+
+logger = logging.getLogger(__name__)
+
+TRAIN_BATCHES = counter("train_batches_total", "Mini-batches trained on")
+
+DEFAULT_FANOUT = (10,)
+DEFAULT_BATCH_SIZE = 1024
+
+
+def with_reverse_edges(data):
+    """
+    HeteroData sharing data's tensors but with all four relations stored
+    explicitly, so the sampler can walk the reverse directions too.
+    """
+    sampled = HeteroData()
+    sampled["device"].x = data["device"].x
+    sampled["devicekpi"].x = data["devicekpi"].x
+    for relation, edge_index in edge_index_dict(data).items():
+        sampled[relation].edge_index = edge_index
+    return sampled
+
+
+def native_sampler_available():
+    """
+    True when PyG can sample heterogeneous neighbourhoods (pyg-lib or torch-sparse).
+    """
+    from torch_geometric.typing import WITH_PYG_LIB, WITH_TORCH_SPARSE
+
+    return WITH_PYG_LIB or WITH_TORCH_SPARSE
+
+
+class EgoNetLoader:
+    """
+    Neighbour sampler over CSR adjacency, yielding the same batches as
+    NeighborLoader: HeteroData of the sampled subgraph with the seed devices
+    first, batch["device"].batch_size seeds and .n_id global device ids (the
+    devicekpi nodes are numbered like their devices). Sampling is vectorized
+    in the calling process, so num_workers does not apply.
+    """
+
+    def __init__(self, data, input_nodes=None, fanout=DEFAULT_FANOUT, batch_size=DEFAULT_BATCH_SIZE,
+                 shuffle=False, seed=None):
+        self.data = data
+        self.num_devices = data["device"].num_nodes
+        self.edges = data[CONNECTED_TO].edge_index.numpy()
+        self.in_csr = _csr_by(self.edges[1], self.num_devices)   # connected_to messages into a device
+        self.out_csr = _csr_by(self.edges[0], self.num_devices)  # rev_connected_to messages into a device
+        if input_nodes is None:
+            self.input_nodes = np.arange(self.num_devices, dtype=np.int64)
+        else:
+            self.input_nodes = np.asarray(input_nodes, dtype=np.int64)
+        self.fanout = list(fanout)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return -(-len(self.input_nodes) // self.batch_size)
+
+    def __iter__(self):
+        nodes = self.rng.permutation(self.input_nodes) if self.shuffle else self.input_nodes
+        for first in range(0, len(nodes), self.batch_size):
+            yield self.sample(nodes[first:first + self.batch_size])
+
+    def _sample_edges(self, csr, frontier, fanout):
+        """
+        Ids of at most `fanout` (-1 = all) random edges per frontier device from csr.
+        """
+        indptr, _ = csr
+        edge_ids = _gather(*csr, frontier)
+        lengths = indptr[frontier + 1] - indptr[frontier]
+        if fanout < 0 or len(edge_ids) == 0 or lengths.max() <= fanout:
+            return edge_ids
+        # Edges are grouped by frontier device; shuffle within groups, keep the first fanout.
+        owner = np.repeat(np.arange(len(frontier)), lengths)
+        order = np.lexsort((self.rng.random(len(edge_ids)), owner))
+        rank = np.arange(len(edge_ids)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return edge_ids[order[rank < fanout]]
+
+    def sample(self, seeds):
+        """
+        HeteroData batch for one array of seed device indices.
+        """
+        seeds = np.asarray(seeds, dtype=np.int64)
+        into, back, visited = [], [], [seeds]
+        seen, frontier = np.sort(seeds), seeds
+        for fanout in self.fanout:
+            if len(frontier) == 0:
+                break
+            into.append(self._sample_edges(self.in_csr, frontier, fanout))
+            back.append(self._sample_edges(self.out_csr, frontier, fanout))
+            reached = np.unique(np.concatenate([self.edges[0, into[-1]], self.edges[1, back[-1]]]))
+            frontier = reached[~np.isin(reached, seen, assume_unique=True)]
+            seen = np.union1d(seen, frontier)
+            visited.append(frontier)
+        n_id = np.concatenate(visited)
+        into = np.concatenate(into) if into else np.empty(0, dtype=np.int64)
+        back = np.concatenate(back) if back else np.empty(0, dtype=np.int64)
+
+        # Global -> local numbering through the sorted node ids.
+        order = np.argsort(n_id, kind="stable")
+        sorted_ids = n_id[order]
+
+        def local(ids):
+            return torch.from_numpy(order[np.searchsorted(sorted_ids, ids)])
+
+        kpi_edges = torch.arange(len(n_id))
+        ids = torch.from_numpy(n_id)
+        batch = HeteroData()
+        batch["device"].x = self.data["device"].x[ids]
+        batch["devicekpi"].x = self.data["devicekpi"].x[ids]
+        batch[HAS_KPI].edge_index = torch.stack([kpi_edges, kpi_edges])
+        batch[REV_HAS_KPI].edge_index = torch.stack([kpi_edges, kpi_edges])
+        batch[CONNECTED_TO].edge_index = torch.stack([local(self.edges[0, into]), local(self.edges[1, into])])
+        batch[REV_CONNECTED_TO].edge_index = torch.stack([local(self.edges[1, back]), local(self.edges[0, back])])
+        if "y" in self.data["device"]:
+            batch["device"].y = self.data["device"].y[ids]
+        batch["device"].n_id = ids
+        batch["device"].batch_size = len(seeds)
+        return batch
+
+
+def make_loader(sampled, input_nodes=None, fanout=DEFAULT_FANOUT, batch_size=DEFAULT_BATCH_SIZE,
+                num_workers=0, shuffle=False, seed=None):
+    """
+    Loader over device seeds; fanout has one entry per layer (-1 = all).
+    NeighborLoader when a sampling backend is installed, EgoNetLoader otherwise.
+    """
+    if not native_sampler_available():
+        logger.debug("No pyg-lib or torch-sparse; sampling with EgoNetLoader")
+        return EgoNetLoader(sampled, input_nodes, fanout=fanout, batch_size=batch_size, shuffle=shuffle, seed=seed)
+
+    from torch_geometric.loader import NeighborLoader
+
+    return NeighborLoader(
+        sampled,
+        num_neighbors={relation: list(fanout) for relation in RELATIONS},
+        input_nodes=("device", input_nodes),
+        batch_size=batch_size,
+        shuffle=shuffle,
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,
+    )
+
+
+@torch.no_grad()
+def embed_minibatch(model, data, batch_size=DEFAULT_BATCH_SIZE, num_workers=0, fanout=None):
+    """
+    Embeddings and logits for every device, computed batch by batch.
+    The default fan-out takes all neighbours, so results match a full pass.
+    """
+    fanout = fanout or (-1,) * getattr(model, "num_layers", 1)
+    loader = make_loader(with_reverse_edges(data), fanout=fanout, batch_size=batch_size, num_workers=num_workers)
+    num_devices = data["device"].num_nodes
+    embeddings = torch.empty(num_devices, model.hidden)
+    logits = torch.empty(num_devices, 2)
+    model.eval()
+    for batch in loader:
+        seeds = batch["device"].batch_size
+        batch_embeddings = model.embed(batch.x_dict, batch.edge_index_dict)[:seeds]
+        ids = batch["device"].n_id[:seeds]
+        embeddings[ids] = batch_embeddings
+        logits[ids] = model.classifier(batch_embeddings)
+    return embeddings, logits
+
+
+def train_minibatch(data, labels, epochs=10, lr=0.01, fanout=DEFAULT_FANOUT, batch_size=DEFAULT_BATCH_SIZE,
+                    num_workers=0, test_size=0.4, seed=42):
+    """
+    End-to-end training of conv + classifier on sampled neighbourhoods.
+    Returns (model, metrics) like training.train_model().
+    """
+    torch.manual_seed(seed)
+    model = CongestionModel(num_features=data["devicekpi"].x.shape[1], device_features=data["device"].x.shape[1])
+    model.fit_normalization(data["devicekpi"].x)
+
+    train_idx, test_idx = train_test_split(
+        list(range(len(labels))), test_size=test_size, random_state=seed, stratify=labels
+    )
+    sampled = with_reverse_edges(data)
+    sampled["device"].y = labels
+    loader = make_loader(sampled, torch.tensor(train_idx), fanout=fanout, batch_size=batch_size,
+                         num_workers=num_workers, shuffle=True, seed=seed)
+
+    logger.info("Label distribution: %s", torch.bincount(labels).tolist())
+    class_counts = torch.bincount(labels[train_idx], minlength=2)
+    weights = 1.0 / class_counts.float().clamp_min(1)
+    loss_fn = torch.nn.CrossEntropyLoss(weight=weights)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    logger.info("Class weights: %s", weights.tolist())
+
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        model.train()
+        total_loss = 0.0
+        total_seeds = 0
+        for batch in loader:
+            seeds = batch["device"].batch_size
+            logits = model(batch.x_dict, batch.edge_index_dict)[:seeds]
+            loss = loss_fn(logits, batch["device"].y[:seeds])
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * seeds
+            total_seeds += seeds
+            TRAIN_BATCHES.inc()
+        EPOCH_SECONDS.observe(time.perf_counter() - start, mode="minibatch")
+        TRAIN_LOSS.set(total_loss / max(total_seeds, 1), mode="minibatch")
+        logger.info("Epoch %d, Loss: %.4f", epoch, total_loss / max(total_seeds, 1))
+
+    _, logits = embed_minibatch(model, data, batch_size=batch_size, num_workers=num_workers)
+    predicted_labels = logits[test_idx].argmax(dim=1).numpy()
+    true_labels = labels[test_idx].numpy()
+    metrics = {
+        "accuracy": float(accuracy_score(true_labels, predicted_labels)),
+        "precision": float(precision_score(true_labels, predicted_labels, zero_division=0)),
+        "recall": float(recall_score(true_labels, predicted_labels, zero_division=0)),
+        "num_devices": int(len(labels)),
+        "epochs": epochs,
+        "mode": "minibatch",
+        "fanout": list(fanout),
+        "batch_size": batch_size,
+    }
+    return model, metrics
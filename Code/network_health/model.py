@@ -0,0 +1,85 @@
+"""
+Congestion model: one HeteroConv message-passing layer over the device
+graph followed by a linear congestion classifier.
+
+The KPI normalization statistics are registered as buffers, so they are
+saved and restored with the rest of the weights in a checkpoint.
+
+torch_geometric is imported when a model is built, not with this module:
+the relation names and edge_index_dict() are used on paths (incremental
+and compiled scoring) that never construct the eager model.
+"""
+import torch
+
+from network_health.kpis import KPI_KEYS
+
+HAS_KPI = ("device", "has_kpi", "devicekpi")
+REV_HAS_KPI = ("devicekpi", "rev_has_kpi", "device")
+CONNECTED_TO = ("device", "connected_to", "device")
+REV_CONNECTED_TO = ("device", "rev_connected_to", "device")
+RELATIONS = (HAS_KPI, REV_HAS_KPI, CONNECTED_TO, REV_CONNECTED_TO)
+
+
+def edge_index_dict(data):
+    """
+    Edge indices for all four relations, adding the reverse directions.
+    """
+    kpi = data[HAS_KPI].edge_index
+    device = data[CONNECTED_TO].edge_index
+    return {
+        HAS_KPI: kpi,
+        REV_HAS_KPI: kpi.flip(0),
+        CONNECTED_TO: device,
+        REV_CONNECTED_TO: device.flip(0),
+    }
+
+
+class CongestionModel(torch.nn.Module):
+    num_layers = 1  # message-passing depth; bounds the k-hop reach of a KPI change
+
+    def __init__(self, num_features=len(KPI_KEYS), hidden=len(KPI_KEYS), device_features=len(KPI_KEYS)):
+        """
+        num_features is the width of the devicekpi features (raw KPIs plus
+        any temporal features), device_features that of the device features.
+        """
+        from torch_geometric.nn import HeteroConv, SAGEConv
+
+        super().__init__()
+        self.num_features = num_features
+        self.hidden = hidden
+        self.device_features = device_features
+        dims = {"device": device_features, "devicekpi": num_features}
+        self.conv = HeteroConv({
+            relation: SAGEConv((dims[relation[0]], dims[relation[2]]), hidden) for relation in RELATIONS
+        }, aggr="sum")
+        self.classifier = torch.nn.Linear(hidden, 2)
+        self.register_buffer("kpi_mean", torch.zeros(num_features))
+        self.register_buffer("kpi_std", torch.ones(num_features))
+
+    def fit_normalization(self, kpi_x):
+        """
+        Record per-column mean/std of the devicekpi features used for training.
+        """
+        self.kpi_mean.copy_(kpi_x.mean(dim=0))
+        self.kpi_std.copy_(kpi_x.std(dim=0, unbiased=False).clamp_min(1e-6))
+
+    def normalize(self, x_dict):
+        return {**x_dict, "devicekpi": (x_dict["devicekpi"] - self.kpi_mean) / self.kpi_std}
+
+    def embed(self, x_dict, edge_index_dict):
+        """
+        Device embeddings after one round of message passing.
+        """
+        return self.conv(self.normalize(x_dict), edge_index_dict)["device"]
+
+    def forward(self, x_dict, edge_index_dict):
+        return self.classifier(self.embed(x_dict, edge_index_dict))
+
+    @torch.no_grad()
+    def predict(self, data):
+        """
+        Return (embeddings, predicted class per device). argmax over logits
+        gives the same class as argmax over softmax, so softmax is skipped.
+        """
+        embeddings = self.embed(data.x_dict, edge_index_dict(data))
+        return embeddings, self.classifier(embeddings).argmax(dim=1)
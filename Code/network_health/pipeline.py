@@ -0,0 +1,431 @@
+"""
+Asyncio pipeline: generate -> ingest -> score -> write -> notify.
+
+Each stage runs as its own task and hands a Cycle to the next one through a
+bounded asyncio.Queue, so a slow stage pushes back on everything upstream
+instead of letting work pile up. Time spent blocked on a full queue is
+recorded per stage and reported as a stall once it exceeds stall_warning,
+which makes it visible which stage is holding the pipeline up.
+
+CPU-bound work (reading the KPI store, building tensors, message passing)
+runs in worker threads via asyncio.to_thread so the event loop keeps
+serving the concurrent HTTP writes of AsyncArangoClient. Every stage has a
+latency histogram, and each Cycle's end-to-end latency (generation to
+dashboard notification) is tracked separately; both are also exported as
+pipeline_* metrics (see instrumentation.py).
+
+The ingest stage holds at most one cycle in flight: it polls the store
+again only once the previous cycle's KPI upserts are committed. With a
+rollups.KpiRollups it also turns the same rows into the KPI rollup
+documents of closed buckets, which are written next to the KPI upserts. Rows
+appended in the meantime are picked up together by the next poll, so
+under load the batches get larger instead of the queues getting longer.
+
+Stages can be used on their own as well (await stage.handle(Cycle(...))),
+and generate_data.py, update_arango.py and score_daemon.py remain the
+stand-alone versions of the first three stages.
+"""
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+import aiohttp
+import numpy as np
+import pandas as pd
+
+from network_health.instrumentation import LATENCY_BUCKETS, counter, histogram
+from network_health.kpis import KPI_KEYS
+from network_health.synthetic import generate_rows
+
+logger = logging.getLogger(__name__)
+
+STAGE_SECONDS = histogram("pipeline_stage_seconds", "Time a stage spends on one cycle", ("stage",))
+BLOCKED_SECONDS = histogram("pipeline_blocked_seconds", "Time a stage waits for downstream queue space", ("stage",))
+END_TO_END_SECONDS = histogram("pipeline_end_to_end_seconds", "Cycle latency from generation to the last stage")
+STAGE_ERRORS = counter("pipeline_stage_errors_total", "Cycles a stage failed on", ("stage",))
+
+_STOP = object()
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram; percentiles are bucket upper bounds.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self, name):
+        mean = self.sum / self.count if self.count else 0.0
+        return (
+            f"{name}: n={self.count} mean={mean * 1000:.1f}ms "
+            f"p50<={self.percentile(50) * 1000:.1f}ms p99<={self.percentile(99) * 1000:.1f}ms "
+            f"max={self.max * 1000:.1f}ms"
+        )
+
+
+class Cycle:
+    """
+    One unit of work flowing through the pipeline.
+    """
+
+    def __init__(self, tick):
+        self.tick = tick
+        self.started = time.perf_counter()
+        self.kpi_docs = []
+        self.rollup_docs = []
+        self.prediction_docs = []
+        self.segment_docs = []
+        self.segment_events = []
+        self.reports = []
+        self.commit = None  # set by IngestStage; called with the KPI and rollup keys that failed to write
+
+    def release(self, failed_keys=None, failed_rollup_keys=None):
+        """
+        Hand the ingested documents back to the ingester (and rollups). With
+        failed_keys None every document is treated as failed and retried
+        next poll.
+        """
+        if self.commit is None:
+            return
+        if failed_keys is None:
+            failed_keys = [doc["_key"] for doc in self.kpi_docs]
+            failed_rollup_keys = [doc["_key"] for doc in self.rollup_docs]
+        commit, self.commit = self.commit, None
+        commit(failed_keys, failed_rollup_keys or ())
+
+
+# --- Sources ---
+class GenerateSource:
+    """
+    Synthetic KPI batches every `interval` seconds, appended to the KPI
+    store (and any other sinks) before the cycle is emitted.
+    """
+    name = "generate"
+
+    def __init__(self, sinks, num_nodes, interval, start_time=None):
+        self.sinks = sinks
+        self.num_nodes = num_nodes
+        self.interval = interval
+        self.current_time = start_time or datetime.now()
+
+    async def produce(self):
+        df = pd.DataFrame(generate_rows(self.current_time, self.num_nodes))
+        for sink in self.sinks:
+            try:
+                await asyncio.to_thread(sink.append, df)
+            except Exception as e:
+                logger.error("Error writing to %s: %s", type(sink).__name__, e)
+        cycle = Cycle(self.current_time)
+        self.current_time += timedelta(seconds=self.interval)
+        return cycle
+
+
+class TickSource:
+    """
+    Emits an empty cycle every `interval` seconds, for when the KPI store is
+    fed by a separate generate_data.py process.
+    """
+    name = "tick"
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    async def produce(self):
+        return Cycle(datetime.now())
+
+
+# --- Stages ---
+class IngestStage:
+    name = "ingest"
+
+    def __init__(self, ingester, rollups=None):
+        self.ingester = ingester
+        self.rollups = rollups
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def _commit(self, failed_keys, failed_rollup_keys=()):
+        self.ingester.commit(failed_keys=failed_keys)
+        if self.rollups is not None:
+            self.rollups.commit(failed_keys=failed_rollup_keys)
+        self._idle.set()
+
+    def _poll(self):
+        docs = self.ingester.poll()
+        rollup_docs = self.rollups.poll(self.ingester.last_batch) if self.rollups is not None else []
+        return docs, rollup_docs
+
+    async def handle(self, cycle):
+        await self._idle.wait()
+        docs, rollup_docs = await asyncio.to_thread(self._poll)
+        if not docs and not rollup_docs:
+            self._commit(())
+            return None
+        self._idle.clear()
+        cycle.kpi_docs = docs
+        cycle.rollup_docs = rollup_docs
+        cycle.commit = self._commit
+        return cycle
+
+
+class ScoreStage:
+    """
+    Patches the ingested KPI values straight into the ScoringService graph
+    (no read-back from ArangoDB) and re-embeds their neighbourhood. New
+    cells or a changed edge count trigger a reload from the KPI store.
+    """
+    name = "score"
+
+    def __init__(self, service, reader):
+        self.service = service
+        self.reader = reader
+
+    def _reload(self):
+        from network_health.graph_build import arrays_from_frame
+
+        service = self.service
+        latest = self.reader.latest_per_cell(columns=KPI_KEYS)
+        service.load_graph(arrays_from_frame(latest, service.load_edges()))
+
+    def _score(self, cycle):
+        service = self.service
+        reloaded = service.maybe_reload_model()
+        keys = [doc["_key"] for doc in cycle.kpi_docs]
+        stale = (
+            service.data is None
+            or any(key not in service.key_to_index for key in keys)
+            or service.edges_changed()
+        )
+        if stale:
+            self._reload()
+            indices = None
+        else:
+            values = [[doc.get(k) if doc.get(k) is not None else 0 for k in KPI_KEYS] for doc in cycle.kpi_docs]
+            # Patch the cycle's KPIs in even when a new checkpoint forces a full
+            # rescore: WriteStage upserts them only after this stage.
+            indices = np.union1d(service.apply_kpi_rows(keys, values), service.apply_temporal_updates())
+            indices = None if reloaded else indices
+        to_write = service.score(changed_indices=indices, write=False)
+        cycle.prediction_docs = service.prediction_docs(to_write)
+        cycle.segment_docs = service.segment_docs()
+        cycle.segment_events = service.segment_events if service.detector is not None else []
+
+    async def handle(self, cycle):
+        if cycle.kpi_docs:  # a cycle may carry only rollups
+            await asyncio.to_thread(self._score, cycle)
+        return cycle
+
+
+class WriteStage:
+    """
+    KPI upserts and rollups first (so predictions never target a missing
+    document), then predictions and segments concurrently. The ingester is
+    committed as soon as the KPI upserts are done.
+    """
+    name = "write"
+
+    def __init__(self, client, traffic_collection="traffic_data", segment_collection="SegmentPrediction",
+                 batch_size=1000, transition_collection="SegmentTransition", rollup_collection="kpi_rollups"):
+        self.client = client
+        self.traffic_collection = traffic_collection
+        self.segment_collection = segment_collection
+        self.transition_collection = transition_collection
+        self.rollup_collection = rollup_collection
+        self.batch_size = batch_size
+
+    async def handle(self, cycle):
+        writes = [self.client.write(self.traffic_collection, cycle.kpi_docs, "upsert", self.batch_size,
+                                    label="traffic_data upsert")]
+        if cycle.rollup_docs:
+            writes.append(self.client.write(self.rollup_collection, cycle.rollup_docs, "upsert", self.batch_size,
+                                            label="kpi rollups"))
+        cycle.reports = list(await asyncio.gather(*writes))
+        rollup_failed = cycle.reports[1].failed_keys if cycle.rollup_docs else ()
+        cycle.release(cycle.reports[0].failed_keys, rollup_failed)
+        writes = []
+        if cycle.prediction_docs:
+            writes.append(self.client.write(self.traffic_collection, cycle.prediction_docs, "update",
+                                            self.batch_size, label="congestion predictions"))
+        if cycle.segment_docs:
+            writes.append(self.client.write(self.segment_collection, cycle.segment_docs, "replace",
+                                            self.batch_size, label="segment predictions"))
+        if cycle.segment_events:
+            writes.append(self.client.write(self.transition_collection, cycle.segment_events, "upsert",
+                                            self.batch_size, label="segment transitions"))
+        cycle.reports.extend(await asyncio.gather(*writes))
+        for report in cycle.reports:
+            report.log(logger)
+        return cycle
+
+
+class NotifyStage:
+    """
+    POSTs a short summary of each written cycle to the dashboard, which
+    invalidates its snapshot cache instead of waiting out its TTL.
+    """
+    name = "notify"
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session = None
+
+    async def open(self):
+        self.session = aiohttp.ClientSession(timeout=self.timeout)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def handle(self, cycle):
+        payload = {
+            "tick": cycle.tick.strftime("%m/%d/%Y %H:%M:%S"),
+            "kpi_docs": len(cycle.kpi_docs),
+            "predictions": len(cycle.prediction_docs),
+            "segments": len(cycle.segment_docs),
+        }
+        try:
+            async with self.session.post(self.url, json=payload) as response:
+                response.raise_for_status()
+        except Exception as e:
+            logger.warning("Dashboard notification failed: %s", e)
+        return cycle
+
+
+# --- Runner ---
+class Pipeline:
+    def __init__(self, source, stages, queue_size=2, stall_warning=5.0, report_every=10):
+        self.source = source
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.stall_warning = stall_warning
+        self.report_every = report_every
+        names = [source.name] + [stage.name for stage in self.stages]
+        self.latency = {name: LatencyHistogram() for name in names}
+        self.blocked = {name: LatencyHistogram() for name in names}
+        self.end_to_end = LatencyHistogram()
+        self.errors = {name: 0 for name in names}
+        self.completed = 0
+
+    async def _put(self, queue, item, name, downstream):
+        t0 = time.perf_counter()
+        await queue.put(item)
+        waited = time.perf_counter() - t0
+        if item is not _STOP:
+            self.blocked[name].observe(waited)
+            BLOCKED_SECONDS.observe(waited, stage=name)
+        if waited > self.stall_warning:
+            logger.warning("Backpressure: '%s' waited %.1fs for '%s' to accept work", name, waited, downstream)
+
+    async def _run_source(self, outbox, downstream, max_cycles):
+        produced = 0
+        try:
+            while max_cycles is None or produced < max_cycles:
+                t0 = time.perf_counter()
+                try:
+                    cycle = await self.source.produce()
+                except Exception as e:
+                    self.errors[self.source.name] += 1
+                    STAGE_ERRORS.inc(stage=self.source.name)
+                    logger.exception("Stage '%s' failed: %s", self.source.name, e)
+                    cycle = None
+                elapsed = time.perf_counter() - t0
+                self.latency[self.source.name].observe(elapsed)
+                STAGE_SECONDS.observe(elapsed, stage=self.source.name)
+                if cycle is not None:
+                    await self._put(outbox, cycle, self.source.name, downstream)
+                produced += 1
+                if max_cycles is None or produced < max_cycles:
+                    await asyncio.sleep(max(0.0, self.source.interval - elapsed))
+        finally:
+            await outbox.put(_STOP)
+
+    async def _run_stage(self, stage, inbox, outbox, downstream):
+        while True:
+            cycle = await inbox.get()
+            if cycle is _STOP:
+                break
+            t0 = time.perf_counter()
+            try:
+                result = await stage.handle(cycle)
+            except Exception as e:
+                self.errors[stage.name] += 1
+                STAGE_ERRORS.inc(stage=stage.name)
+                logger.exception("Stage '%s' failed: %s", stage.name, e)
+                cycle.release()
+                result = None
+            elapsed = time.perf_counter() - t0
+            self.latency[stage.name].observe(elapsed)
+            STAGE_SECONDS.observe(elapsed, stage=stage.name)
+            if result is None:
+                continue
+            if outbox is not None:
+                await self._put(outbox, result, stage.name, downstream)
+            else:
+                result.release()
+                self._complete(result)
+        if outbox is not None:
+            await outbox.put(_STOP)
+
+    def _complete(self, cycle):
+        latency = time.perf_counter() - cycle.started
+        self.end_to_end.observe(latency)
+        END_TO_END_SECONDS.observe(latency)
+        self.completed += 1
+        if self.report_every and self.completed % self.report_every == 0:
+            logger.info("%s", self.report())
+
+    async def run(self, max_cycles=None):
+        """
+        Run until the source has produced max_cycles (forever if None) and
+        every stage has drained, or until cancelled.
+        """
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        names = [stage.name for stage in self.stages]
+        for stage in self.stages:
+            if hasattr(stage, "open"):
+                await stage.open()
+        try:
+            tasks = [asyncio.create_task(self._run_source(queues[0], names[0], max_cycles))]
+            for i, stage in enumerate(self.stages):
+                outbox = queues[i + 1] if i + 1 < len(self.stages) else None
+                downstream = names[i + 1] if i + 1 < len(self.stages) else None
+                tasks.append(asyncio.create_task(self._run_stage(stage, queues[i], outbox, downstream)))
+            await asyncio.gather(*tasks)
+        finally:
+            for stage in self.stages:
+                if hasattr(stage, "close"):
+                    await stage.close()
+
+    def report(self):
+        lines = [f"Pipeline: {self.completed} cycles completed"]
+        for name, histogram in self.latency.items():
+            errors = f", {self.errors[name]} errors" if self.errors[name] else ""
+            lines.append(f"  {histogram.summary(name)}; blocked p99<={self.blocked[name].percentile(99) * 1000:.1f}ms{errors}")
+        lines.append(f"  {self.end_to_end.summary('end-to-end')}")
+        return "\n".join(lines)
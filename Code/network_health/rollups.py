@@ -0,0 +1,249 @@
+"""
+Multi-resolution KPI rollups, maintained during ingestion.
+
+For every cell and every KPI in KPI_KEYS, KpiRollups keeps min, mean, max
+and p95 per 1-minute, 15-minute and 1-hour bucket. One document is written
+per cell, resolution and bucket, into the kpi_rollups collection:
+
+    {"_key": "15m-42-1697500800", "cell_id": 42, "resolution": "15m",
+     "bucket": 1697500800, "count": 30, "latency_ms": [min, mean, max, p95], ...}
+
+bucket is the epoch second at which the bucket starts. The collection is
+indexed on (cell_id, resolution, bucket) (data_access.INDEXES). Reading a
+week of history for one cell is therefore an index range scan over 168
+hourly documents instead of a scan of the raw KPI rows.
+
+The engine consumes the raw rows the ingester reads. With the rows each
+WatermarkIngester.poll() leaves in last_batch, nothing is read twice. Rows
+are buffered until every bucket they fall into has closed. A bucket closes
+once the newest timestamp seen is `lateness` seconds past its end. It is
+then aggregated exactly, including p95, and never rewritten. Rows arriving
+for a bucket that is already closed are counted in rollup_late_rows_total
+and dropped. Memory is bounded by the rows of the open hourly bucket.
+
+The state file holds the row offset consumed so far and the offset of the
+oldest buffered row. After a restart, the open buckets are refilled from
+the KPI store. poll()/commit() follow WatermarkIngester: documents that
+failed to write are returned again by the next poll.
+
+The dashboard side is fetch_series(). It picks the finest resolution that
+covers the requested range in at most max_points buckets. The time after the
+last closed bucket of that resolution is filled with finer buckets.
+"""
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from network_health.data_access import fetch_rollup_rows, latest_rollup_bucket
+from network_health.instrumentation import counter, histogram
+from network_health.kpi_store import TIMESTAMP_FORMAT
+from network_health.kpis import KPI_KEYS
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = {"1m": 60, "15m": 900, "1h": 3600}  # name -> bucket length in seconds
+STATISTICS = ("min", "mean", "max", "p95")  # order of the values stored per KPI
+MAX_POINTS = 500  # buckets a dashboard series should not exceed
+
+POLL_SECONDS = histogram("rollup_poll_seconds", "Time to buffer KPI rows and aggregate closed buckets")
+BUCKETS = counter("rollup_buckets_total", "Closed rollup buckets (one per cell)", ("resolution",))
+LATE_ROWS = counter("rollup_late_rows_total", "KPI rows dropped because their buckets were already closed")
+
+
+def _prepare(rows):
+    """
+    Epoch seconds, cell id and float KPI columns of raw KPI store rows
+    (indexed by global row offset).
+    """
+    ts = pd.to_datetime(rows["timestamp"], format=TIMESTAMP_FORMAT)
+    frame = rows.reindex(columns=KPI_KEYS).apply(pd.to_numeric, errors="coerce").astype(np.float64)
+    frame.insert(0, "cell_id", rows["cell_id"].astype(np.int64))
+    frame.insert(0, "_ts", ((ts - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).astype(np.int64))
+    return frame
+
+
+def aggregate(rows, resolution, seconds):
+    """
+    Rollup documents for prepared rows, one per cell and bucket.
+    """
+    if rows.empty:
+        return []
+    bucket = (rows["_ts"] // seconds * seconds).rename("bucket")
+    grouped = rows.groupby([rows["cell_id"], bucket], sort=True)[KPI_KEYS]
+    values = np.stack([
+        grouped.min().to_numpy(), grouped.mean().to_numpy(), grouped.max().to_numpy(),
+        grouped.quantile(0.95).to_numpy(),
+    ], axis=2)  # [groups, kpis, statistics]
+    stats = values.astype(object)
+    stats[np.isnan(values)] = None  # empty KPI in every row of the bucket
+    sizes = grouped.size()
+    cells = sizes.index.get_level_values(0).tolist()
+    buckets = sizes.index.get_level_values(1).tolist()
+    docs = []
+    for cell, start, count, kpis in zip(cells, buckets, sizes.tolist(), stats.tolist()):
+        doc = {"_key": f"{resolution}-{cell}-{start}", "cell_id": cell, "resolution": resolution,
+               "bucket": start, "count": count}
+        doc.update(zip(KPI_KEYS, kpis))
+        docs.append(doc)
+    BUCKETS.inc(len(docs), resolution=resolution)
+    return docs
+
+
+class KpiRollups:
+    """
+    Incremental rollups of the KPI store rows.
+
+    Typical use, next to a WatermarkIngester:
+        docs = ingester.poll()
+        rollup_docs = rollups.poll(ingester.last_batch)
+        ...write both...
+        rollups.commit(failed_keys=failed)
+    """
+
+    def __init__(self, state_path, reader=None, resolutions=RESOLUTIONS, lateness=0):
+        self.state_path = state_path
+        self.reader = reader
+        self.resolutions = dict(sorted(resolutions.items(), key=lambda item: item[1]))
+        self.lateness = lateness
+        self.offset = 0          # global row offset consumed up to
+        self.watermark = None    # newest epoch second seen
+        self.closed = {}         # resolution -> end of the last closed bucket (epoch seconds)
+        self.pending = {}        # _key -> rollup document that failed to write last time
+        self.buffer = _prepare(pd.DataFrame(columns=["timestamp", "cell_id"]))
+        self._staged = None
+        self._load_state()
+
+    # --- State persistence ---
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, "r", encoding="utf-8") as fh:
+            state = json.load(fh)
+        self.offset = state.get("offset", 0)
+        self.watermark = state.get("watermark")
+        self.closed = {res: end for res, end in state.get("closed", {}).items() if res in self.resolutions}
+        self.pending = state.get("pending", {})
+        replay = state.get("replay_offset", self.offset)
+        if self.reader is not None and replay < self.offset:
+            rows, _ = self.reader.read_since(replay)
+            rows = _prepare(rows.loc[:self.offset - 1])
+            self.buffer = rows[rows["_ts"] >= self._horizon()] if self.closed else rows
+            logger.info("Refilled %d buffered rows of open rollup buckets", len(self.buffer))
+
+    def _save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({
+                "offset": self.offset,
+                "replay_offset": int(self.buffer.index.min()) if len(self.buffer) else self.offset,
+                "watermark": self.watermark,
+                "closed": self.closed,
+                "pending": self.pending,
+            }, fh)
+        os.replace(tmp_path, self.state_path)
+
+    def _horizon(self):
+        """
+        Start of the oldest open bucket; older rows are no longer needed.
+        """
+        return min(self.closed.values())
+
+    # --- Polling ---
+    def poll(self, rows=None):
+        """
+        Add KPI store rows (indexed by global row offset, e.g. the ingester's
+        last_batch; read from the reader when None) and return the documents
+        of the buckets that closed, plus any still pending. Nothing is
+        persisted until commit() is called.
+        """
+        start = time.perf_counter()
+        if rows is None:
+            rows, _ = self.reader.read_since(self.offset)
+        rows = rows.loc[rows.index >= self.offset]
+        next_offset = int(rows.index.max()) + 1 if len(rows) else self.offset
+        docs = dict(self.pending)
+        buffer, watermark, closed = self.buffer, self.watermark, dict(self.closed)
+
+        if len(rows):
+            rows = _prepare(rows)
+            watermark = int(rows["_ts"].max()) if watermark is None else max(watermark, int(rows["_ts"].max()))
+            for res, seconds in self.resolutions.items():
+                closed.setdefault(res, int(rows["_ts"].min()) // seconds * seconds)
+            late = rows["_ts"] < min(closed.values())
+            if late.any():
+                LATE_ROWS.inc(int(late.sum()))
+            buffer = pd.concat([buffer, rows[~late]]) if len(buffer) else rows[~late]
+
+            for res, seconds in self.resolutions.items():
+                end = max(closed[res], (watermark - self.lateness) // seconds * seconds)
+                if end > closed[res]:
+                    window = buffer[(buffer["_ts"] >= closed[res]) & (buffer["_ts"] < end)]
+                    docs.update((doc["_key"], doc) for doc in aggregate(window, res, seconds))
+                    closed[res] = end
+            buffer = buffer[buffer["_ts"] >= min(closed.values())]
+
+        self._staged = (next_offset, buffer, watermark, closed, docs)
+        POLL_SECONDS.observe(time.perf_counter() - start)
+        return list(docs.values())
+
+    def commit(self, failed_keys=()):
+        """
+        Persist the state produced by the last poll(). Documents listed in
+        failed_keys are kept as pending and returned again by the next poll.
+        """
+        if self._staged is None:
+            return
+        self.offset, self.buffer, self.watermark, self.closed, docs = self._staged
+        failed_keys = set(failed_keys)
+        self.pending = {key: doc for key, doc in docs.items() if key in failed_keys}
+        self._staged = None
+        self._save_state()
+
+
+# --- Queries ---
+def choose_resolution(seconds, max_points=MAX_POINTS, resolutions=RESOLUTIONS):
+    """
+    Finest resolution that covers `seconds` in at most max_points buckets
+    (the coarsest one if none does).
+    """
+    ordered = sorted(resolutions.items(), key=lambda item: item[1])
+    for res, step in ordered:
+        if seconds / step <= max_points:
+            return res
+    return ordered[-1][0]
+
+
+def fetch_series(db, collection, cell_id, seconds, end=None, kpis=KPI_KEYS, max_points=MAX_POINTS,
+                 resolutions=RESOLUTIONS):
+    """
+    (resolution, DataFrame) with the rollups of one cell over the `seconds`
+    before end (epoch seconds; default: the end of the cell's newest
+    bucket). Columns: time, resolution, count and <kpi>_<statistic> for
+    each KPI in kpis, one row per bucket.
+    """
+    ordered = sorted(resolutions.items(), key=lambda item: item[1])
+    resolution = choose_resolution(seconds, max_points, resolutions)
+    if end is None:
+        finest, step = ordered[0]
+        latest = latest_rollup_bucket(db, collection, cell_id, finest)
+        end = latest + step if latest is not None else int(time.time())
+    covered = end - seconds
+    rows = []
+    # The chosen resolution first, then finer ones for the time after its last closed bucket.
+    for res, step in reversed([item for item in ordered if item[1] <= resolutions[resolution]]):
+        fetched = fetch_rollup_rows(db, collection, cell_id, res, covered, end, kpis)
+        rows.extend([res, *row] for row in fetched)
+        if fetched:
+            covered = fetched[-1][0] + step
+    columns = [f"{kpi}_{stat}" for kpi in kpis for stat in STATISTICS]
+    values = [
+        [res, bucket, count, *(v for stats in kpi_stats for v in (stats or [None] * len(STATISTICS)))]
+        for res, bucket, count, kpi_stats in rows
+    ]
+    frame = pd.DataFrame(values, columns=["resolution", "bucket", "count", *columns])
+    frame.insert(0, "time", pd.to_datetime(frame["bucket"], unit="s"))
+    return resolution, frame.drop(columns="bucket")
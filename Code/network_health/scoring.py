@@ -0,0 +1,452 @@
+"""
+Checkpoint-based congestion scoring.
+
+ScoringService loads a trained checkpoint once, keeps the device graph in
+memory and rescores only when the KPI data in traffic_data changes, using
+IncrementalEmbedder to re-embed just the neighbourhood of changed cells. Change
+detection is an index range scan on the updater's write sequence
+'kpi_write_seq' (falling back to comparing every cell's 'timestamp' for documents written
+before that field existed); changed cells get their KPI rows patched in place (the devicekpi tensor
+shares memory with the NumPy array), while new cells or a different edge
+count trigger a full graph reload. A newer checkpoint named by LATEST is
+picked up on the next refresh.
+
+When the checkpoint was trained with temporal features (metadata
+"temporal"), rolling KPI windows are fed from the KPI store and the
+devicekpi rows of cells with new history are refreshed on every cycle.
+
+With segment_threshold="streaming" only the segments touched by a scoring
+pass are fed to a SegmentFailDetector, and only segments that are new or
+changed status are written; each OK<->FAIL transition is also recorded in
+the transition collection. The detector state is kept in
+detector_state_path across restarts; a segment it has no state for yet
+(e.g. that file was lost) keeps the document an earlier run wrote until
+its status changes.
+
+inference="torchscript" (or "onnx") scores with the compiled fixed-schema
+artifact from export.py instead of the eager model; the artifact is
+exported next to the checkpoint on first use if train.py did not write it.
+
+With topology_dir, edges come from the memory-mapped topology snapshot
+(topology.TopologyStore) instead of a cell_edges scan, and "did the edges
+change" is the snapshot's count/revision check.
+"""
+import logging
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from network_health.arango_writer import BulkWriter
+from network_health.checkpoints import latest_path, load_checkpoint
+from network_health.data_access import existing_keys, fetch_kpi_rows, iter_rows, kpi_changes_since, latest_value
+from network_health.graph_build import build_hetero_data, load_edge_rows, load_graph_arrays
+from network_health.incremental import IncrementalEmbedder
+from network_health.instrumentation import gauge, timed, timed_function
+from network_health.kpi_store import KpiReader
+from network_health.segments import SegmentPartitioner
+from network_health.segment_scoring import (
+    RollingBaseline, SegmentAggregator, SegmentFailDetector, global_threshold_fail, segment_documents,
+)
+from network_health.temporal import TemporalFeatures
+from network_health.topology import TopologyStore
+
+logger = logging.getLogger(__name__)
+
+SEGMENTS_FAILING = gauge("segments_failing", "Segments currently in FAIL state")
+
+def prediction_documents(device_keys, predicted, indices, updated_at, updated_epoch=None):
+    updated_epoch = time.time() if updated_epoch is None else updated_epoch
+    return [
+        {
+            "_key": device_keys[i],
+            "color": "red" if predicted[i] == 1 else "green",
+            "last_congestion_update": updated_at,
+            "congestion_updated_at": updated_epoch,
+        }
+        for i in indices
+    ]
+
+
+class ScoringService:
+    def __init__(self, db, checkpoint_dir, traffic_collection="traffic_data", edge_collection="cell_edges",
+                 segment_collection="SegmentPrediction", read_batch_size=10000, write_batch_size=1000,
+                 inference_batch_size=None, inference_workers=0,
+                 segment_strategy="bfs", segment_size=4, segment_cache_path=None,
+                 segment_threshold="global", baseline=None, shards=1, shard_workers=None, shard_strategy="metis",
+                 kpi_store_dir=None, temporal_state_path=None,
+                 transition_collection="SegmentTransition", detector=None, detector_state_path=None,
+                 inference="eager", inference_threads=None, topology_dir=None):
+        self.db = db
+        self.checkpoint_dir = checkpoint_dir
+        self.traffic_collection = traffic_collection
+        self.edge_collection = edge_collection
+        self.read_batch_size = read_batch_size
+        self.inference_batch_size = inference_batch_size
+        self.inference_workers = inference_workers
+        self.sharded = None
+        if shards > 1:
+            from network_health.sharded import ShardedScorer
+
+            self.sharded = ShardedScorer(shards, shard_workers, strategy=shard_strategy)
+        self.prediction_writer = BulkWriter(db, traffic_collection, mode="update", batch_size=write_batch_size)
+        self.segment_collection = segment_collection
+        self.segment_writer = BulkWriter(db, segment_collection, mode="replace", batch_size=write_batch_size)
+        self.partitioner = SegmentPartitioner(segment_strategy, segment_size, segment_cache_path)
+        self._segments_initialised = False
+        if segment_threshold not in ("global", "rolling", "streaming"):
+            raise ValueError(f"Unknown segment threshold {segment_threshold!r}")
+        self.baseline = (baseline or RollingBaseline()) if segment_threshold == "rolling" else None
+        self.detector = None
+        self.transition_writer = None
+        if segment_threshold == "streaming":
+            self.detector = detector or SegmentFailDetector(state_path=detector_state_path)
+            self.transition_writer = BulkWriter(db, transition_collection, mode="upsert", batch_size=write_batch_size)
+        self.segment_events = []
+        self.aggregator = None
+        self.kpi_store_dir = kpi_store_dir
+        self.temporal_state_path = temporal_state_path
+        self.temporal = None
+        self.kpi_x = None
+        if inference not in ("eager", "torchscript", "onnx"):
+            raise ValueError(f"Unknown inference mode {inference!r}")
+        if inference != "eager" and (inference_batch_size or self.sharded is not None):
+            raise ValueError("Compiled inference runs full passes only; unset inference_batch_size and shards")
+        self.inference = inference
+        self.inference_threads = inference_threads
+        self.topology = None
+        if topology_dir:
+            self.topology = TopologyStore(topology_dir, db, edge_collection, traffic_collection, read_batch_size)
+
+        self.checkpoint_path = None
+        self.model = None
+        self.metadata = None
+        self.load_model()
+
+        self.arrays = None
+        self.data = None
+        self.device_keys = []
+        self.key_to_index = {}
+        self.stamps = {}
+        self.kpi_watermark = None
+        self.edge_count = None
+        self.device_segment = None
+        self.embedder = None
+        self.embeddings = None
+        self.predictions = None
+
+    # --- Model ---
+    def load_model(self):
+        self.checkpoint_path = latest_path(self.checkpoint_dir)
+        if self.inference == "eager":
+            self.model, self.metadata = load_checkpoint(self.checkpoint_dir)
+        else:
+            self.model = self._load_compiled()
+            self.metadata = self.model.metadata
+        logger.info("Loaded checkpoint v%s (%s, %s)", self.metadata["version"], self.checkpoint_path, self.inference)
+        config = self.metadata.get("temporal")
+        if not config:
+            self.temporal = None
+        elif self.temporal is None or self.temporal.config != config:
+            if self.kpi_store_dir is None:
+                raise ValueError("This checkpoint uses temporal features; pass kpi_store_dir to ScoringService")
+            self.temporal = TemporalFeatures.from_config(
+                KpiReader(self.kpi_store_dir), config, self.temporal_state_path
+            )
+
+    def _load_compiled(self):
+        from network_health.export import artifact_path, export_checkpoint, load_compiled
+
+        if self.checkpoint_path is None:
+            raise FileNotFoundError(f"No checkpoint found in '{self.checkpoint_dir}'. Run train.py first.")
+        if not os.path.exists(artifact_path(self.checkpoint_path, self.inference)):
+            export_checkpoint(self.checkpoint_path, (self.inference,))
+        return load_compiled(self.checkpoint_path, self.inference, self.inference_threads)
+
+    def maybe_reload_model(self):
+        """
+        Load the checkpoint LATEST points to if it changed. Returns True if reloaded.
+        A checkpoint with a different feature layout also drops the graph.
+        """
+        if latest_path(self.checkpoint_dir) == self.checkpoint_path:
+            return False
+        layout = (self.metadata.get("num_features"), self.metadata.get("temporal"))
+        self.load_model()
+        if (self.metadata.get("num_features"), self.metadata.get("temporal")) != layout:
+            self.data = None
+        return True
+
+    # --- Graph ---
+    def load_edges(self):
+        """
+        Edge rows, or the current topology snapshot when topology_dir is set
+        (rebuilt only if cell_edges changed); either works with arrays_from_rows().
+        """
+        if self.topology is not None:
+            return self.topology.current()
+        return load_edge_rows(self.db, self.edge_collection, self.read_batch_size)
+
+    def edges_changed(self):
+        """
+        Cheap check whether cell_edges changed since the graph was loaded.
+        """
+        if self.topology is not None:
+            return self.topology.changed()
+        return self.db.collection(self.edge_collection).count() != self.edge_count
+
+    def _fetch_stamps(self):
+        """
+        Per-cell change stamps. kpi_write_seq when the updater writes it
+        (kpi_watermark is then set), the batch 'timestamp' string otherwise.
+        """
+        self.kpi_watermark = latest_value(self.db, self.traffic_collection, "kpi_write_seq")
+        field = "timestamp" if self.kpi_watermark is None else "kpi_write_seq"
+        rows = iter_rows(self.db, self.traffic_collection, ["d._key", f"d.{field}"], self.read_batch_size)
+        return {key: stamp for key, stamp in rows}
+
+    def load_graph(self, arrays=None):
+        """
+        (Re)build the in-memory graph from ArangoDB, or from given GraphArrays.
+        """
+        if arrays is None:
+            self.stamps = self._fetch_stamps()
+            arrays = load_graph_arrays(self.db, self.traffic_collection, self.edge_collection, self.read_batch_size,
+                                       topology=self.topology)
+        self.kpi_x = None
+        if self.temporal is not None:
+            self.temporal.refresh()
+            arrays, self.kpi_x = self.temporal.attach(arrays)
+        self.arrays = arrays
+        self.data, _ = build_hetero_data(arrays, kpi_x=self.kpi_x)
+        self.device_keys = arrays.device_keys.tolist()
+        self.key_to_index = {key: i for i, key in enumerate(self.device_keys)}
+        self.edge_count = self.db.collection(self.edge_collection).count()
+        self.update_segments()
+        if self.sharded is not None:
+            self.sharded.reset()
+        self.embedder = None
+        self.embeddings = None
+        self.predictions = None
+        logger.info("Loaded graph with %d devices and %d edges", arrays.num_devices, arrays.device_edges.shape[1])
+
+    def poll_changes(self):
+        """
+        Return the keys of cells whose KPIs changed since the last poll, or
+        None when the set of cells or edges changed and a full reload is needed.
+        """
+        if self.edges_changed():
+            return None
+        if self.kpi_watermark is None:
+            stamps = self._fetch_stamps()
+            if stamps.keys() != self.key_to_index.keys():
+                return None
+            changed = [key for key, stamp in stamps.items() if self.stamps.get(key) != stamp]
+            self.stamps = stamps
+            return changed
+
+        if self.db.collection(self.traffic_collection).count() != len(self.key_to_index):
+            return None
+        # The watermark is the highest write sequence seen, not a data time, so
+        # late writes (retries, lagging cells) still land above it. >= so that
+        # documents of the watermark's own poll written after this scan are not
+        # missed; the per-key stamps filter out repeats.
+        rows = kpi_changes_since(self.db, self.traffic_collection, self.kpi_watermark, self.read_batch_size,
+                                 inclusive=True)
+        changed = []
+        for key, stamp in rows:
+            if key not in self.key_to_index:
+                return None
+            if self.stamps.get(key) != stamp:
+                self.stamps[key] = stamp
+                changed.append(key)
+            self.kpi_watermark = max(self.kpi_watermark, stamp)
+        return changed
+
+    def apply_kpi_updates(self, keys):
+        """
+        Re-read KPI values for keys and patch them into the graph in place.
+        Returns the device indices that were updated.
+        """
+        if not keys:
+            return np.empty(0, dtype=np.int64)
+        rows = fetch_kpi_rows(self.db, self.traffic_collection, self.read_batch_size, keys=keys)
+        return self.apply_kpi_rows([row[0] for row in rows], [row[1:] for row in rows])
+
+    def apply_kpi_rows(self, keys, values):
+        """
+        Patch KPI values (one row of len(KPI_KEYS) per key) into the graph in
+        place. Returns the device indices that were updated.
+        """
+        indices = np.array([self.key_to_index[key] for key in keys], dtype=np.int64)
+        if len(indices):
+            self.arrays.kpi[indices] = np.asarray(values, dtype=np.float32)
+        return indices
+
+    def apply_temporal_updates(self):
+        """
+        Fold new KPI store rows into the rolling windows and refresh the
+        temporal columns of the affected devices. Returns their indices.
+        """
+        if self.temporal is None or self.kpi_x is None:
+            return np.empty(0, dtype=np.int64)
+        keys = [key for key in self.temporal.refresh() if key in self.key_to_index]
+        indices = np.array([self.key_to_index[key] for key in keys], dtype=np.int64)
+        if len(indices):
+            self.kpi_x[indices, self.arrays.kpi.shape[1]:] = self.temporal.windows.features(keys, self.temporal.features)
+        return indices
+
+    # --- Scoring ---
+    def score(self, changed_indices=None, write=True):
+        """
+        Score devices. With changed_indices, only the k-hop neighbourhood of
+        those devices is re-embedded; otherwise every device is. Only
+        predictions that flipped, or that belong to changed cells, are
+        written back (everything on a full pass).
+        """
+        if self.embedder is None or changed_indices is None:
+            self.embedder = IncrementalEmbedder(
+                self.model, self.data, batch_size=self.inference_batch_size, num_workers=self.inference_workers,
+                sharded=self.sharded,
+            )
+            to_write = np.arange(len(self.device_keys))
+            self.aggregator.compute(self.embedder.embeddings)
+        else:
+            previous = self.embedder.predictions
+            self.embedder.mark_changed(changed_indices)
+            affected = self.embedder.update()
+            predicted = self.embedder.predictions
+            flipped = affected[(predicted[affected] != previous[affected]).numpy()]
+            self.aggregator.update(affected, self.embedder.previous_rows, self.embedder.embeddings)
+            to_write = np.union1d(changed_indices, flipped)
+        self.embeddings = self.embedder.embeddings
+        self.predictions = self.embedder.predictions
+        if write:
+            self.write_predictions(to_write)
+            self.write_segments()
+        return to_write
+
+    def prediction_docs(self, indices):
+        updated_at = datetime.now().strftime("%m/%d/%Y %H:%M:%S")
+        return prediction_documents(self.device_keys, self.predictions.tolist(), np.asarray(indices).tolist(), updated_at)
+
+    def write_predictions(self, indices):
+        docs = self.prediction_docs(indices)
+        report = self.prediction_writer.write(docs, label="congestion predictions")
+        report.log(logger)
+        return report
+
+    def update_segments(self):
+        """
+        Partition the current graph into segments, reusing cached ids for
+        unchanged regions, and drop documents of retired segments.
+        """
+        first_id, stale_ids = 0, []
+        cold = not self._segments_initialised and not self.partitioner.has_cache()
+        if cold and self.db.has_collection(self.segment_collection):
+            # Cold start (once per process): no cache says which documents earlier
+            # runs wrote. Number the new segments above all of them and retire every one.
+            keys = existing_keys(self.db, self.segment_collection, batch_size=self.read_batch_size)
+            stale_ids = [int(key) for key in keys if key.isdigit()]
+            first_id = max(stale_ids) + 1 if stale_ids else 0
+        with timed("segment_partition_seconds", "Time to partition the graph into segments"):
+            self.device_segment = self.partitioner.partition(self.device_keys, self.arrays.device_edges, first_id)
+            self.aggregator = SegmentAggregator(self.device_segment)
+        self._segments_initialised = True
+        logger.info("Segments: re-partitioned %d of %d devices", self.partitioner.repartitioned, len(self.device_keys))
+        retired_ids = self.partitioner.retired_ids + stale_ids
+        if retired_ids:
+            report = self.segment_writer.delete(retired_ids, label="retired segments")
+            report.log(logger)
+            if self.detector is not None:
+                self.detector.forget(retired_ids)
+
+    def segment_status(self):
+        """
+        (fail mask, thresholds) per segment of the current aggregation.
+        """
+        norms = self.aggregator.norms
+        if self.baseline is not None:
+            return self.baseline.update(self.aggregator.segment_ids.tolist(), norms.numpy())
+        fail, threshold = global_threshold_fail(norms)
+        return fail.numpy(), float(threshold)
+
+    def segment_docs(self):
+        """
+        SegmentPrediction documents for the current aggregation (advances the
+        rolling baseline or detector, so call once per scoring pass). In
+        streaming mode only new segments and status changes are returned, and
+        the transitions are left in segment_events.
+        """
+        updated_at = datetime.now().strftime("%m/%d/%Y %H:%M:%S")
+        if self.detector is None:
+            fail, thresholds = self.segment_status()
+            return segment_documents(self.aggregator, fail, thresholds, self.device_keys, updated_at)
+
+        positions = self.aggregator.last_touched
+        segment_ids = self.aggregator.segment_ids[positions].tolist()
+        norms = self.aggregator.norms_of(positions).numpy()
+        fail, changed, first_seen, thresholds, scores = self.detector.update(segment_ids, norms)
+        write = changed | first_seen
+        if first_seen.any():
+            # No detector state yet, so these are in warm-up (status OK): only write
+            # segments that have no document, never over one an earlier run wrote.
+            keys = [str(segment_ids[i]) for i in np.flatnonzero(first_seen).tolist()]
+            existing = set(existing_keys(self.db, self.segment_collection, keys, self.read_batch_size))
+            write &= ~np.array([str(s) in existing for s in segment_ids], dtype=bool) | changed
+        docs = segment_documents(
+            self.aggregator, fail[write], thresholds[write], self.device_keys, updated_at,
+            positions=positions.numpy()[write],
+        )
+        for doc, score in zip(docs, scores[write].tolist()):
+            doc["cusum"] = score
+        now = time.time()
+        self.segment_events = [
+            {
+                "_key": f"{segment_ids[i]}-{int(now * 1000)}",  # retried batches upsert, not duplicate
+                "segment_id": segment_ids[i],
+                "from": "FAIL" if not fail[i] else "OK",
+                "to": "FAIL" if fail[i] else "OK",
+                "at": updated_at,
+                "at_epoch": now,
+                "norm": float(norms[i]),
+                "threshold": float(thresholds[i]),
+                "cusum": float(scores[i]),
+            }
+            for i in np.flatnonzero(changed).tolist()
+        ]
+        return docs
+
+    def write_segments(self):
+        docs = self.segment_docs()
+        report = self.segment_writer.write(docs, label="segment predictions")
+        report.log(logger)
+        if self.detector is None:
+            failing = sum(doc["status"] == "FAIL" for doc in docs)
+            logger.info("Segments: %d FAIL / %d total", failing, len(docs))
+        else:
+            failing = int(self.detector.fail.sum())
+            logger.info("Segments: %d FAIL, %d transitions, %d documents written",
+                        failing, len(self.segment_events), len(docs))
+        SEGMENTS_FAILING.set(failing)
+        if self.segment_events:
+            self.transition_writer.write(self.segment_events, label="segment transitions").log(logger)
+        return report
+
+    @timed_function("score_cycle_seconds", "Time per scoring daemon cycle")
+    def refresh(self):
+        """
+        One daemon cycle. Returns the number of predictions written (0 if idle).
+        """
+        reloaded = self.maybe_reload_model()
+        if self.data is None:
+            self.load_graph()
+            return len(self.score())
+        changed = self.poll_changes()
+        if changed is None:
+            self.load_graph()
+            return len(self.score())
+        indices = np.union1d(self.apply_kpi_updates(changed), self.apply_temporal_updates())
+        if len(indices) == 0 and not reloaded:
+            return 0
+        return len(self.score(changed_indices=None if reloaded else indices))
@@ -0,0 +1,337 @@
+"""
+Vectorized segment scoring.
+
+SegmentAggregator reduces device embeddings to per-segment mean, max and
+std in one pass with index_add_/index_reduce_ over a device -> segment
+index, instead of stacking rows segment by segment. Sums are kept in
+float64 so that streaming updates (subtract a device's old embedding, add
+its new one) stay exact enough over long runs; only the max of touched
+segments has to be recomputed from their members.
+
+A segment FAILs when the norm of its mean embedding falls below a
+threshold: either the batch statistic mean_norm - std_norm over all
+segments ("global"), or a per-segment rolling baseline ("rolling", EWMA
+of each segment's own norm and variance). SegmentFailDetector
+("streaming") instead runs a per-segment CUSUM with hysteresis and only
+reports segments whose status changed.
+"""
+import logging
+import os
+import time
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentAggregator:
+    def __init__(self, device_segment):
+        device_segment = torch.as_tensor(device_segment, dtype=torch.long)
+        self.segment_ids, self.index = torch.unique(device_segment, return_inverse=True)
+        self.num_segments = len(self.segment_ids)
+        self.counts = torch.bincount(self.index, minlength=self.num_segments).to(torch.float64)
+        # Members of each segment, contiguous: member_order[member_ptr[s]:member_ptr[s + 1]].
+        self.member_order = torch.argsort(self.index, stable=True)
+        self.member_ptr = torch.zeros(self.num_segments + 1, dtype=torch.long)
+        self.member_ptr[1:] = torch.cumsum(self.counts.long(), dim=0)
+        self.sums = None
+        self.sq_sums = None
+        self.max = None
+        self.last_touched = torch.arange(self.num_segments)
+
+    def members(self, segment):
+        return self.member_order[self.member_ptr[segment]:self.member_ptr[segment + 1]]
+
+    def compute(self, embeddings):
+        """
+        Full aggregation over all devices.
+        """
+        emb = embeddings.to(torch.float64)
+        dim = emb.shape[1]
+        self.sums = torch.zeros(self.num_segments, dim, dtype=torch.float64).index_add_(0, self.index, emb)
+        self.sq_sums = torch.zeros(self.num_segments, dim, dtype=torch.float64).index_add_(0, self.index, emb * emb)
+        self.max = torch.full((self.num_segments, dim), -torch.inf, dtype=embeddings.dtype)
+        self.max.index_reduce_(0, self.index, embeddings, "amax")
+        self.last_touched = torch.arange(self.num_segments)
+        return self
+
+    def update(self, device_indices, old_rows, embeddings):
+        """
+        Streaming update after the embeddings of device_indices changed from
+        old_rows to embeddings[device_indices].
+        """
+        if len(device_indices) == 0:
+            self.last_touched = torch.empty(0, dtype=torch.long)
+            return self
+        device_indices = torch.as_tensor(device_indices, dtype=torch.long)
+        old = old_rows.to(torch.float64)
+        new = embeddings[device_indices].to(torch.float64)
+        seg = self.index[device_indices]
+        self.sums.index_add_(0, seg, new - old)
+        self.sq_sums.index_add_(0, seg, new * new - old * old)
+
+        touched = torch.unique(seg)
+        self.last_touched = touched
+        lengths = self.member_ptr[touched + 1] - self.member_ptr[touched]
+        members = torch.cat([self.members(s) for s in touched.tolist()])
+        local = torch.repeat_interleave(torch.arange(len(touched)), lengths)
+        touched_max = torch.full((len(touched), embeddings.shape[1]), -torch.inf, dtype=embeddings.dtype)
+        touched_max.index_reduce_(0, local, embeddings[members], "amax")
+        self.max[touched] = touched_max
+        return self
+
+    @property
+    def mean(self):
+        return self.sums / self.counts[:, None]
+
+    @property
+    def std(self):
+        mean = self.mean
+        return (self.sq_sums / self.counts[:, None] - mean * mean).clamp_min(0).sqrt()
+
+    @property
+    def norms(self):
+        return self.mean.norm(dim=1)
+
+    def norms_of(self, segments):
+        """
+        Norms of the mean embedding for the given segment positions only.
+        """
+        segments = torch.as_tensor(segments, dtype=torch.long)
+        return (self.sums[segments] / self.counts[segments, None]).norm(dim=1)
+
+
+def global_threshold_fail(norms):
+    """
+    FAIL where norm < mean_norm - std_norm over all segments.
+    """
+    norms = torch.as_tensor(norms, dtype=torch.float64)
+    threshold = norms.mean() - norms.std(unbiased=False)
+    return norms < threshold, threshold
+
+
+class RollingBaseline:
+    """
+    Per-segment EWMA baseline of the segment norm. A segment FAILs when its
+    norm drops below baseline_mean - max(k * baseline_std, min_drop *
+    baseline_mean); min_drop keeps a perfectly steady segment from failing
+    on noise. Until a segment has `warmup` observations the global
+    threshold is used for it instead.
+    """
+
+    def __init__(self, alpha=0.1, k=2.0, warmup=5, min_drop=0.05):
+        self.alpha = alpha
+        self.k = k
+        self.warmup = warmup
+        self.min_drop = min_drop
+        self._slot = {}
+        self.mean = np.zeros(0)
+        self.var = np.zeros(0)
+        self.seen = np.zeros(0, dtype=np.int64)
+
+    def _slots(self, segment_ids):
+        new = [s for s in segment_ids if s not in self._slot]
+        if new:
+            start = len(self._slot)
+            self._slot.update((s, start + i) for i, s in enumerate(new))
+            grow = len(new)
+            self.mean = np.concatenate([self.mean, np.zeros(grow)])
+            self.var = np.concatenate([self.var, np.zeros(grow)])
+            self.seen = np.concatenate([self.seen, np.zeros(grow, dtype=np.int64)])
+        return np.fromiter((self._slot[s] for s in segment_ids), dtype=np.int64, count=len(segment_ids))
+
+    def update(self, segment_ids, norms):
+        """
+        Score norms against the baselines (before folding them in) and
+        update the baselines. Returns (fail mask, per-segment thresholds).
+        """
+        norms = np.asarray(norms, dtype=np.float64)
+        slots = self._slots(list(segment_ids))
+        mean, var, seen = self.mean[slots], self.var[slots], self.seen[slots]
+
+        thresholds = mean - np.maximum(self.k * np.sqrt(var), self.min_drop * np.abs(mean))
+        _, global_threshold = global_threshold_fail(norms)
+        warm = seen >= self.warmup
+        thresholds = np.where(warm, thresholds, float(global_threshold))
+        fail = norms < thresholds
+
+        delta = norms - mean
+        first = seen == 0
+        self.mean[slots] = np.where(first, norms, mean + self.alpha * delta)
+        self.var[slots] = np.where(first, 0.0, (1 - self.alpha) * (var + self.alpha * delta * delta))
+        self.seen[slots] = seen + 1
+        return fail, thresholds
+
+
+class SegmentFailDetector:
+    """
+    Streaming per-segment FAIL detector with O(1) cost per observation.
+
+    The first `warmup` norms of a segment estimate its baseline mean and
+    variance exactly (Welford); after that the baseline tracks slow drift
+    as an EWMA. Each observation adds evidence to a lower-sided CUSUM,
+        score = clip(score - (norm - mean) / sigma - k, 0, max_score),
+    with sigma floored at min_std_ratio * |mean|. A segment enters FAIL
+    when the score exceeds `enter` and leaves it only once the score has
+    dropped to `exit`, so a segment near the limit does not flap. The
+    baseline is frozen while a segment is failing. Nothing is flagged
+    during warm-up, so a healthy network reports no FAILs.
+
+    With state_path, the per-segment state is saved (npz) after every
+    update and restored on construction when the parameters match, so a
+    restart neither re-enters warm-up nor forgets which segments FAIL.
+    """
+
+    STATE = ("seen", "mean", "var", "m2", "score", "fail")
+    PARAMS = ("alpha", "warmup", "k", "enter", "exit", "max_score", "min_std_ratio")
+
+    def __init__(self, alpha=0.05, warmup=10, k=0.5, enter=5.0, exit=1.0, max_score=10.0, min_std_ratio=0.05,
+                 state_path=None):
+        if exit >= enter:
+            raise ValueError("exit must be below enter for hysteresis")
+        self.alpha = alpha
+        self.warmup = warmup
+        self.k = k
+        self.enter = enter
+        self.exit = exit
+        self.max_score = max_score
+        self.min_std_ratio = min_std_ratio
+        self.state_path = state_path
+        self._slot = {}
+        self.seen = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.var = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.score = np.zeros(0)
+        self.fail = np.zeros(0, dtype=bool)
+        if state_path and os.path.exists(state_path):
+            self._load(state_path)
+
+    def _load(self, path):
+        with np.load(path, allow_pickle=False) as state:
+            if any(float(state[name]) != float(getattr(self, name)) for name in self.PARAMS):
+                logger.info("Detector parameters changed; not restoring %s", path)
+                return
+            self._slot = {int(s): i for i, s in enumerate(state["segment_ids"].tolist())}
+            for name in self.STATE:
+                setattr(self, name, state[name].astype(getattr(self, name).dtype))
+        logger.info("Restored detector state of %d segments (%d FAIL) from %s",
+                    len(self._slot), int(self.fail.sum()), path)
+
+    def save(self):
+        """
+        Write the state to state_path (atomically), if set.
+        """
+        if not self.state_path:
+            return
+        tmp_path = self.state_path + ".tmp.npz"
+        np.savez(tmp_path, segment_ids=np.fromiter(self._slot, dtype=np.int64, count=len(self._slot)),
+                 **{name: getattr(self, name) for name in self.STATE},
+                 **{name: getattr(self, name) for name in self.PARAMS})
+        os.replace(tmp_path, self.state_path)
+
+    def forget(self, segment_ids):
+        """
+        Drop the state of retired segments.
+        """
+        drop = {s for s in segment_ids if s in self._slot}
+        if not drop:
+            return
+        keep = [(s, slot) for s, slot in self._slot.items() if s not in drop]
+        slots = np.array([slot for _, slot in keep], dtype=np.int64)
+        for name in self.STATE:
+            setattr(self, name, getattr(self, name)[slots])
+        self._slot = {s: i for i, (s, _) in enumerate(keep)}
+
+    def _slots(self, segment_ids):
+        new = [s for s in dict.fromkeys(segment_ids) if s not in self._slot]
+        if new:
+            start = len(self._slot)
+            self._slot.update((s, start + i) for i, s in enumerate(new))
+            grow = len(new)
+            for name in ("seen", "mean", "var", "m2", "score", "fail"):
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate([array, np.zeros(grow, dtype=array.dtype)]))
+        return np.fromiter((self._slot[s] for s in segment_ids), dtype=np.int64, count=len(segment_ids))
+
+    def sigma(self, slots):
+        return np.maximum(np.sqrt(self.var[slots]), np.maximum(self.min_std_ratio * np.abs(self.mean[slots]), 1e-12))
+
+    def status(self, segment_ids):
+        return self.fail[self._slots(list(segment_ids))]
+
+    def update(self, segment_ids, norms):
+        """
+        Fold one norm per segment into its state.
+        Returns (fail, changed, first_seen, thresholds, scores), where
+        changed marks OK<->FAIL transitions and thresholds is the level
+        below which a norm adds evidence (mean - k * sigma).
+        """
+        segment_ids = list(segment_ids)
+        norms = np.asarray(norms, dtype=np.float64)
+        first_seen = np.array([s not in self._slot for s in segment_ids], dtype=bool)
+        slots = self._slots(segment_ids)
+        seen, mean, var = self.seen[slots], self.mean[slots], self.var[slots]
+        warm = seen >= self.warmup
+
+        sigma = self.sigma(slots)
+        z = (norms - mean) / sigma
+        score = np.where(warm, np.clip(self.score[slots] - z - self.k, 0.0, self.max_score), 0.0)
+        was_failing = self.fail[slots]
+        fail = np.where(was_failing, score > self.exit, score > self.enter)
+        thresholds = np.where(warm, mean - self.k * sigma, np.nan)
+
+        # Baseline: Welford during warm-up, EWMA afterwards, frozen while failing.
+        delta = norms - mean
+        count = seen + 1
+        welford_mean = mean + delta / count
+        m2 = self.m2[slots] + delta * (norms - welford_mean)
+        ewma_mean = mean + self.alpha * delta
+        ewma_var = (1 - self.alpha) * (var + self.alpha * delta * delta)
+        learn = ~fail
+        self.mean[slots] = np.where(learn, np.where(warm, ewma_mean, welford_mean), mean)
+        self.var[slots] = np.where(learn, np.where(warm, ewma_var, m2 / count), var)
+        self.m2[slots] = np.where(warm, self.m2[slots], m2)
+        self.seen[slots] = np.where(learn, count, seen)
+        self.score[slots] = score
+        self.fail[slots] = fail
+        self.save()
+        return fail, fail != was_failing, first_seen, thresholds, score
+
+
+def segment_documents(aggregator, fail, thresholds, device_keys, updated_at, positions=None, updated_epoch=None):
+    """
+    SegmentPrediction documents for every segment of the aggregator, or
+    only for the segment positions given (fail/thresholds then align with
+    positions). updated_epoch (default now) is the indexed twin of the
+    one-second 'updated' string.
+    """
+    updated_epoch = time.time() if updated_epoch is None else updated_epoch
+    if positions is None:
+        positions = np.arange(aggregator.num_segments)
+    positions = np.asarray(positions, dtype=np.int64)
+    index = torch.from_numpy(positions)
+    norms = aggregator.norms_of(index).tolist()
+    max_norms = aggregator.max[index].norm(dim=1).tolist()
+    mean = aggregator.sums[index] / aggregator.counts[index, None]
+    dispersion = (aggregator.sq_sums[index] / aggregator.counts[index, None] - mean * mean).clamp_min(0).sqrt()
+    dispersion = dispersion.mean(dim=1).tolist()
+    thresholds = np.broadcast_to(np.asarray(thresholds, dtype=np.float64), (len(positions),)).tolist()
+    fail = np.asarray(fail).tolist()
+    segment_ids = aggregator.segment_ids[index].tolist()
+    docs = []
+    for i, s in enumerate(positions.tolist()):
+        docs.append({
+            "_key": str(segment_ids[i]),
+            "segment_id": segment_ids[i],
+            "norm": norms[i],
+            "max_norm": max_norms[i],
+            "dispersion": dispersion[i],
+            "threshold": None if np.isnan(thresholds[i]) else thresholds[i],
+            "status": "FAIL" if fail[i] else "OK",
+            "updated": updated_at,
+            "updated_at": updated_epoch,
+            "device_ids": [device_keys[d] for d in aggregator.members(s).tolist()],
+        })
+    return docs
@@ -0,0 +1,294 @@
+"""
+Segment formation and segment failure scoring.
+
+A segment is a small group of connected devices. Devices are partitioned
+over a CSR adjacency of the (undirected) device graph with a pluggable
+strategy:
+
+  "bfs"                bounded BFS, up to max_size devices per segment
+  "components"         connected components, split with bounded BFS when
+                       larger than max_size
+  "label_propagation"  size-capped label propagation
+  "metis"              METIS k-way partition into parts of ~max_size
+                       devices (needs the optional pymetis package)
+
+SegmentPartitioner keeps the assignment in a cache file keyed by device
+key (in memory when there is no cache path). On the next run only the
+region around devices whose neighbourhood changed (or that are new) is
+re-partitioned; every other segment keeps its id. Scoring the segments
+lives in segment_scoring.py.
+"""
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+MAX_SEGMENT_SIZE = 4
+
+
+# --- CSR adjacency ---
+def device_csr(num_devices, device_edges):
+    """
+    Symmetric, deduplicated CSR adjacency without self loops.
+    """
+    src, dst = np.asarray(device_edges, dtype=np.int64)
+    keep = src != dst
+    src, dst = src[keep], dst[keep]
+    data = np.ones(2 * len(src), dtype=np.int8)
+    adj = sp.csr_matrix(
+        (data, (np.concatenate([src, dst]), np.concatenate([dst, src]))),
+        shape=(num_devices, num_devices),
+    )
+    adj.sum_duplicates()
+    adj.sort_indices()
+    return adj
+
+
+# --- Strategies ---
+# Each strategy takes (adj, order, max_size) and returns an int64 label per
+# node; nodes are visited in `order` so results are deterministic.
+def bfs_partition(adj, order, max_size=MAX_SEGMENT_SIZE):
+    """
+    Bounded BFS. A neighbour is claimed when it is enqueued, and only while
+    the segment still has room, so every node and edge is handled once.
+    """
+    indptr, indices = adj.indptr, adj.indices
+    labels = np.full(adj.shape[0], -1, dtype=np.int64)
+    next_label = 0
+    for start in order.tolist():
+        if labels[start] >= 0:
+            continue
+        labels[start] = next_label
+        size = 1
+        queue = deque([start])
+        while queue and size < max_size:
+            node = queue.popleft()
+            for neighbor in indices[indptr[node]:indptr[node + 1]].tolist():
+                if labels[neighbor] < 0:
+                    labels[neighbor] = next_label
+                    queue.append(neighbor)
+                    size += 1
+                    if size == max_size:
+                        break
+        next_label += 1
+    return labels
+
+
+def component_partition(adj, order, max_size=None):
+    """
+    Connected components; components larger than max_size are split by BFS.
+    """
+    _, labels = connected_components(adj, directed=False)
+    labels = labels.astype(np.int64)
+    if max_size is None:
+        return labels
+    sizes = np.bincount(labels)
+    large = sizes[labels] > max_size
+    if large.any():
+        nodes = np.flatnonzero(large)
+        sub = adj[nodes][:, nodes]
+        sub_order = np.argsort(np.argsort(order)[nodes], kind="stable")
+        labels[nodes] = labels.max() + 1 + bfs_partition(sub, sub_order, max_size)
+    return labels
+
+
+def label_propagation_partition(adj, order, max_size=MAX_SEGMENT_SIZE, iterations=10):
+    """
+    Size-capped label propagation seeded from a bounded BFS partition: each
+    node moves to the most common neighbouring label that still has room.
+    """
+    labels = bfs_partition(adj, order, max_size)
+    sizes = np.bincount(labels, minlength=adj.shape[0]).astype(np.int64)
+    indptr, indices = adj.indptr, adj.indices
+    for _ in range(iterations):
+        moved = 0
+        for node in order.tolist():
+            neighbors = indices[indptr[node]:indptr[node + 1]]
+            if len(neighbors) == 0:
+                continue
+            candidates, counts = np.unique(labels[neighbors], return_counts=True)
+            current = labels[node]
+            best, best_count = current, counts[candidates == current].sum()
+            for label, count in zip(candidates.tolist(), counts.tolist()):
+                if count > best_count and sizes[label] < max_size:
+                    best, best_count = label, count
+            if best != current:
+                sizes[current] -= 1
+                sizes[best] += 1
+                labels[node] = best
+                moved += 1
+        if moved == 0:
+            break
+    _, labels = np.unique(labels, return_inverse=True)
+    return labels.astype(np.int64)
+
+
+def metis_partition(adj, order, max_size=MAX_SEGMENT_SIZE):
+    """
+    METIS k-way partition with ceil(n / max_size) parts.
+    """
+    try:
+        import pymetis
+    except ImportError as e:
+        raise ImportError("The 'metis' segment strategy needs the pymetis package: pip install pymetis") from e
+    n = adj.shape[0]
+    parts = max(1, -(-n // max_size))
+    if parts == 1:
+        return np.zeros(n, dtype=np.int64)
+    _, membership = pymetis.part_graph(parts, xadj=adj.indptr, adjncy=adj.indices)
+    return np.asarray(membership, dtype=np.int64)
+
+
+STRATEGIES = {
+    "bfs": bfs_partition,
+    "components": component_partition,
+    "label_propagation": label_propagation_partition,
+    "metis": metis_partition,
+}
+
+
+# --- Change detection ---
+def _mix64(x):
+    x = x.astype(np.uint64)
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def key_hashes(keys):
+    """
+    Stable uint64 hash of each device key; keys need not be numeric.
+    """
+    return pd.util.hash_array(np.asarray(keys, dtype=object))
+
+
+def key_order(keys):
+    """
+    Rank of each key in natural order: shorter keys first, then by text, so
+    numeric keys sort by value.
+    """
+    keys = np.asarray(keys, dtype=str)
+    rank = np.empty(len(keys), dtype=np.int64)
+    rank[np.lexsort((keys, np.char.str_len(keys)))] = np.arange(len(keys))
+    return rank
+
+
+def neighborhood_fingerprints(adj, key_ids):
+    """
+    Order-independent hash of each device's neighbour keys (key_ids from
+    key_hashes()).
+    """
+    hashed = _mix64(key_ids[adj.indices])
+    sums = np.zeros(adj.shape[0], dtype=np.uint64)
+    nonempty = np.diff(adj.indptr) > 0
+    if nonempty.any():
+        with np.errstate(over="ignore"):
+            sums[nonempty] = np.add.reduceat(hashed, adj.indptr[:-1][nonempty])
+    with np.errstate(over="ignore"):
+        return sums ^ _mix64(np.diff(adj.indptr))
+
+
+# --- Partitioner with stable ids ---
+class SegmentPartitioner:
+    """
+    Assigns every device a stable segment id.
+
+    partition() returns an int64 array with the segment id of each device.
+    retired_ids lists ids that existed in the cache but are no longer used
+    after the last call, so their SegmentPrediction documents can be removed.
+    Without a cache path the assignment is kept in memory, so ids are only
+    stable within one process. Before the first assignment is known nothing
+    records the ids of earlier runs; the caller passes first_id above every
+    id still in use and retires those itself.
+    """
+
+    def __init__(self, strategy="bfs", max_size=MAX_SEGMENT_SIZE, cache_path=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown segment strategy {strategy!r}; expected one of {sorted(STRATEGIES)}")
+        self.strategy = strategy
+        self.max_size = max_size
+        self.cache_path = cache_path
+        self.retired_ids = []
+        self.repartitioned = 0
+        self._memory = None  # last assignment when there is no cache_path
+
+    def _load_cache(self):
+        if not self.cache_path:
+            return self._memory
+        if not os.path.exists(self.cache_path):
+            return None
+        return np.load(self.cache_path, allow_pickle=False)
+
+    def has_cache(self):
+        """
+        True once a previous assignment is known (cache file or in memory).
+        """
+        if not self.cache_path:
+            return self._memory is not None
+        return os.path.exists(self.cache_path)
+
+    def _save_cache(self, keys, fingerprints, segment_ids, next_id):
+        state = {
+            "keys": np.asarray(keys, dtype=str), "fingerprints": fingerprints, "segment_ids": segment_ids,
+            "next_id": next_id, "strategy": self.strategy, "max_size": self.max_size,
+        }
+        if not self.cache_path:
+            self._memory = state
+            return
+        tmp_path = self.cache_path + ".tmp.npz"
+        np.savez(tmp_path, **state)
+        os.replace(tmp_path, self.cache_path)
+
+    def _run_strategy(self, adj, rank, nodes):
+        sub = adj[nodes][:, nodes]
+        order = np.argsort(rank[nodes], kind="stable")
+        return STRATEGIES[self.strategy](sub, order, self.max_size)
+
+    def partition(self, device_keys, device_edges, first_id=0):
+        """
+        Segment id per device. first_id is the lowest new id when there is
+        no cache; with a cache, ids continue from its next_id.
+        """
+        keys = np.asarray(device_keys, dtype=str)
+        n = len(keys)
+        adj = device_csr(n, device_edges)
+        fingerprints = neighborhood_fingerprints(adj, key_hashes(keys))
+
+        segment_ids = np.full(n, -1, dtype=np.int64)
+        cache = self._load_cache()
+        next_id = first_id
+        old_ids = np.empty(0, dtype=np.int64)
+        if cache is not None:
+            next_id = int(cache["next_id"])
+            old_ids = np.unique(cache["segment_ids"])
+        if cache is not None and str(cache["strategy"]) == self.strategy and int(cache["max_size"]) == self.max_size:
+            old_index = {key: i for i, key in enumerate(cache["keys"].tolist())}
+            pos = np.array([old_index.get(key, -1) for key in keys.tolist()], dtype=np.int64)
+            known = pos >= 0
+            unchanged = known.copy()
+            unchanged[known] = cache["fingerprints"][pos[known]] == fingerprints[known]
+            segment_ids[known] = cache["segment_ids"][pos[known]]
+
+            # Segments touched by a changed, new or removed device are rebuilt.
+            removed = np.ones(len(cache["keys"]), dtype=bool)
+            removed[pos[known]] = False
+            dirty_segments = np.union1d(segment_ids[known & ~unchanged], cache["segment_ids"][removed])
+            dirty = ~known | np.isin(segment_ids, dirty_segments)
+        else:
+            dirty = np.ones(n, dtype=bool)
+
+        nodes = np.flatnonzero(dirty)
+        if len(nodes):
+            _, local = np.unique(self._run_strategy(adj, key_order(keys), nodes), return_inverse=True)
+            segment_ids[nodes] = next_id + local
+            next_id += int(local.max()) + 1
+        self.repartitioned = len(nodes)
+
+        self.retired_ids = np.setdiff1d(old_ids, segment_ids).tolist()
+        self._save_cache(keys, fingerprints, segment_ids, next_id)
+        return segment_ids
@@ -0,0 +1,262 @@
+"""
+Sharded full scoring passes in a process pool.
+
+The device graph is split into num_shards regions: connected components
+are packed onto the least-loaded shard, largest first, and components
+bigger than a shard are cut into shard-sized pieces with one of the
+segments.STRATEGIES. The default "metis" needs pymetis and fails at
+construction without it rather than silently falling back: METIS keeps the
+halo small when regions are linked to each other, whereas "bfs" or
+"components" can replicate a large share of the graph. Each
+shard owns its devices and additionally replicates the halo it needs for
+exact results, i.e. every device within num_layers hops. Owned devices are
+listed first, so a worker only keeps the first num_owned output rows.
+
+The feature matrices, the per-shard node and edge lists and the output
+buffers live in shared memory (torch share_memory_()), so handing a shard
+to a worker sends only tensor handles. Workers write their owned rows
+straight into the shared embedding/logit buffers, which makes the merge a
+no-op. A shard plan is computed once per graph and reused until the graph
+is reloaded.
+
+Only the model pass (message passing and classification) is sharded; the
+feature matrices are built once in the parent. Workers are started with
+"forkserver" (or "spawn"), never "fork": a forked child would inherit the
+parent's already initialised torch thread pools.
+"""
+import heapq
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+import torch.multiprocessing as torch_mp
+from scipy.sparse.csgraph import connected_components
+
+from network_health.incremental import _csr_by, _gather
+from network_health.model import CONNECTED_TO, HAS_KPI, REV_CONNECTED_TO, REV_HAS_KPI, CongestionModel
+from network_health.segments import STRATEGIES, device_csr
+
+SHARD_STRATEGY = "metis"
+
+
+# --- Shard planning ---
+def check_strategy(strategy):
+    """
+    Raise unless strategy is a segments.STRATEGIES name that can run here.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown shard strategy {strategy!r}; expected one of {sorted(STRATEGIES)}")
+    if strategy == "metis":
+        try:
+            import pymetis  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Sharded scoring partitions with METIS and needs the pymetis package: "
+                              "pip install pymetis, or set SHARD_STRATEGY to 'bfs' or 'components'") from e
+
+
+def shard_assignment(num_devices, device_edges, num_shards, strategy=SHARD_STRATEGY):
+    """
+    Shard id per device, balancing device counts while keeping connected
+    regions together.
+    """
+    adj = device_csr(num_devices, device_edges)
+    _, pieces = connected_components(adj, directed=False)
+    pieces = pieces.astype(np.int64)
+    cap = max(1, math.ceil(num_devices / num_shards))
+    large = np.bincount(pieces)[pieces] > cap
+    if large.any():
+        nodes = np.flatnonzero(large)
+        sub = adj[nodes][:, nodes]
+        split = STRATEGIES[strategy](sub, np.arange(len(nodes)), cap)
+        pieces[nodes] = pieces.max() + 1 + split
+    _, pieces = np.unique(pieces, return_inverse=True)
+    sizes = np.bincount(pieces)
+
+    load = [(0, shard) for shard in range(num_shards)]
+    piece_shard = np.empty(len(sizes), dtype=np.int64)
+    for piece in np.argsort(-sizes, kind="stable").tolist():
+        total, shard = heapq.heappop(load)
+        piece_shard[piece] = shard
+        heapq.heappush(load, (total + int(sizes[piece]), shard))
+    return piece_shard[pieces]
+
+
+class ShardPlan:
+    """
+    Per-shard (nodes, num_owned, local edges) for one graph. nodes lists
+    global device indices, owned devices first; edges are CONNECTED_TO
+    edges in local numbering.
+    """
+
+    def __init__(self, num_devices, device_edges, num_shards, num_layers=1, strategy=SHARD_STRATEGY):
+        device_edges = np.asarray(device_edges, dtype=np.int64)
+        self.num_devices = num_devices
+        self.num_edges = device_edges.shape[1]
+        self.assignment = shard_assignment(num_devices, device_edges, num_shards, strategy)
+        out_csr = _csr_by(device_edges[0], num_devices)
+        in_csr = _csr_by(device_edges[1], num_devices)
+
+        def incident(nodes):
+            return np.unique(np.concatenate([_gather(*out_csr, nodes), _gather(*in_csr, nodes)]))
+
+        self.shards = []
+        for shard in range(num_shards):
+            owned = np.flatnonzero(self.assignment == shard)
+            if len(owned) == 0:
+                continue
+            # Same selection as IncrementalEmbedder.update(): every edge into
+            # nodes within num_layers - 1 hops of the owned devices.
+            inner = owned
+            for _ in range(num_layers - 1):
+                edge_ids = incident(inner)
+                inner = np.union1d(inner, device_edges[:, edge_ids].ravel())
+            edge_ids = incident(inner)
+            halo = np.setdiff1d(np.union1d(inner, device_edges[:, edge_ids].ravel()), owned)
+            nodes = np.concatenate([owned, halo])
+            lookup = np.full(num_devices, -1, dtype=np.int64)
+            lookup[nodes] = np.arange(len(nodes))
+            local_edges = lookup[device_edges[:, edge_ids]]
+            self.shards.append((
+                torch.from_numpy(nodes).share_memory_(),
+                len(owned),
+                torch.from_numpy(np.ascontiguousarray(local_edges)).share_memory_(),
+            ))
+
+    @property
+    def replication(self):
+        """
+        Total nodes processed across shards / devices (1.0 = no halo).
+        """
+        return sum(len(nodes) for nodes, _, _ in self.shards) / max(self.num_devices, 1)
+
+
+# --- Worker side ---
+_WORKER_MODEL = None  # (config, CongestionModel), reused by every task of a worker process
+
+
+def _init_worker(threads):
+    torch.set_num_threads(threads)
+
+
+def _worker_model(config, state_dict):
+    global _WORKER_MODEL
+    if _WORKER_MODEL is None or _WORKER_MODEL[0] != config:
+        _WORKER_MODEL = (config, CongestionModel(**config).eval())
+    model = _WORKER_MODEL[1]
+    model.load_state_dict(state_dict)  # a few KB; always current with the parent's checkpoint
+    return model
+
+
+def _score_shard(config, state_dict, x_device, x_kpi, nodes, num_owned, edges, emb_out, logit_out):
+    t0 = time.perf_counter()
+    model = _worker_model(config, state_dict)
+    local = torch.arange(len(nodes))
+    kpi_edges = torch.stack([local, local])
+    edge_index = {
+        HAS_KPI: kpi_edges,
+        REV_HAS_KPI: kpi_edges.flip(0),
+        CONNECTED_TO: edges,
+        REV_CONNECTED_TO: edges.flip(0),
+    }
+    x_dict = {"device": x_device[nodes], "devicekpi": x_kpi[nodes]}
+    with torch.no_grad():
+        embeddings = model.embed(x_dict, edge_index)[:num_owned]
+        owned = nodes[:num_owned]
+        emb_out[owned] = embeddings
+        logit_out[owned] = model.classifier(embeddings)
+    return num_owned, time.perf_counter() - t0
+
+
+# --- Parent side ---
+class ShardedScorer:
+    """
+    Full-pass embeddings and logits computed shard by shard in a persistent
+    process pool. start_method defaults to "forkserver" where available and
+    "spawn" otherwise; "spawn" requires the calling script to guard its top
+    level with `if __name__ == "__main__":`.
+    """
+
+    def __init__(self, num_shards, workers=None, threads_per_worker=1, start_method=None, strategy=SHARD_STRATEGY):
+        check_strategy(strategy)
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in torch_mp.get_all_start_methods() else "spawn"
+        if start_method == "fork":
+            raise ValueError("ShardedScorer workers must not fork a parent whose torch threads are running; "
+                             "use 'forkserver' or 'spawn'")
+        self.num_shards = num_shards
+        self.workers = workers or min(num_shards, os.cpu_count() or 1)
+        self.threads_per_worker = threads_per_worker
+        self.start_method = start_method
+        self.strategy = strategy
+        self.plan = None
+        self._plan_key = None
+        self._buffers = {}
+        self._pool = None
+        self.shard_times = []
+
+    def _executor(self):
+        if self._pool is None:
+            context = torch_mp.get_context(self.start_method)
+            if self.start_method == "forkserver":
+                # Import torch and the model once in the server; workers fork from it.
+                context.set_forkserver_preload(["network_health.sharded"])
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=context,
+                initializer=_init_worker, initargs=(self.threads_per_worker,),
+            )
+        return self._pool
+
+    def _shared(self, name, shape, dtype):
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = torch.empty(shape, dtype=dtype).share_memory_()
+            self._buffers[name] = buffer
+        return buffer
+
+    def reset(self):
+        """
+        Forget the shard plan; call when the graph is reloaded.
+        """
+        self.plan = None
+        self._plan_key = None
+
+    def plan_for(self, data, num_layers):
+        edge_index = data[CONNECTED_TO].edge_index
+        key = (edge_index.data_ptr(), edge_index.shape[1], data["device"].num_nodes, num_layers)
+        if key != self._plan_key:
+            self.plan = ShardPlan(data["device"].num_nodes, edge_index.numpy(), self.num_shards, num_layers,
+                                  self.strategy)
+            self._plan_key = key
+        return self.plan
+
+    def embed(self, model, data):
+        """
+        (embeddings, logits) for every device, like one full model pass.
+        """
+        plan = self.plan_for(data, getattr(model, "num_layers", 1))
+        x_device = self._shared("device", tuple(data["device"].x.shape), data["device"].x.dtype)
+        x_kpi = self._shared("devicekpi", tuple(data["devicekpi"].x.shape), data["devicekpi"].x.dtype)
+        x_device.copy_(data["device"].x)
+        x_kpi.copy_(data["devicekpi"].x)
+        n = data["device"].num_nodes
+        emb_out = self._shared("embeddings", (n, model.hidden), torch.float32)
+        logit_out = self._shared("logits", (n, 2), torch.float32)
+
+        state_dict = {k: v.detach().clone() for k, v in model.state_dict().items()}
+        config = {"num_features": model.num_features, "hidden": model.hidden, "device_features": model.device_features}
+        pool = self._executor()
+        futures = [
+            pool.submit(_score_shard, config, state_dict, x_device, x_kpi, nodes, num_owned, edges,
+                        emb_out, logit_out)
+            for nodes, num_owned, edges in plan.shards
+        ]
+        self.shard_times = [future.result()[1] for future in futures]
+        return emb_out.clone(), logit_out.clone()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,201 @@
+"""
+Synthetic KPI data and cell topologies.
+
+generate_rows() produces one batch of KPI rows (one per cell) for a given
+timestamp. It is shared by generate_data.py and the asyncio pipeline
+(run_pipeline.py).
+
+SyntheticNetwork places cells on a hexagonal grid or at random positions,
+connects each cell to its `degree` nearest neighbours and drives the KPIs
+from a per-cell load made of Gaussian hotspots, so congested cells cluster
+in space the way they do in a real deployment. It scales to millions of
+cells (KPIs are drawn with NumPy, neighbours come from a k-d tree) and is
+used by the benchmark suite (benchmarks/bench_suite.py).
+"""
+import random
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+NUM_NODES = 50
+TIMESTAMP_FORMAT = "%m/%d/%Y %H:%M:%S"
+NETWORK_TYPES = ["3G", "4G", "5G"]
+LAYOUTS = ("hex", "geometric")
+
+# name: (low, high, direction, decimals). direction +1 means the KPI rises
+# with load (congestion), -1 that it falls; decimals None means an integer.
+KPI_RANGES = {
+    "uplink_traffic_MB": (5, 50, 1, 2),
+    "downlink_traffic_MB": (10, 100, 1, 2),
+    "active_users": (10, 100, 1, None),
+    "call_drop_rate": (0, 3, 1, 2),
+    "latency_ms": (10, 100, 1, 2),
+    "throughput_Mbps": (20, 120, -1, 2),
+    "signal_strength_dBm": (-110, -70, -1, 2),
+    "resource_utilization": (30, 100, 1, 2),
+    "handover_success_rate": (80, 100, -1, 2),
+    "packet_loss_rate": (0, 2, 1, 2),
+    "jitter_ms": (0, 10, 1, 2),
+}
+
+
+def _skew(u, load, direction):
+    """
+    Map a uniform draw into the lower half of the range for an idle cell and
+    the upper half for a fully loaded one (reversed for direction -1).
+    """
+    if load is None:
+        return u
+    pressure = load if direction > 0 else 1 - load
+    return 0.5 * u + 0.5 * pressure
+
+
+def generate_rows(current_time, num_nodes=NUM_NODES, load=None):
+    """
+    One row per cell. load (optional, one value in [0, 1] per cell) skews
+    the KPIs towards congestion; without it every KPI is uniform in its range.
+    """
+    rows = []
+    for cell_id in range(1, num_nodes + 1):
+        cell_load = None if load is None else float(load[cell_id - 1])
+        row = {
+            "timestamp": current_time.strftime(TIMESTAMP_FORMAT),
+            "cell_id": cell_id,
+            "network_type": random.choice(NETWORK_TYPES),
+        }
+        for name, (low, high, direction, decimals) in KPI_RANGES.items():
+            u = _skew(random.random(), cell_load, direction)
+            if decimals is None:
+                row[name] = int(low + round(u * (high - low)))
+            else:
+                row[name] = round(low + u * (high - low), decimals)
+        rows.append(row)
+    return rows
+
+
+def generate_frame(current_time, num_nodes=NUM_NODES, load=None, rng=None):
+    """
+    Vectorized generate_rows() returning a DataFrame with the same columns.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    columns = {
+        "timestamp": np.full(num_nodes, current_time.strftime(TIMESTAMP_FORMAT), dtype=object),
+        "cell_id": np.arange(1, num_nodes + 1, dtype=np.int64),
+        "network_type": np.asarray(NETWORK_TYPES, dtype=object)[rng.integers(0, len(NETWORK_TYPES), num_nodes)],
+    }
+    load = None if load is None else np.asarray(load, dtype=np.float64)
+    for name, (low, high, direction, decimals) in KPI_RANGES.items():
+        u = _skew(rng.random(num_nodes), load, direction)
+        if decimals is None:
+            columns[name] = (low + np.round(u * (high - low))).astype(np.int64)
+        else:
+            columns[name] = np.round(low + u * (high - low), decimals)
+    return pd.DataFrame(columns)
+
+
+# --- Topology ---
+def hex_positions(num_cells):
+    """
+    Centres of a roughly square patch of a hexagonal grid with unit spacing
+    (every interior cell has six neighbours at distance 1).
+    """
+    width = max(1, int(np.ceil(np.sqrt(num_cells))))
+    i = np.arange(num_cells)
+    row, col = i // width, i % width
+    x = col + 0.5 * (row % 2)
+    y = row * (np.sqrt(3) / 2)
+    return np.column_stack([x, y])
+
+
+def geometric_positions(num_cells, rng):
+    """
+    Uniform random sites with the same density as hex_positions().
+    """
+    side = np.sqrt(num_cells)
+    return rng.random((num_cells, 2)) * side
+
+
+def nearest_neighbour_edges(positions, degree):
+    """
+    int64 [2, num_edges] pairs (i < j) linking every cell to its `degree`
+    nearest neighbours; each link appears once.
+    """
+    n = len(positions)
+    k = min(degree, n - 1)
+    if k <= 0:
+        return np.empty((2, 0), dtype=np.int64)
+    _, neighbours = cKDTree(positions).query(positions, k=k + 1, workers=-1)
+    src = np.repeat(np.arange(n), k)
+    dst = neighbours[:, 1:].ravel()
+    pairs = np.unique(np.minimum(src, dst) * n + np.maximum(src, dst))  # 1-D keys sort much faster than rows
+    return np.stack([pairs // n, pairs % n]).astype(np.int64)
+
+
+class SyntheticNetwork:
+    """
+    A cell layout, its neighbour links and a hotspot load field.
+
+    layout:   "hex" (regular grid) or "geometric" (random sites)
+    degree:   nearest neighbours each cell links to (6 on the hex grid
+              reproduces the hexagonal adjacency)
+    hotspots: number of congestion hotspots (default one per 500 cells)
+    radius:   hotspot radius in cell spacings
+    """
+
+    def __init__(self, num_cells, layout="hex", degree=6, hotspots=None, radius=3.0, seed=0):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout {layout!r}; expected one of {LAYOUTS}")
+        self.num_cells = num_cells
+        self.layout = layout
+        self.degree = degree
+        self.radius = radius
+        self.rng = np.random.default_rng(seed)
+        if layout == "hex":
+            self.positions = hex_positions(num_cells)
+        else:
+            self.positions = geometric_positions(num_cells, self.rng)
+        self.edges = nearest_neighbour_edges(self.positions, degree)
+        num_hotspots = hotspots if hotspots is not None else max(1, num_cells // 500)
+        self.centres = self.positions[self.rng.integers(0, num_cells, num_hotspots)].copy()
+        self.amplitudes = self.rng.uniform(0.6, 1.0, num_hotspots)
+        self.load = self._load()
+
+    def _load(self):
+        """
+        Per-cell load in [0, 1]: the strongest hotspot reaching the cell plus
+        a little background noise.
+        """
+        load = np.zeros(self.num_cells)
+        tree = cKDTree(self.positions)
+        for centre, amplitude in zip(self.centres, self.amplitudes):
+            near = np.asarray(tree.query_ball_point(centre, 3 * self.radius), dtype=np.int64)
+            if len(near) == 0:
+                continue
+            d2 = ((self.positions[near] - centre) ** 2).sum(axis=1)
+            load[near] = np.maximum(load[near], amplitude * np.exp(-d2 / (2 * self.radius ** 2)))
+        return np.clip(load + self.rng.normal(0, 0.05, self.num_cells), 0.0, 1.0)
+
+    def drift(self, step=0.5):
+        """
+        Move the hotspots by a random step (in cell spacings) and recompute
+        the load, for multi-tick runs.
+        """
+        self.centres += self.rng.normal(0, step, self.centres.shape)
+        self.load = self._load()
+
+    def frame(self, current_time):
+        return generate_frame(current_time, self.num_cells, self.load, self.rng)
+
+    def edge_rows(self, node_collection="traffic_data"):
+        """
+        [_from, _to] rows, the shape fetch_edge_rows() returns.
+        """
+        keys = np.char.add(f"{node_collection}/", np.arange(1, self.num_cells + 1).astype(str))
+        return np.stack([keys[self.edges[0]], keys[self.edges[1]]], axis=1).tolist()
+
+    def edge_documents(self, node_collection="traffic_data"):
+        """
+        cell_edges documents, like traffic_data_edges.json.
+        """
+        return [{"_from": a, "_to": b} for a, b in self.edge_rows(node_collection)]
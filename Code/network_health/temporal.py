@@ -0,0 +1,263 @@
+"""
+Rolling-window temporal KPI features.
+
+RollingKpiWindows keeps, for every cell, a fixed-size ring buffer of its
+last `window` KPI rows plus running sums, so memory per cell is bounded by
+the window no matter how long the stream runs. Adding a row costs O(1) per
+KPI. The EWMA and the window's sum, sum of squares and time-weighted sum are
+updated incrementally (the row falling out of the window is subtracted), so
+mean, std and least-squares slope (per sample) are available without
+rescanning. Only the window max is taken over the buffer when features are
+read.
+
+TemporalFeatures feeds the windows from the KPI store (every appended row,
+not just the latest per cell) and appends the features to the devicekpi
+node features:
+
+    devicekpi x = [raw KPIs | ewma | mean | std | max | slope]   (11 x 6 columns)
+
+The window configuration is stored in the checkpoint metadata ("temporal"),
+so a scorer builds exactly the feature layout the model was trained on.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from network_health.graph_build import GraphArrays
+from network_health.kpi_store import TIMESTAMP_FORMAT
+from network_health.kpis import KPI_KEYS
+
+TEMPORAL_FEATURES = ("ewma", "mean", "std", "max", "slope")
+DEFAULT_WINDOW = 12
+DEFAULT_ALPHA = 0.3
+
+
+def feature_names(features=TEMPORAL_FEATURES):
+    return [f"{kpi}_{feature}" for feature in features for kpi in KPI_KEYS]
+
+
+class RollingKpiWindows:
+    def __init__(self, window=DEFAULT_WINDOW, alpha=DEFAULT_ALPHA, num_kpis=len(KPI_KEYS), capacity=1024):
+        self.window = window
+        self.alpha = alpha
+        self.num_kpis = num_kpis
+        self._slot = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        w, f = self.window, self.num_kpis
+        self.values = np.zeros((capacity, w, f), dtype=np.float32)
+        self.head = np.zeros(capacity, dtype=np.int64)      # next write position
+        self.count = np.zeros(capacity, dtype=np.int64)     # rows in the window
+        self.last_ts = np.full(capacity, -1, dtype=np.int64)
+        self.ewma = np.zeros((capacity, f))
+        self.sums = np.zeros((capacity, f))
+        self.sq_sums = np.zeros((capacity, f))
+        self.t_sums = np.zeros((capacity, f))               # sum of position * value, oldest at 0
+
+    def _grow(self, needed):
+        capacity = len(self.head)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, 2 * capacity)
+        old = {name: getattr(self, name) for name in
+               ("values", "head", "count", "last_ts", "ewma", "sums", "sq_sums", "t_sums")}
+        self._allocate(new_capacity)
+        for name, array in old.items():
+            getattr(self, name)[:capacity] = array
+
+    @property
+    def keys(self):
+        return list(self._slot)
+
+    def slots(self, keys, create=True):
+        """
+        Slot index per key; unknown keys get a new slot (create=True) or -1.
+        """
+        if create:
+            new = [key for key in dict.fromkeys(keys) if key not in self._slot]
+            if new:
+                start = len(self._slot)
+                self._grow(start + len(new))
+                self._slot.update((key, start + i) for i, key in enumerate(new))
+        return np.fromiter((self._slot.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+
+    def update(self, keys, values, timestamps=None):
+        """
+        Append one row per key (keys must be unique within a call). Rows not
+        newer than the last timestamp seen for their cell are ignored.
+        Returns the keys that were updated.
+        """
+        keys = list(keys)
+        values = np.asarray(values, dtype=np.float64).reshape(len(keys), self.num_kpis)
+        slots = self.slots(keys)
+        if timestamps is not None:
+            timestamps = np.asarray(timestamps, dtype=np.int64)
+            fresh = timestamps > self.last_ts[slots]
+            slots, values, timestamps = slots[fresh], values[fresh], timestamps[fresh]
+            keys = [key for key, keep in zip(keys, fresh.tolist()) if keep]
+            self.last_ts[slots] = timestamps
+        if len(slots) == 0:
+            return []
+
+        n = self.count[slots]
+        full = (n == self.window)[:, None]
+        head = self.head[slots]
+        oldest = self.values[slots, head].astype(np.float64)  # the row being overwritten when full
+
+        # Time-weighted sum: when full, every kept row moves one position down.
+        t_full = self.t_sums[slots] - (self.sums[slots] - oldest) + (self.window - 1) * values
+        t_fill = self.t_sums[slots] + n[:, None] * values
+        self.t_sums[slots] = np.where(full, t_full, t_fill)
+        self.sums[slots] += values - np.where(full, oldest, 0.0)
+        self.sq_sums[slots] += values * values - np.where(full, oldest * oldest, 0.0)
+        self.ewma[slots] = np.where(
+            (n == 0)[:, None], values, self.alpha * values + (1 - self.alpha) * self.ewma[slots]
+        )
+
+        self.values[slots, head] = values
+        self.head[slots] = (head + 1) % self.window
+        self.count[slots] = np.minimum(n + 1, self.window)
+        return keys
+
+    def update_frame(self, df):
+        """
+        Append KPI store rows (cell_id, timestamp, KPI columns) in timestamp
+        order; several rows of the same cell are applied one after another.
+        Returns the set of keys that were updated.
+        """
+        if df.empty:
+            return set()
+        ts = pd.to_datetime(df["timestamp"], format=TIMESTAMP_FORMAT)
+        epoch = ((ts - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).to_numpy()
+        keys = df["cell_id"].astype(int).astype(str).to_numpy()
+        values = df.reindex(columns=KPI_KEYS).fillna(0).to_numpy(dtype=np.float64)
+        order = np.argsort(epoch, kind="stable")
+        keys, values, epoch = keys[order], values[order], epoch[order]
+        # Round r holds the r-th row of every cell, so keys are unique per round.
+        rounds = pd.Series(keys).groupby(keys).cumcount().to_numpy()
+        updated = set()
+        for r in range(int(rounds.max()) + 1):
+            mask = rounds == r
+            updated.update(self.update(keys[mask].tolist(), values[mask], epoch[mask]))
+        return updated
+
+    def features(self, keys, features=TEMPORAL_FEATURES):
+        """
+        float32 [len(keys), len(features) * num_kpis]; cells without
+        history get zeros.
+        """
+        slots = self.slots(list(keys), create=False)
+        known = slots >= 0
+        out = np.zeros((len(slots), len(features), self.num_kpis), dtype=np.float32)
+        if not known.any():
+            return out.reshape(len(slots), -1)
+        s = slots[known]
+        n = self.count[s][:, None].astype(np.float64)
+        safe_n = np.maximum(n, 1)
+        mean = self.sums[s] / safe_n
+        columns = {}
+        for name in features:
+            if name == "ewma":
+                columns[name] = self.ewma[s]
+            elif name == "mean":
+                columns[name] = mean
+            elif name == "std":
+                columns[name] = np.sqrt(np.maximum(self.sq_sums[s] / safe_n - mean * mean, 0.0))
+            elif name == "max":
+                valid = np.arange(self.window)[None, :] < self.count[s][:, None]
+                window_values = np.where(valid[:, :, None], self.values[s], -np.inf)
+                columns[name] = np.where(n > 0, window_values.max(axis=1), 0.0)
+            elif name == "slope":
+                t_sum = n * (n - 1) / 2
+                t_sq = (n - 1) * n * (2 * n - 1) / 6
+                denom = n * t_sq - t_sum * t_sum
+                numer = n * self.t_sums[s] - t_sum * self.sums[s]
+                columns[name] = np.where(denom > 0, numer / np.where(denom > 0, denom, 1), 0.0)
+            else:
+                raise ValueError(f"Unknown temporal feature {name!r}; expected one of {TEMPORAL_FEATURES}")
+        out[known] = np.stack([columns[name] for name in features], axis=1)
+        return out.reshape(len(slots), -1)
+
+    # --- Persistence ---
+    def state(self):
+        used = len(self._slot)
+        return {
+            "keys": np.asarray(self.keys, dtype=str),
+            "window": self.window, "alpha": self.alpha,
+            "values": self.values[:used], "head": self.head[:used], "count": self.count[:used],
+            "last_ts": self.last_ts[:used], "ewma": self.ewma[:used], "sums": self.sums[:used],
+            "sq_sums": self.sq_sums[:used], "t_sums": self.t_sums[:used],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        keys = state["keys"].tolist()
+        windows = cls(int(state["window"]), float(state["alpha"]), state["values"].shape[2], max(len(keys), 1))
+        windows._slot = {key: i for i, key in enumerate(keys)}
+        for name in ("values", "head", "count", "last_ts", "ewma", "sums", "sq_sums", "t_sums"):
+            getattr(windows, name)[:len(keys)] = state[name]
+        return windows
+
+
+class TemporalFeatures:
+    """
+    RollingKpiWindows fed from a KpiReader. refresh() consumes the rows
+    appended since the previous call; the windows and the read offset are
+    kept in state_path (npz) so a restart does not replay the whole store.
+    """
+
+    def __init__(self, reader, window=DEFAULT_WINDOW, alpha=DEFAULT_ALPHA, features=TEMPORAL_FEATURES,
+                 state_path=None):
+        self.reader = reader
+        self.features = tuple(features)
+        self.state_path = state_path
+        self.offset = 0
+        self.windows = None
+        if state_path and os.path.exists(state_path):
+            with np.load(state_path, allow_pickle=False) as state:
+                if int(state["window"]) == window and float(state["alpha"]) == alpha:
+                    self.windows = RollingKpiWindows.from_state(state)
+                    self.offset = int(state["offset"])
+        if self.windows is None:
+            self.windows = RollingKpiWindows(window, alpha)
+
+    @classmethod
+    def from_config(cls, reader, config, state_path=None):
+        return cls(reader, config["window"], config["alpha"], config["features"], state_path)
+
+    @property
+    def config(self):
+        """
+        Stored in checkpoint metadata under "temporal".
+        """
+        return {"window": self.windows.window, "alpha": self.windows.alpha, "features": list(self.features)}
+
+    @property
+    def num_features(self):
+        return len(self.features) * self.windows.num_kpis
+
+    def refresh(self):
+        """
+        Fold newly appended store rows into the windows. Returns the keys updated.
+        """
+        df, next_offset = self.reader.read_since(self.offset, columns=["timestamp", "cell_id", *KPI_KEYS])
+        updated = self.windows.update_frame(df)
+        self.offset = next_offset
+        if self.state_path and updated:
+            tmp_path = self.state_path + ".tmp.npz"
+            np.savez(tmp_path, offset=self.offset, **self.windows.state())
+            os.replace(tmp_path, self.state_path)
+        return updated
+
+    def attach(self, arrays):
+        """
+        Return (GraphArrays, kpi_x): kpi_x holds the raw KPIs followed by the
+        temporal features, and the returned arrays.kpi is a view of its raw
+        KPI columns, so in-place KPI patches reach the model input.
+        """
+        kpi_x = np.empty((arrays.num_devices, arrays.kpi.shape[1] + self.num_features), dtype=np.float32)
+        kpi_x[:, :arrays.kpi.shape[1]] = arrays.kpi
+        kpi_x[:, arrays.kpi.shape[1]:] = self.windows.features(arrays.device_keys.tolist(), self.features)
+        return GraphArrays(arrays.device_keys, kpi_x[:, :arrays.kpi.shape[1]], arrays.device_edges), kpi_x
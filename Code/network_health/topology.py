@@ -0,0 +1,307 @@
+"""
+Versioned, memory-mapped snapshots of the cell_edges topology.
+
+cell_edges almost never changes, yet every scorer run and every dashboard
+rebuild used to re-read all edge documents and map the "traffic_data/<key>"
+strings to indices. TopologyStore compiles the collection once into a CSR
+snapshot on disk:
+
+    topology/
+        CURRENT                 name of the current version, e.g. "v0003"
+        v0003/meta.json         version, change marker, counts, relation names
+        v0003/keys.npy          node keys (str, sorted); index i <-> keys[i]
+        v0003/indptr.npy        int64 [num_nodes + 1]
+        v0003/indices.npy       int64 [num_edges] target index per edge, grouped by source
+        v0003/relations.npy     int16 [num_edges] code into meta "relations"
+
+Every process (scorer, trainer, dashboard) opens the arrays with
+np.load(mmap_mode="r"), i.e. as read-only np.memmap views of the same page
+cache: loading is O(1) and nothing is copied. Edges are stored as in the
+collection (directed _from -> _to), sorted by source then target key, so
+the order is deterministic.
+
+The snapshot is rebuilt only when the change marker moves: the edge
+collection's document count and revision (two cheap metadata calls, no
+scan). A rebuild writes a new version directory and then atomically points
+CURRENT at it; the previous `keep` versions stay on disk so processes still
+mapping them are unaffected. Processes sharing the directory may rebuild at
+the same time: a version number is claimed by the rename that publishes
+it, and a process that loses it either adopts the winner's snapshot (same
+marker) or publishes under the next number.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from network_health.data_access import DEFAULT_BATCH_SIZE, fetch_edge_rows
+from network_health.instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+CURRENT_NAME = "CURRENT"
+ARRAYS = ("keys", "indptr", "indices", "relations")
+
+
+class TopologySnapshot:
+    """
+    One loaded version. keys, indptr, indices and relations are read-only
+    memory maps.
+    """
+
+    def __init__(self, path, meta, arrays):
+        self.path = path
+        self.meta = meta
+        self.version = meta["version"]
+        self.marker = meta["marker"]
+        self.node_collection = meta["node_collection"]
+        self.relation_names = meta["relations"]
+        self.keys = arrays["keys"]
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.relations = arrays["relations"]
+
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS}
+        return cls(path, meta, arrays)
+
+    @property
+    def num_nodes(self):
+        return len(self.keys)
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    def sources(self):
+        """
+        Source index per edge (materialized from indptr).
+        """
+        return np.repeat(np.arange(self.num_nodes, dtype=np.int64), np.diff(self.indptr))
+
+    def edges(self):
+        """
+        int64 [2, num_edges] edge index in snapshot index space.
+        """
+        return np.stack([self.sources(), np.asarray(self.indices)])
+
+    def index_of(self, keys):
+        """
+        Snapshot index of each key (-1 for keys with no edges).
+        """
+        keys = np.asarray(keys, dtype=str)
+        if self.num_nodes == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        found = np.searchsorted(self.keys, keys).clip(max=self.num_nodes - 1)
+        return np.where(self.keys[found] == keys, found, -1).astype(np.int64)
+
+    def edges_for(self, keys):
+        """
+        int64 [2, e] edges in the index space of `keys` (e.g. the device order
+        of a GraphArrays); edges with an endpoint outside `keys` are dropped.
+        """
+        to_local = pd.Index(np.asarray(keys, dtype=str)).get_indexer(np.asarray(self.keys))
+        edges = to_local[self.edges()]
+        keep = (edges >= 0).all(axis=0)
+        return np.ascontiguousarray(edges[:, keep]).astype(np.int64)
+
+
+def edge_marker(db, edge_collection):
+    """
+    [document count, revision] of an edge collection; the revision moves on
+    every write, including edits that keep the count.
+    """
+    collection = db.collection(edge_collection)
+    return [collection.count(), str(collection.revision())]
+
+
+def _write_meta(path, meta):
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, indent=2)
+
+
+def _write_snapshot(path, marker, node_collection, edge_rows):
+    """
+    Compile [_from, _to, relation] rows into the CSR files under path.
+    Returns (meta without "version", number of rows skipped because an
+    endpoint is not in node_collection); meta.json is written when the
+    snapshot is published under a version.
+    """
+    prefix = f"{node_collection}/"
+    if edge_rows:
+        table = pd.DataFrame(edge_rows, columns=["_from", "_to", "relation"])
+    else:
+        table = pd.DataFrame({"_from": [], "_to": [], "relation": []}, dtype=object)
+    inside = table["_from"].str.startswith(prefix) & table["_to"].str.startswith(prefix)
+    skipped = int((~inside).sum())
+    table = table[inside]
+    src_keys = table["_from"].str.slice(len(prefix)).to_numpy(dtype=str)
+    dst_keys = table["_to"].str.slice(len(prefix)).to_numpy(dtype=str)
+    keys, inverse = np.unique(np.concatenate([src_keys, dst_keys]), return_inverse=True)
+    src, dst = inverse[:len(src_keys)].astype(np.int64), inverse[len(src_keys):].astype(np.int64)
+    relation_codes, relation_names = pd.factorize(table["relation"].fillna("").astype(str))
+
+    order = np.lexsort((dst, src))
+    indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(keys)), out=indptr[1:])
+    arrays = {
+        "keys": keys,
+        "indptr": indptr,
+        "indices": dst[order],
+        "relations": relation_codes[order].astype(np.int16),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array, allow_pickle=False)
+    meta = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "marker": list(marker),
+        "node_collection": node_collection,
+        "num_nodes": int(len(keys)),
+        "num_edges": int(len(src)),
+        "relations": [str(name) for name in relation_names],
+    }
+    return meta, skipped
+
+
+class TopologyStore:
+    """
+    Keeps the current TopologySnapshot of edge_collection in `directory`.
+
+        store = TopologyStore("topology", db)
+        snapshot = store.current()      # rebuilt only if cell_edges changed
+        if store.changed(): ...         # cheap check, e.g. once per cycle
+
+    fetch_rows (optional) returns the [_from, _to, relation] rows to compile;
+    the default is a projected AQL scan of edge_collection.
+    """
+
+    def __init__(self, directory, db, edge_collection="cell_edges", node_collection="traffic_data",
+                 batch_size=DEFAULT_BATCH_SIZE, keep=2, fetch_rows=None):
+        self.directory = directory
+        self.db = db
+        self.edge_collection = edge_collection
+        self.node_collection = node_collection
+        self.batch_size = batch_size
+        self.keep = keep
+        self.fetch_rows = fetch_rows or (
+            lambda: fetch_edge_rows(db, edge_collection, batch_size, with_relation=True)
+        )
+        self.snapshot = None
+
+    def marker(self):
+        """
+        [document count, revision] of the edge collection.
+        """
+        return edge_marker(self.db, self.edge_collection)
+
+    def changed(self):
+        """
+        True if the edge collection moved since the loaded snapshot was built.
+        """
+        return self.snapshot is None or self.marker() != self.snapshot.marker
+
+    def current(self):
+        """
+        The snapshot matching the collection, loading CURRENT from disk or
+        rebuilding it as needed.
+        """
+        marker = self.marker()
+        if self.snapshot is not None and self.snapshot.marker == marker:
+            return self.snapshot
+        snapshot = self._open_current()
+        if snapshot is None or snapshot.marker != marker:
+            snapshot = self.rebuild(marker)
+        self.snapshot = snapshot
+        return snapshot
+
+    def _open_current(self):
+        pointer = os.path.join(self.directory, CURRENT_NAME)
+        if not os.path.exists(pointer):
+            return None
+        with open(pointer, "r", encoding="utf-8") as fh:
+            name = fh.read().strip()
+        snapshot = TopologySnapshot.open(os.path.join(self.directory, name))
+        if snapshot.node_collection != self.node_collection:
+            return None
+        return snapshot
+
+    def _versions(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(name[1:]) for name in os.listdir(self.directory)
+                      if name.startswith("v") and name[1:].isdigit())
+
+    def rebuild(self, marker=None):
+        """
+        Read the edge collection and write it as the next version.
+        """
+        marker = self.marker() if marker is None else marker
+        os.makedirs(self.directory, exist_ok=True)
+        with timed("topology_rebuild_seconds", "Time to compile cell_edges into a CSR snapshot"):
+            rows = self.fetch_rows()
+            tmp_path = tempfile.mkdtemp(prefix=".build-", dir=self.directory)
+            meta, skipped = _write_snapshot(tmp_path, marker, self.node_collection, rows)
+            name, built = self._publish(tmp_path, meta)
+        self._point_current(name)
+        if skipped and built:
+            logger.warning("Skipped %d edges with an endpoint outside %s", skipped, self.node_collection)
+        for old in self._versions()[:-(self.keep + 1)]:
+            shutil.rmtree(os.path.join(self.directory, f"v{old:04d}"), ignore_errors=True)
+        snapshot = TopologySnapshot.open(os.path.join(self.directory, name))
+        if built:
+            logger.info("Built topology snapshot %s: %d nodes, %d edges", name, snapshot.num_nodes,
+                        snapshot.num_edges)
+        else:
+            logger.info("Using topology snapshot %s built concurrently by another process", name)
+        return snapshot
+
+    def _publish(self, tmp_path, meta):
+        """
+        Move the snapshot written to tmp_path to the next free version and
+        return (name, True). The rename claims the version: when another
+        process took it first and built it from the same marker, tmp_path
+        is discarded and (its name, False) returned; otherwise the next
+        number is tried.
+        """
+        while True:
+            versions = self._versions()
+            version = versions[-1] + 1 if versions else 1
+            name = f"v{version:04d}"
+            path = os.path.join(self.directory, name)
+            _write_meta(tmp_path, {"version": version, **meta})
+            try:
+                os.rename(tmp_path, path)
+                return name, True
+            except OSError:
+                if not os.path.isdir(path):
+                    raise
+            # Lost the race: directories appear complete (rename), so the winner's meta is readable.
+            with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as fh:
+                winner = json.load(fh)
+            if winner["marker"] == meta["marker"] and winner["node_collection"] == meta["node_collection"]:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                return name, False
+
+    def _point_current(self, name):
+        """
+        Atomically point CURRENT at version `name`, unless a concurrent
+        rebuild already pointed it at a newer one.
+        """
+        pointer = os.path.join(self.directory, CURRENT_NAME)
+        if os.path.exists(pointer):
+            with open(pointer, "r", encoding="utf-8") as fh:
+                current = fh.read().strip()
+            if current[1:].isdigit() and int(current[1:]) > int(name[1:]):
+                return
+        fd, tmp_pointer = tempfile.mkstemp(prefix=f".{CURRENT_NAME}-", dir=self.directory)
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(name)
+        os.replace(tmp_pointer, pointer)
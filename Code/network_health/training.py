@@ -0,0 +1,73 @@
+"""
+Offline training of the congestion model.
+
+Message passing uses the (frozen, seeded) HeteroConv weights; only the
+linear classifier is trained on the resulting device embeddings, with the
+same class-weighted loss and 60/40 stratified split the one-shot script used.
+"""
+import logging
+import time
+
+import torch
+from sklearn.metrics import accuracy_score, precision_score, recall_score
+from sklearn.model_selection import train_test_split
+
+from network_health.instrumentation import gauge, histogram
+from network_health.model import CongestionModel, edge_index_dict
+
+logger = logging.getLogger(__name__)
+
+EPOCH_SECONDS = histogram("train_epoch_seconds", "Time per training epoch", ("mode",))
+TRAIN_LOSS = gauge("train_loss", "Training loss of the last epoch", ("mode",))
+
+
+def train_model(data, labels, epochs=100, lr=0.01, test_size=0.4, seed=42, log_every=10):
+    """
+    Return (model, metrics) where metrics holds test-set accuracy/precision/recall.
+    """
+    torch.manual_seed(seed)
+    model = CongestionModel(num_features=data["devicekpi"].x.shape[1], device_features=data["device"].x.shape[1])
+    model.fit_normalization(data["devicekpi"].x)
+
+    with torch.no_grad():
+        device_embeddings = model.embed(data.x_dict, edge_index_dict(data))
+
+    train_idx, test_idx = train_test_split(
+        list(range(len(labels))), test_size=test_size, random_state=seed, stratify=labels
+    )
+    train_embeddings = device_embeddings[train_idx]
+    train_labels = labels[train_idx]
+
+    logger.info("Label distribution: %s", torch.bincount(labels).tolist())
+
+    class_counts = torch.bincount(train_labels, minlength=2)
+    weights = 1.0 / class_counts.float().clamp_min(1)
+    loss_fn = torch.nn.CrossEntropyLoss(weight=weights)
+    optimizer = torch.optim.Adam(model.classifier.parameters(), lr=lr)
+    logger.info("Class weights: %s", weights.tolist())
+
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        logits = model.classifier(train_embeddings)
+        loss = loss_fn(logits, train_labels)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        EPOCH_SECONDS.observe(time.perf_counter() - start, mode="full")
+        if log_every and epoch % log_every == 0:
+            TRAIN_LOSS.set(loss.item(), mode="full")
+            logger.info("Epoch %d, Loss: %.4f", epoch, loss.item())
+
+    model.eval()
+    with torch.no_grad():
+        predicted = model.classifier(device_embeddings[test_idx]).argmax(dim=1)
+    true_labels = labels[test_idx].numpy()
+    predicted_labels = predicted.numpy()
+    metrics = {
+        "accuracy": float(accuracy_score(true_labels, predicted_labels)),
+        "precision": float(precision_score(true_labels, predicted_labels, zero_division=0)),
+        "recall": float(recall_score(true_labels, predicted_labels, zero_division=0)),
+        "num_devices": int(len(labels)),
+        "epochs": epochs,
+    }
+    return model, metrics
@@ -0,0 +1,323 @@
+"""
+Batched what-if simulation: which cells and segments tip into congestion
+if the KPIs of some cells change.
+
+A scenario names the cells whose KPIs change, in absolute values or as
+"saturated":
+
+    {"name": "north saturates", "saturate": ["12", "17"]}
+    {"name": "hot spot", "set": {"12": {"latency_ms": 180, "packet_loss_rate": 3.5}}}
+
+Saturating a cell raises each KPI in CONGESTION_THRESHOLDS to its
+saturation_quantile over the current network (KPIs already above it are
+kept). "set" is applied after "saturate".
+
+WhatIfSimulator evaluates thousands of scenarios against the trained
+model without re-running the scoring pipeline. The model is affine: one
+HeteroConv layer of SAGEConvs without activation, then a linear
+classifier. The weights of FixedSchemaCongestion (export.py) are reused,
+with the KPI normalization folded in. So a scenario's embeddings are the
+current embeddings plus W_kpi times its KPI deltas:
+
+    embedding[s] = base_embedding + sum_k (spill * P)^k (delta[s] @ W_kpi),  k = 0..hops
+    P(congested)  = sigmoid(embedding[s] @ (w_cls[1] - w_cls[0]) + b_cls[1] - b_cls[0])
+
+Scenarios are a batch dimension. A batch of b scenarios is a dense
+[devices, b * hidden] matrix. Only the perturbed rows are filled, with one
+index_add_. Message passing and segment means are sparse matmuls with that
+matrix, over the connected_to graph and the device -> segment map.
+
+The trained model does not move a KPI change to a neighbour. Device
+features are identity features, and its single layer reaches only the
+changed cell's own device from a KPI node (see incremental.py). Neighbours
+tip only through load spill-over, a heuristic of this simulator: with
+spill > 0, every cell passes that fraction of its KPI deltas on, split
+evenly among its connected_to neighbours (P[j, i] = 1 / degree(i)), for up
+to `hops` hops. spill = 0 gives exactly what a scoring pass over the edited
+KPIs would predict.
+
+Segments use the global threshold of scoring.ScoringService: a segment FAILs
+in a scenario when the norm of its mean embedding falls below mean - std
+of all segment norms in that scenario. The FAIL likelihood of a segment is
+the fraction of scenarios in which it FAILs. The rolling and streaming
+thresholds depend on history and are not simulated. With temporal
+features, only the raw KPI columns change; the windowed columns keep their
+current values.
+"""
+import logging
+import time
+import warnings
+
+import numpy as np
+import scipy.sparse as sp
+import torch
+
+from network_health.export import FixedSchemaCongestion
+from network_health.graph_build import device_identity_features
+from network_health.instrumentation import counter, histogram
+from network_health.kpis import CONGESTION_THRESHOLDS, KPI_KEYS
+from network_health.segment_scoring import SegmentAggregator, global_threshold_fail
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_ELEMENTS = 1 << 20  # floats in one scenario batch ([devices, scenarios, hidden]) when batch_size is None;
+                              # the elementwise passes are memory-bound, so batches that stay in cache win
+
+SCENARIOS = counter("whatif_scenarios_total", "What-if scenarios evaluated")
+BATCH_SECONDS = histogram("whatif_batch_seconds", "Time to evaluate one batch of what-if scenarios")
+
+
+def _sparse_csr(rows, cols, values, shape):
+    """
+    torch CSR matrix (summing duplicates); CSR matmuls beat COO on CPU.
+    """
+    matrix = sp.csr_matrix((np.asarray(values, dtype=np.float32), (rows, cols)), shape=shape)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="Sparse CSR tensor support is in beta")
+        return torch.sparse_csr_tensor(torch.from_numpy(matrix.indptr.astype(np.int64)),
+                                       torch.from_numpy(matrix.indices.astype(np.int64)),
+                                       torch.from_numpy(matrix.data), shape, check_invariants=False)
+
+
+def spill_matrix(device_edges, num_devices, spill=1.0):
+    """
+    Sparse [n, n] matrix spill * P with P[j, i] = 1 / degree(i) for every
+    pair of connected_to neighbours (either direction, self-loops dropped).
+    """
+    edges = np.asarray(device_edges, dtype=np.int64).reshape(2, -1)
+    pairs = np.concatenate([edges, edges[::-1]], axis=1)
+    pairs = np.unique(pairs[:, pairs[0] != pairs[1]], axis=1)
+    degree = np.bincount(pairs[0], minlength=num_devices)
+    return _sparse_csr(pairs[1], pairs[0], spill / degree[pairs[0]], (num_devices, num_devices))
+
+
+class WhatIfResult:
+    """
+    Output of WhatIfSimulator.run() for S scenarios, n devices and G segments.
+
+      probability      float32 [S, n] P(congested) per scenario and device (None unless kept)
+      fail             bool [S, G] segment FAIL per scenario (None unless kept)
+      mean_probability float32 [n] P(congested) averaged over the scenarios
+      congestion_rate  float32 [n] fraction of scenarios in which the device is congested
+      fail_likelihood  float32 [G] fraction of scenarios in which the segment FAILs
+      congested, tipped, failing
+                       int64 [S] congested devices, devices congested only in the
+                       scenario, FAILing segments
+    """
+
+    def __init__(self, names, device_keys, segment_ids, base_probability, base_fail, keep_matrices):
+        num_scenarios, num_devices, num_segments = len(names), len(device_keys), len(segment_ids)
+        self.names = names
+        self.device_keys = device_keys
+        self.segment_ids = segment_ids
+        self.base_probability = base_probability
+        self.base_fail = base_fail
+        self.probability = np.empty((num_scenarios, num_devices), dtype=np.float32) if keep_matrices else None
+        self.fail = np.empty((num_scenarios, num_segments), dtype=bool) if keep_matrices else None
+        self.mean_probability = np.zeros(num_devices, dtype=np.float32)
+        self.congestion_rate = np.zeros(num_devices, dtype=np.float32)
+        self.fail_likelihood = np.zeros(num_segments, dtype=np.float32)
+        self.congested = np.zeros(num_scenarios, dtype=np.int64)
+        self.tipped = np.zeros(num_scenarios, dtype=np.int64)
+        self.failing = np.zeros(num_scenarios, dtype=np.int64)
+        self.seconds = 0.0
+
+    @property
+    def scenarios_per_second(self):
+        return len(self.names) / self.seconds if self.seconds else float("inf")
+
+    def report(self, top=10):
+        """
+        JSON-ready summary: per scenario the counts, and (when the matrices
+        were kept) the devices that tipped and the segments that newly FAIL;
+        over all scenarios the most affected devices and segments.
+        """
+        scenarios = []
+        for s, name in enumerate(self.names):
+            entry = {"scenario": name, "congested": int(self.congested[s]), "tipped": int(self.tipped[s]),
+                     "failing_segments": int(self.failing[s])}
+            if self.probability is not None:
+                probability = self.probability[s]
+                tipped = np.flatnonzero((probability > 0.5) & (self.base_probability <= 0.5))
+                tipped = tipped[np.argsort(-probability[tipped], kind="stable")][:top]
+                entry["tipped_cells"] = [[self.device_keys[i], round(float(probability[i]), 4)] for i in tipped]
+                new_fail = np.flatnonzero(self.fail[s] & ~self.base_fail)
+                entry["new_fail_segments"] = [int(self.segment_ids[g]) for g in new_fail[:top]]
+            scenarios.append(entry)
+        cells = np.argsort(-self.congestion_rate, kind="stable")[:top]
+        segments = np.argsort(-self.fail_likelihood, kind="stable")[:top]
+        return {
+            "scenarios": scenarios,
+            "cells": [{"cell": self.device_keys[i], "congestion_rate": round(float(self.congestion_rate[i]), 4),
+                       "mean_probability": round(float(self.mean_probability[i]), 4),
+                       "base_probability": round(float(self.base_probability[i]), 4)} for i in cells],
+            "segments": [{"segment_id": int(self.segment_ids[g]),
+                          "fail_likelihood": round(float(self.fail_likelihood[g]), 4),
+                          "base_status": "FAIL" if self.base_fail[g] else "OK"} for g in segments],
+            "scenarios_per_second": round(self.scenarios_per_second, 1),
+        }
+
+
+class WhatIfSimulator:
+    """
+    Evaluates KPI perturbation scenarios on the current graph with a
+    trained CongestionModel (see the module docstring).
+
+        simulator = WhatIfSimulator.from_service(service, spill=0.3)
+        result = simulator.run([{"saturate": ["12", "17"]}, ...])
+        result.fail_likelihood
+    """
+
+    def __init__(self, model, arrays, device_segment, device_x=None, kpi_x=None, spill=0.0, hops=2,
+                 batch_size=None, saturation_quantile=0.99):
+        if getattr(model, "num_layers", 1) != 1:
+            raise ValueError("WhatIfSimulator needs a single-layer (affine) CongestionModel")
+        self.device_keys = arrays.device_keys.tolist()
+        self.key_to_index = {key: i for i, key in enumerate(self.device_keys)}
+        self.num_devices = len(self.device_keys)
+        self.kpi = np.asarray(arrays.kpi, dtype=np.float32)
+        self.spill = spill
+        self.hops = hops
+        self.batch_size = batch_size
+
+        if device_x is None:
+            device_x = device_identity_features(arrays.device_keys, model.device_features)
+        kpi_x = self.kpi if kpi_x is None else kpi_x
+        fixed = FixedSchemaCongestion(model).eval()
+        with torch.no_grad():
+            base = fixed.embed(torch.as_tensor(device_x), torch.as_tensor(kpi_x),
+                               torch.as_tensor(arrays.device_edges, dtype=torch.long))
+            self.w_kpi = fixed.w_kpi[:len(KPI_KEYS)].clone()          # [kpis, hidden], normalization folded in
+            self.w_margin = fixed.w_cls[:, 1] - fixed.w_cls[:, 0]     # logit(congested) - logit(normal)
+            self.base_margin = base @ self.w_margin + (fixed.b_cls[1] - fixed.b_cls[0])
+        self.hidden = base.shape[1]
+        self.spill_matrix = spill_matrix(arrays.device_edges, self.num_devices, spill) if spill else None
+
+        aggregator = SegmentAggregator(device_segment).compute(base)
+        self.segment_ids = aggregator.segment_ids.numpy()
+        self.base_segment_mean = aggregator.mean.float()
+        self.segment_matrix = _sparse_csr(aggregator.index.numpy(), np.arange(self.num_devices),
+                                          (1.0 / aggregator.counts[aggregator.index]).numpy(),
+                                          (aggregator.num_segments, self.num_devices))
+        self.base_fail = global_threshold_fail(aggregator.norms)[0].numpy()
+
+        columns = [KPI_KEYS.index(kpi) for kpi in CONGESTION_THRESHOLDS]
+        levels = np.quantile(self.kpi[:, columns], saturation_quantile, axis=0) if self.num_devices else []
+        self.saturation = dict(zip(columns, np.asarray(levels, dtype=np.float32).tolist()))
+
+    @classmethod
+    def from_service(cls, service, **options):
+        """
+        Simulator over the graph a ScoringService has loaded. A compiled
+        service model is replaced by its checkpoint's eager model, whose
+        weights the simulator folds.
+        """
+        model = service.model
+        if not hasattr(model, "conv"):
+            from network_health.checkpoints import load_checkpoint
+
+            model, _ = load_checkpoint(service.checkpoint_path)
+        return cls(model, service.arrays, service.device_segment, device_x=service.data["device"].x.numpy(),
+                   kpi_x=service.kpi_x, **options)
+
+    # --- Scenarios ---
+    def deltas(self, scenarios):
+        """
+        (scenario, device, kpi column, delta) arrays of the KPI changes the
+        scenarios describe, relative to the current KPI values.
+        """
+        rows = []
+        for s, scenario in enumerate(scenarios):
+            values = {}
+            for key in scenario.get("saturate", ()):
+                i = self._index(key, s)
+                for column, level in self.saturation.items():
+                    values[i, column] = max(level, float(self.kpi[i, column]))
+            for key, kpis in scenario.get("set", {}).items():
+                i = self._index(key, s)
+                for kpi, value in kpis.items():
+                    if kpi not in KPI_KEYS:
+                        raise ValueError(f"Unknown KPI {kpi!r} in scenario {s}")
+                    values[i, KPI_KEYS.index(kpi)] = float(value)
+            rows.extend((s, i, column, value - float(self.kpi[i, column])) for (i, column), value in values.items())
+        table = np.array(rows, dtype=np.float64).reshape(-1, 4)
+        return (table[:, 0].astype(np.int64), table[:, 1].astype(np.int64), table[:, 2].astype(np.int64),
+                table[:, 3].astype(np.float32))
+
+    def _index(self, key, scenario):
+        try:
+            return self.key_to_index[str(key)]
+        except KeyError:
+            raise ValueError(f"Unknown cell {key!r} in scenario {scenario}") from None
+
+    # --- Simulation ---
+    def run(self, scenarios, keep_matrices=True):
+        """
+        WhatIfResult for a list of scenario dicts.
+        """
+        names = [scenario.get("name", str(s)) for s, scenario in enumerate(scenarios)]
+        return self.run_deltas(names, *self.deltas(scenarios), keep_matrices=keep_matrices)
+
+    def run_deltas(self, names, scenario, device, column, delta, keep_matrices=True):
+        """
+        WhatIfResult for KPI deltas given as parallel arrays (see deltas()),
+        evaluated batch_size scenarios at a time.
+        """
+        start = time.perf_counter()
+        result = WhatIfResult(names, self.device_keys, self.segment_ids,
+                              torch.sigmoid(self.base_margin).numpy(), self.base_fail, keep_matrices)
+        num_scenarios = len(names)
+        batch = self.batch_size or max(1, MAX_BATCH_ELEMENTS // max(1, self.num_devices * self.hidden))
+        order = np.argsort(scenario, kind="stable")
+        scenario, device, column, delta = scenario[order], device[order], column[order], delta[order]
+        base_congested = self.base_margin > 0
+        with torch.no_grad():
+            for first in range(0, num_scenarios, batch):
+                t0 = time.perf_counter()
+                last = min(first + batch, num_scenarios)
+                lo, hi = np.searchsorted(scenario, [first, last])
+                margin, norms = self._evaluate(last - first, scenario[lo:hi] - first, device[lo:hi], column[lo:hi],
+                                               delta[lo:hi])
+                congested = margin > 0                                       # [b, n]
+                threshold = norms.mean(dim=1) - norms.std(dim=1, unbiased=False)
+                fail = norms < threshold[:, None]                             # [b, G]
+                probability = torch.sigmoid(margin)
+                result.mean_probability += probability.sum(dim=0).numpy()
+                result.congestion_rate += congested.sum(dim=0).numpy()
+                result.fail_likelihood += fail.sum(dim=0).numpy()
+                result.congested[first:last] = congested.sum(dim=1).numpy()
+                result.tipped[first:last] = (congested & ~base_congested).sum(dim=1).numpy()
+                result.failing[first:last] = fail.sum(dim=1).numpy()
+                if keep_matrices:
+                    result.probability[first:last] = probability.numpy()
+                    result.fail[first:last] = fail.numpy()
+                BATCH_SECONDS.observe(time.perf_counter() - t0)
+        if num_scenarios:
+            result.mean_probability /= num_scenarios
+            result.congestion_rate /= num_scenarios
+            result.fail_likelihood /= num_scenarios
+        SCENARIOS.inc(num_scenarios)
+        result.seconds = time.perf_counter() - start
+        logger.info("Simulated %d scenarios in %.3f s (%.0f scenarios/s)", num_scenarios, result.seconds,
+                    result.scenarios_per_second)
+        return result
+
+    def _evaluate(self, count, scenario, device, column, delta):
+        """
+        (congestion logit margin [count, n], segment norms [count, G]) for
+        one batch of scenarios; scenario indices are relative to the batch.
+        """
+        n, hidden = self.num_devices, self.hidden
+        # Embedding deltas of the perturbed devices: row (device, scenario) of a [n * count, hidden] matrix.
+        change = torch.zeros(n * count, hidden)
+        rows = torch.from_numpy(device * count + scenario)
+        change.index_add_(0, rows, torch.from_numpy(delta)[:, None] * self.w_kpi[torch.from_numpy(column)])
+        change = change.view(n, count * hidden)
+        if self.spill_matrix is not None:
+            term = change
+            for _ in range(self.hops):
+                term = self.spill_matrix @ term
+                change.add_(term)
+        margin = self.base_margin[:, None] + change.view(n, count, hidden) @ self.w_margin
+        segment_mean = (self.segment_matrix @ change).view(-1, count, hidden) + self.base_segment_mean[:, None]
+        return margin.t(), segment_mean.norm(dim=2).t()
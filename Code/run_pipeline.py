@@ -0,0 +1,15 @@
+# run_pipeline.py
+"""
+Single-process asyncio pipeline: generate -> ingest -> score -> write -> notify.
+
+Replaces running generate_data.py, update_arango.py and score_daemon.py as
+three polling loops (network_health.commands.pipeline).
+Same as `python -m network_health pipeline`; settings are in
+network_health.config (--config FILE, NH_* variables or --set KEY=VALUE).
+"""
+import sys
+
+from network_health.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main(["pipeline", *sys.argv[1:]]))
@@ -0,0 +1,17 @@
+# score_daemon.py
+"""
+Long-running congestion scoring daemon.
+
+Loads the latest checkpoint written by train.py, keeps the device graph in
+memory and rescores only when update_arango.py has pushed new KPI values.
+A new checkpoint is picked up automatically on the next cycle.
+
+Same as `python -m network_health score --daemon`; settings are in
+network_health.config (--config FILE, NH_* variables or --set KEY=VALUE).
+"""
+import sys
+
+from network_health.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main(["score", "--daemon", *sys.argv[1:]]))
@@ -0,0 +1,65 @@
+"""
+Shared fixtures: a small synthetic network, its graph and an untrained
+model. Every test runs offline; network_health.memory_db stands in for
+ArangoDB where a database is needed.
+
+    cd Code && python -m pytest tests
+"""
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+import torch
+
+from network_health.graph_build import arrays_from_frame, build_hetero_data
+from network_health.model import CongestionModel, edge_index_dict
+from network_health.synthetic import SyntheticNetwork
+
+NOW = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture(scope="session")
+def network():
+    return SyntheticNetwork(300, "geometric", degree=4, hotspots=2, seed=0)
+
+
+@pytest.fixture(scope="session")
+def arrays(network):
+    return arrays_from_frame(network.frame(NOW), network.edge_rows())
+
+
+@pytest.fixture
+def data(arrays):
+    return build_hetero_data(arrays)[0]
+
+
+@pytest.fixture(scope="session")
+def model(arrays):
+    torch.manual_seed(0)
+    model = CongestionModel()
+    model.fit_normalization(torch.from_numpy(arrays.kpi))
+    return model.eval()
+
+
+def full_pass(model, data):
+    """
+    (embeddings, logits) of one eager pass over the whole graph.
+    """
+    with torch.no_grad():
+        embeddings = model.embed(data.x_dict, edge_index_dict(data))
+        return embeddings, model.classifier(embeddings)
+
+
+def segment_ids_of(arrays, max_size=4):
+    from network_health.segments import SegmentPartitioner
+
+    return SegmentPartitioner("bfs", max_size).partition(arrays.device_keys, arrays.device_edges)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
@@ -0,0 +1,30 @@
+"""
+Commands run against memory_db with the nullable settings turned off.
+"""
+from conftest import NOW
+from network_health.checkpoints import list_versions
+from network_health.commands import train
+from network_health.config import load_config
+from network_health.kpi_store import ParquetKpiStore
+from network_health.memory_db import MemoryDatabase
+
+
+def test_train_scans_cell_edges_without_a_topology_dir(network, tmp_path, monkeypatch):
+    db = MemoryDatabase()
+    db.create_collection("cell_edges", edge=True).insert_many(network.edge_documents())
+    ParquetKpiStore(str(tmp_path / "kpis")).append(network.frame(NOW))
+    scans = []
+
+    def load_edge_rows(db, collection, batch_size):
+        scans.append(collection)
+        return db.edge_rows(collection)  # memory_db has no AQL
+
+    monkeypatch.setattr(train, "connect", lambda config: db)
+    monkeypatch.setattr(train, "load_edge_rows", load_edge_rows)
+    config = load_config("train", environ={"NH_TOPOLOGY_DIR": "null"}, overrides=[
+        "KPI_SOURCE=store", f"KPI_STORE_DIR={tmp_path / 'kpis'}", f"CHECKPOINT_DIR={tmp_path / 'checkpoints'}",
+        "EPOCHS=2", "EXPORT_FORMATS=[]",
+    ])
+    train.run(config, None)
+    assert scans == ["cell_edges"]
+    assert list_versions(str(tmp_path / "checkpoints")) == [1]
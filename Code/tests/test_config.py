@@ -0,0 +1,71 @@
+"""
+Config layering, type coercion and the NULLABLE settings.
+"""
+import json
+
+import pytest
+
+from network_health.config import DEFAULTS, NULLABLE, coerce, load_config, parse_value
+
+
+def test_coerce_matches_the_default_type():
+    assert coerce("INTERVAL", 1e3, "test") == 1000 and isinstance(coerce("INTERVAL", 1e3, "test"), int)
+    assert coerce("SHARDS", 2, "test") == 2
+    assert coerce("METRICS_PORT", "9101", "test") == "9101"  # None default: anything goes
+    with pytest.raises(ValueError, match="INTERVAL"):
+        coerce("INTERVAL", 1.5, "test")
+    with pytest.raises(ValueError, match="EXCEL_EXPORT"):
+        coerce("EXCEL_EXPORT", 1, "test")
+    with pytest.raises(ValueError, match="SHARDS"):
+        coerce("SHARDS", True, "test")
+
+
+def test_only_nullable_settings_accept_null():
+    for key in NULLABLE:
+        assert DEFAULTS[key] is not None
+        assert coerce(key, None, "test") is None
+    with pytest.raises(ValueError, match="PASSWORD"):
+        coerce("PASSWORD", None, "test")
+    with pytest.raises(ValueError, match="INTERVAL"):
+        coerce("INTERVAL", None, "test")
+
+
+def test_string_defaults_keep_the_text():
+    assert parse_value("1234", DEFAULTS["PASSWORD"]) == "1234"
+    assert parse_value("null", DEFAULTS["PASSWORD"]) is None
+    assert parse_value("30", DEFAULTS["INTERVAL"]) == 30
+    assert parse_value("not json") == "not json"
+
+
+def test_environment_and_overrides():
+    environ = {"NH_INTERVAL": "5", "NH_PASSWORD": "1234", "NH_TOPOLOGY_DIR": "null", "NH_ROLLUP_COLLECTION": "null"}
+    config = load_config("pipeline", environ=environ, overrides=["SHARDS=2", "SEGMENT_CACHE=null"])
+    assert config.INTERVAL == 5
+    assert config.PASSWORD == "1234"
+    assert config.TOPOLOGY_DIR is None and config.ROLLUP_COLLECTION is None and config.SEGMENT_CACHE is None
+    assert config.SHARDS == 2
+
+
+@pytest.mark.parametrize("environ, overrides, message", [
+    ({"NH_INTERVAL": "abc"}, (), "NH_INTERVAL"),
+    ({"NH_PASSWORD": "null"}, (), "PASSWORD"),
+    ({"NH_INTERVALL": "5"}, (), "Unknown setting"),
+    ({}, ["SHARDZ=2"], "Unknown setting"),
+    ({}, ["SHARDS"], "KEY=VALUE"),
+])
+def test_bad_settings_are_rejected(environ, overrides, message):
+    with pytest.raises(ValueError, match=message):
+        load_config("score", environ=environ, overrides=overrides)
+
+
+def test_config_file_tables(tmp_path):
+    path = tmp_path / "nh.json"
+    path.write_text(json.dumps({"INTERVAL": 10, "score": {"INTERVAL": 20, "TOPOLOGY_DIR": None}}))
+    assert load_config("ingest", environ={"NH_CONFIG": str(path)}).INTERVAL == 10
+    config = load_config("score", environ={"NH_CONFIG": str(path)})
+    assert config.INTERVAL == 20 and config.TOPOLOGY_DIR is None
+    assert load_config("score", path=str(path), environ={"NH_INTERVAL": "30"}).INTERVAL == 30
+
+    path.write_text(json.dumps({"scroe": {"INTERVAL": 20}}))
+    with pytest.raises(ValueError, match="Unknown command table"):
+        load_config("score", path=str(path), environ={})
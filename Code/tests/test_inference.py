@@ -0,0 +1,91 @@
+"""
+Every inference path must reproduce one eager full pass.
+"""
+import importlib.util
+
+import numpy as np
+import pytest
+import torch
+
+from conftest import full_pass
+from network_health.checkpoints import save_checkpoint
+from network_health.export import FixedSchemaCongestion, export_checkpoint, load_compiled
+from network_health.incremental import IncrementalEmbedder
+from network_health.minibatch import EgoNetLoader, embed_minibatch, with_reverse_edges
+from network_health.model import CONNECTED_TO
+from network_health.sharded import ShardedScorer, check_strategy
+
+
+def test_incremental_update_matches_full_pass(model, data):
+    embedder = IncrementalEmbedder(model, data)
+    changed = np.array([3, 50, 120, 299])
+    data["devicekpi"].x[changed] += 25.0
+    embedder.mark_changed(changed)
+    affected = embedder.update()
+
+    assert set(changed.tolist()) <= set(affected.tolist())
+    assert len(affected) < data["device"].num_nodes
+    embeddings, logits = full_pass(model, data)
+    torch.testing.assert_close(embedder.embeddings, embeddings, rtol=0, atol=1e-6)
+    torch.testing.assert_close(embedder.logits, logits, rtol=0, atol=1e-6)
+
+
+def test_incremental_update_without_changes_is_a_no_op(model, data):
+    embedder = IncrementalEmbedder(model, data)
+    before = embedder.embeddings.clone()
+    assert len(embedder.update()) == 0
+    assert torch.equal(embedder.embeddings, before)
+
+
+def test_fixed_schema_export_matches_eager(model, data, tmp_path):
+    embeddings, logits = full_pass(model, data)
+    inputs = (data["device"].x, data["devicekpi"].x, data[CONNECTED_TO].edge_index)
+    with torch.no_grad():
+        fixed_embeddings, fixed_logits = FixedSchemaCongestion(model)(*inputs)
+    torch.testing.assert_close(fixed_embeddings, embeddings, rtol=0, atol=1e-5)
+    torch.testing.assert_close(fixed_logits, logits, rtol=0, atol=1e-5)
+
+    save_checkpoint(str(tmp_path), model)
+    path = export_checkpoint(str(tmp_path))["torchscript"]
+    compiled_embeddings, compiled_logits = load_compiled(path)(*inputs)
+    torch.testing.assert_close(compiled_embeddings, embeddings, rtol=0, atol=1e-5)
+    torch.testing.assert_close(compiled_logits, logits, rtol=0, atol=1e-5)
+
+
+def test_embed_minibatch_matches_full_pass(model, data):
+    embeddings, logits = full_pass(model, data)
+    batch_embeddings, batch_logits = embed_minibatch(model, data, batch_size=64)
+    torch.testing.assert_close(batch_embeddings, embeddings, rtol=0, atol=1e-6)
+    torch.testing.assert_close(batch_logits, logits, rtol=0, atol=1e-6)
+
+
+def test_ego_net_loader_covers_every_seed_once(data):
+    loader = EgoNetLoader(with_reverse_edges(data), fanout=[2], batch_size=50, shuffle=True, seed=0)
+    seeds = np.concatenate([batch["device"].n_id[:batch["device"].batch_size].numpy() for batch in loader])
+    assert len(loader) == 6
+    assert sorted(seeds.tolist()) == list(range(data["device"].num_nodes))
+
+
+def test_sharded_scorer_matches_single_process(model, data):
+    embeddings, logits = full_pass(model, data)
+    scorer = ShardedScorer(num_shards=2, workers=2, strategy="bfs")
+    try:
+        sharded_embeddings, sharded_logits = scorer.embed(model, data)
+    finally:
+        scorer.close()
+    assert len(scorer.plan.shards) == 2
+    torch.testing.assert_close(sharded_embeddings, embeddings, rtol=0, atol=1e-6)
+    torch.testing.assert_close(sharded_logits, logits, rtol=0, atol=1e-6)
+
+
+def test_sharded_scorer_rejects_fork_and_unknown_strategies():
+    with pytest.raises(ValueError):
+        ShardedScorer(2, strategy="bfs", start_method="fork")
+    with pytest.raises(ValueError):
+        check_strategy("nope")
+
+
+@pytest.mark.skipif(importlib.util.find_spec("pymetis") is not None, reason="pymetis is installed")
+def test_metis_shard_strategy_fails_loudly_without_pymetis():
+    with pytest.raises(ImportError, match="pymetis"):
+        ShardedScorer(2)
@@ -0,0 +1,146 @@
+"""
+WatermarkIngester and KpiRollups over a local Parquet KPI store.
+"""
+import calendar
+from datetime import timedelta
+
+import pytest
+
+from conftest import NOW
+from network_health.ingest import WatermarkIngester
+from network_health.kpi_store import KpiReader, ParquetKpiStore
+from network_health.kpis import KPI_KEYS
+from network_health.rollups import KpiRollups
+from network_health.synthetic import generate_frame
+
+CELLS = 5
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ParquetKpiStore(str(tmp_path / "kpis"))
+
+
+@pytest.fixture
+def reader(tmp_path, store):
+    return KpiReader(str(tmp_path / "kpis"))
+
+
+def frame_at(seconds, rng, cells=CELLS):
+    return generate_frame(NOW + timedelta(seconds=seconds), cells, rng=rng)
+
+
+# --- WatermarkIngester ---
+def test_poll_returns_newest_row_per_cell(tmp_path, store, reader, rng):
+    store.append(frame_at(0, rng))
+    newest = frame_at(30, rng)
+    store.append(newest)
+    ingester = WatermarkIngester(reader, str(tmp_path / "ingest.json"))
+
+    docs = {doc["_key"]: doc for doc in ingester.poll()}
+    assert sorted(docs) == [str(cell) for cell in range(1, CELLS + 1)]
+    for row in newest.to_dict("records"):
+        doc = docs[str(row["cell_id"])]
+        assert doc["timestamp"] == row["timestamp"]
+        assert [doc[k] for k in KPI_KEYS] == pytest.approx([row[k] for k in KPI_KEYS])
+    assert len({doc["kpi_write_seq"] for doc in docs.values()}) == 1
+
+    # Nothing is persisted before commit: the same rows come back.
+    assert len(ingester.poll()) == CELLS
+    ingester.commit()
+    assert ingester.poll() == []
+
+
+def test_failed_documents_are_retried_with_a_newer_sequence(tmp_path, store, reader, rng):
+    store.append(frame_at(0, rng))
+    ingester = WatermarkIngester(reader, str(tmp_path / "ingest.json"))
+    first = ingester.poll()
+    ingester.commit(failed_keys=["2", "4"])
+
+    retried = ingester.poll()
+    assert sorted(doc["_key"] for doc in retried) == ["2", "4"]
+    assert all(doc["kpi_write_seq"] > first[0]["kpi_write_seq"] for doc in retried)
+    ingester.commit()
+    assert ingester.poll() == []
+
+
+def test_state_survives_a_restart(tmp_path, store, reader, rng):
+    path = str(tmp_path / "ingest.json")
+    store.append(frame_at(0, rng))
+    ingester = WatermarkIngester(reader, path)
+    ingester.poll()
+    ingester.commit(failed_keys=["3"])
+
+    restarted = WatermarkIngester(reader, path)
+    assert restarted.offset == ingester.offset
+    assert restarted.write_seq == ingester.write_seq
+    assert [doc["_key"] for doc in restarted.poll()] == ["3"]
+
+
+def test_unchanged_values_and_late_rows_are_skipped(tmp_path, store, reader, rng):
+    frame = frame_at(60, rng)
+    store.append(frame)
+    ingester = WatermarkIngester(reader, str(tmp_path / "ingest.json"))
+    ingester.poll()
+    ingester.commit()
+
+    # Same values at a newer time: only the timestamp moved, nothing to push.
+    store.append(frame.assign(timestamp=(NOW + timedelta(seconds=90)).strftime("%m/%d/%Y %H:%M:%S")))
+    assert ingester.poll() == []
+    ingester.commit()
+    assert ingester.watermarks["1"] == ingester.watermarks["5"]
+
+    # Different values, but older than the watermark: dropped as late.
+    store.append(frame_at(0, rng))
+    assert ingester.poll() == []
+    ingester.commit()
+
+    store.append(frame_at(120, rng))
+    assert len(ingester.poll()) == CELLS
+
+
+# --- KpiRollups ---
+def test_buckets_close_once_the_watermark_passes_them(tmp_path, store, reader, rng):
+    rollups = KpiRollups(str(tmp_path / "rollups.json"), reader, resolutions={"1m": 60})
+    minute = [frame_at(0, rng), frame_at(20, rng), frame_at(40, rng)]
+    for frame in minute:
+        store.append(frame)
+    assert rollups.poll() == []  # 12:00 bucket is still open
+    rollups.commit()
+
+    store.append(frame_at(60, rng))
+    docs = {doc["_key"]: doc for doc in rollups.poll()}
+    start = calendar.timegm(NOW.timetuple())
+    assert sorted(docs) == sorted(f"1m-{cell}-{start}" for cell in range(1, CELLS + 1))
+    doc = docs[f"1m-1-{start}"]
+    assert doc["count"] == 3
+    values = [frame.loc[0, "latency_ms"] for frame in minute]
+    low, mean, high, _ = doc["latency_ms"]
+    assert (low, high) == (min(values), max(values))
+    assert mean == pytest.approx(sum(values) / 3)
+    rollups.commit()
+    assert rollups.closed["1m"] == start + 60
+
+
+def test_late_rows_are_dropped_and_failed_buckets_retried(tmp_path, store, reader, rng):
+    path = str(tmp_path / "rollups.json")
+    rollups = KpiRollups(path, reader, resolutions={"1m": 60})
+    store.append(frame_at(0, rng))
+    store.append(frame_at(60, rng))
+    closed = rollups.poll()
+    assert len(closed) == CELLS
+    failed = [closed[0]["_key"]]
+    rollups.commit(failed_keys=failed)
+
+    # A row for the closed minute no longer changes anything.
+    store.append(frame_at(30, rng))
+    restarted = KpiRollups(path, reader, resolutions={"1m": 60})
+    assert [doc["_key"] for doc in restarted.poll()] == failed
+    restarted.commit()
+    assert restarted.poll() == []
+
+    # The buffered 12:01 rows were refilled on restart and close with the next minute.
+    store.append(frame_at(120, rng))
+    reopened = KpiRollups(path, reader, resolutions={"1m": 60})
+    docs = reopened.poll()
+    assert len(docs) == CELLS and all(doc["count"] == 1 for doc in docs)
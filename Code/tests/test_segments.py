@@ -0,0 +1,133 @@
+"""
+Segment id stability across partitioner runs and the scoring service's
+cold start.
+"""
+import numpy as np
+import pytest
+
+from network_health.checkpoints import save_checkpoint
+from network_health.graph_build import GraphArrays
+from network_health.memory_db import MemoryDatabase
+from network_health.segments import STRATEGIES, SegmentPartitioner
+
+
+def with_edge(arrays, src, dst):
+    edges = np.concatenate([arrays.device_edges, np.array([[src], [dst]], dtype=np.int64)], axis=1)
+    return GraphArrays(arrays.device_keys, arrays.kpi, edges)
+
+
+@pytest.mark.parametrize("strategy", sorted(set(STRATEGIES) - {"metis"}))
+@pytest.mark.parametrize("cached", [True, False])
+def test_ids_are_stable_and_changes_stay_local(arrays, tmp_path, strategy, cached):
+    cache_path = str(tmp_path / "segments.npz") if cached else None
+    partitioner = SegmentPartitioner(strategy, 4, cache_path)
+    assert not partitioner.has_cache()
+    first = partitioner.partition(arrays.device_keys, arrays.device_edges)
+    assert partitioner.has_cache()
+    assert partitioner.repartitioned == arrays.num_devices and partitioner.retired_ids == []
+    if strategy != "components":
+        assert np.bincount(first).max() <= 4
+
+    again = partitioner.partition(arrays.device_keys, arrays.device_edges)
+    assert np.array_equal(again, first)
+    assert partitioner.repartitioned == 0 and partitioner.retired_ids == []
+
+    changed = with_edge(arrays, 0, arrays.num_devices - 1)
+    after = partitioner.partition(changed.device_keys, changed.device_edges)
+    moved = after != first
+    assert moved[0] or moved[-1] or partitioner.repartitioned > 0
+    assert partitioner.repartitioned < arrays.num_devices // 2
+    assert set(partitioner.retired_ids) <= set(first.tolist()) - set(after.tolist())
+    assert set(first[moved].tolist()) - set(after[~moved].tolist()) <= set(partitioner.retired_ids)
+    assert after[moved].min() > first.max()  # rebuilt segments get fresh ids
+
+
+def test_cache_file_survives_a_restart(arrays, tmp_path):
+    cache_path = str(tmp_path / "segments.npz")
+    first = SegmentPartitioner("bfs", 4, cache_path).partition(arrays.device_keys, arrays.device_edges)
+    restarted = SegmentPartitioner("bfs", 4, cache_path)
+    assert np.array_equal(restarted.partition(arrays.device_keys, arrays.device_edges), first)
+    assert restarted.repartitioned == 0
+
+    # A different strategy cannot reuse the assignment; every old id is retired.
+    other = SegmentPartitioner("components", 4, cache_path)
+    ids = other.partition(arrays.device_keys, arrays.device_edges)
+    assert other.repartitioned == arrays.num_devices
+    assert sorted(other.retired_ids) == sorted(set(first.tolist()))
+    assert ids.min() > first.max()
+
+
+def test_string_keys_and_device_order_do_not_change_ids():
+    keys = np.array(["a", "b", "c", "d", "e", "f"])
+    edges = np.array([[0, 1, 2, 3, 4], [1, 2, 3, 4, 5]])
+    partitioner = SegmentPartitioner("bfs", 3)
+    first = dict(zip(keys.tolist(), partitioner.partition(keys, edges, first_id=10).tolist()))
+    assert min(first.values()) == 10
+
+    perm = np.array([5, 3, 1, 0, 4, 2])
+    inverse = np.argsort(perm)
+    shuffled = partitioner.partition(keys[perm], inverse[edges])
+    assert dict(zip(keys[perm].tolist(), shuffled.tolist())) == first
+    assert partitioner.repartitioned == 0
+
+
+# --- Scoring service cold start ---
+@pytest.fixture
+def service_factory(model, tmp_path, monkeypatch):
+    from network_health import scoring
+
+    calls = []
+
+    def existing_keys(db, collection, keys=None, batch_size=None):
+        # memory_db has no AQL; list the collection directly.
+        if keys is None:
+            calls.append(collection)
+        found = list(db.collection(collection).documents)
+        return found if keys is None else [key for key in found if key in set(map(str, keys))]
+
+    monkeypatch.setattr(scoring, "existing_keys", existing_keys)
+    checkpoint_dir = str(tmp_path / "checkpoints")
+    save_checkpoint(checkpoint_dir, model)
+
+    def make(db, segment_cache_path=None):
+        for name in ("traffic_data", "cell_edges", "SegmentPrediction"):
+            if not db.has_collection(name):
+                db.create_collection(name, edge=name == "cell_edges")
+        return scoring.ScoringService(db, checkpoint_dir, segment_cache_path=segment_cache_path)
+
+    make.calls = calls
+    return make
+
+
+def test_cold_start_retires_earlier_segments_once(arrays, service_factory):
+    db = MemoryDatabase()
+    service = service_factory(db)
+    db.collection("SegmentPrediction").insert_many([{"_key": "7"}, {"_key": "250"}, {"_key": "summary"}])
+
+    service.load_graph(arrays)
+    first = service.device_segment.copy()
+    assert service_factory.calls == ["SegmentPrediction"]
+    assert first.min() == 251
+    assert sorted(db.collection("SegmentPrediction").documents) == ["summary"]
+
+    # Reloading in the same process keeps the ids and does not scan again,
+    # even though nothing is cached on disk.
+    service.score(write=False)
+    service.write_segments()
+    service.load_graph(arrays)
+    assert service_factory.calls == ["SegmentPrediction"]
+    assert np.array_equal(service.device_segment, first)
+    assert service.partitioner.retired_ids == []
+    assert len(db.collection("SegmentPrediction").documents) == len(set(first.tolist())) + 1
+
+
+def test_segment_cache_file_skips_the_cold_start(arrays, service_factory, tmp_path):
+    db = MemoryDatabase()
+    cache_path = str(tmp_path / "segments.npz")
+    service_factory(db, cache_path).load_graph(arrays)
+    assert service_factory.calls == ["SegmentPrediction"]
+
+    restarted = service_factory(db, cache_path)
+    restarted.load_graph(arrays)
+    assert service_factory.calls == ["SegmentPrediction"]
+    assert restarted.partitioner.repartitioned == 0
@@ -0,0 +1,63 @@
+"""
+With spill = 0 the what-if simulator must predict exactly what rescoring
+the edited KPIs would.
+"""
+import numpy as np
+import pytest
+import torch
+
+from conftest import full_pass, segment_ids_of
+from network_health.graph_build import GraphArrays, build_hetero_data
+from network_health.kpis import KPI_KEYS
+from network_health.segment_scoring import SegmentAggregator, global_threshold_fail
+from network_health.whatif import WhatIfSimulator
+
+
+def rescore(model, arrays, device_segment, kpi):
+    """
+    (P(congested) per device, segment FAIL mask) of a full pass over kpi.
+    """
+    data, _ = build_hetero_data(GraphArrays(arrays.device_keys, kpi, arrays.device_edges))
+    embeddings, logits = full_pass(model, data)
+    aggregator = SegmentAggregator(device_segment).compute(embeddings)
+    return torch.softmax(logits, dim=1)[:, 1].numpy(), global_threshold_fail(aggregator.norms)[0].numpy()
+
+
+def test_spill_free_simulation_matches_rescoring(model, arrays):
+    device_segment = segment_ids_of(arrays)
+    keys = arrays.device_keys.tolist()
+    scenarios = [
+        {"name": "nothing"},
+        {"name": "saturate", "saturate": [keys[0], keys[10], keys[11]]},
+        {"name": "set", "set": {keys[5]: {"latency_ms": 180, "packet_loss_rate": 3.5}}},
+        {"name": "both", "saturate": [keys[42]], "set": {keys[42]: {"call_drop_rate": 0.0}, keys[7]: {"jitter_ms": 19}}},
+    ]
+    simulator = WhatIfSimulator(model, arrays, device_segment, spill=0.0, batch_size=3)
+    result = simulator.run(scenarios)
+
+    scenario, device, column, delta = simulator.deltas(scenarios)
+    for s in range(len(scenarios)):
+        kpi = arrays.kpi.copy()
+        mine = scenario == s
+        kpi[device[mine], column[mine]] += delta[mine]
+        probability, fail = rescore(model, arrays, device_segment, kpi)
+        np.testing.assert_allclose(result.probability[s], probability, rtol=0, atol=1e-5)
+        assert np.array_equal(result.fail[s], fail)
+    np.testing.assert_allclose(result.probability[0], result.base_probability, rtol=0, atol=1e-6)
+
+
+def test_set_scenario_delta_is_relative_to_current_kpis(model, arrays):
+    simulator = WhatIfSimulator(model, arrays, segment_ids_of(arrays))
+    key = arrays.device_keys[3]
+    scenario, device, column, delta = simulator.deltas([{"set": {key: {"latency_ms": 123.0}}}])
+    assert device.tolist() == [3]
+    assert column.tolist() == [KPI_KEYS.index("latency_ms")]
+    assert delta[0] == pytest.approx(123.0 - arrays.kpi[3, KPI_KEYS.index("latency_ms")])
+
+
+def test_unknown_cells_and_kpis_are_rejected(model, arrays):
+    simulator = WhatIfSimulator(model, arrays, segment_ids_of(arrays))
+    with pytest.raises(ValueError, match="Unknown cell"):
+        simulator.run([{"saturate": ["no-such-cell"]}])
+    with pytest.raises(ValueError, match="Unknown KPI"):
+        simulator.run([{"set": {arrays.device_keys[0]: {"no_such_kpi": 1}}}])
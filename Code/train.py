@@ -0,0 +1,17 @@
+# train.py
+"""
+Offline training command for the congestion model.
+
+Builds the device graph from ArangoDB (or the KPI store), trains the
+classifier and writes a new versioned checkpoint that congestion.py and
+score_daemon.py pick up.
+
+Same as `python -m network_health train`; settings are in
+network_health.config (--config FILE, NH_* variables or --set KEY=VALUE).
+"""
+import sys
+
+from network_health.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main(["train", *sys.argv[1:]]))